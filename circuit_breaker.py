@@ -0,0 +1,161 @@
+"""
+Circuit breakers for CHIP's external dependencies (OpenAI, Google Sheets).
+
+When a dependency degrades, every rerun would otherwise wait for the full
+timeout before failing. A CircuitBreaker counts consecutive failures and, past
+a threshold, opens: calls fail immediately with CircuitOpenError instead of
+reaching the dependency. After recovery_timeout it goes half-open and lets a
+limited number of trial calls through. A success closes it again; a failure
+re-opens it.
+
+Which errors count as failures is decided per dependency (is_failure), so bad
+requests or configuration errors don't trip a breaker for a healthy service.
+Errors that say nothing about the service at all, such as a call the user
+cancelled, are neutral: they release their admission and count as neither.
+Transitions are logged, and stats()/all_breaker_stats() expose state and
+counters for metrics (llm_runtime logs them with its executor stats).
+"""
+import contextlib
+import logging
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_breakers = weakref.WeakValueDictionary() # name -> CircuitBreaker, for all_breaker_stats()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open; retry_after is in seconds."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with closed, open and half-open states.
+    Use guard() around a dependency call (or before_call() plus record() or release()).
+    Thread-safe; one instance per dependency is shared by the whole process.
+    """
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1, is_failure=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure or (lambda error: True)
+        self._state = CLOSED
+        self._changed_at = time.monotonic()
+        self._consecutive_failures = 0
+        self._trial_calls = 0
+        self._lock = threading.Lock()
+        self.counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+        _breakers[name] = self
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def _transition(self, new_state, now):
+        old_state = self._state
+        self._state = new_state
+        self._changed_at = now
+        self._trial_calls = 0
+        if new_state == OPEN:
+            self.counters["opened"] += 1
+            logger.warning(f"Circuit '{self.name}' {old_state} -> open after {self._consecutive_failures} consecutive failures; failing fast for {self.recovery_timeout:g}s.")
+        else:
+            logger.info(f"Circuit '{self.name}' {old_state} -> {new_state}.")
+
+    def _refresh(self, now):
+        if self._state == OPEN and now - self._changed_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN, now)
+        elif self._state == HALF_OPEN and now - self._changed_at >= self.recovery_timeout:
+            self._changed_at = now # Trial calls that never reported back don't block new trials
+            self._trial_calls = 0
+
+    def check(self):
+        """Raises CircuitOpenError while open, without taking a half-open trial slot."""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._state == OPEN:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self.recovery_timeout - (now - self._changed_at))
+
+    def before_call(self):
+        """Admits one call or raises CircuitOpenError. Half-open admits up to half_open_max_calls trials."""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._state == OPEN:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self.recovery_timeout - (now - self._changed_at))
+            if self._state == HALF_OPEN:
+                if self._trial_calls >= self.half_open_max_calls:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError(self.name, 1.0)
+                self._trial_calls += 1
+
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self._consecutive_failures = 0
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED, time.monotonic())
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            self.counters["failures"] += 1
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._transition(OPEN, now)
+
+    def record(self, error):
+        """Records the outcome of an admitted call that raised error (errors is_failure rejects count as successes)."""
+        if self.is_failure(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def release(self):
+        """Gives back the admission of a call that ended without an outcome (e.g. cancelled), recording nothing."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._trial_calls > 0:
+                self._trial_calls -= 1
+
+    @contextlib.contextmanager
+    def guard(self, neutral=()):
+        """Context manager that admits a call and records its outcome. Exceptions of the neutral types are only released."""
+        self.before_call()
+        try:
+            yield
+        except neutral:
+            self.release()
+            raise
+        except Exception as e:
+            self.record(e)
+            raise
+        self.record_success()
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            return {"name": self.name, "state": self._state, "state_seconds": round(now - self._changed_at, 1), "consecutive_failures": self._consecutive_failures, **self.counters}
+
+
+def all_breaker_stats():
+    """Returns stats() for every live breaker, keyed by name."""
+    return {name: breaker.stats() for name, breaker in list(_breakers.items())}
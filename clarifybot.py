@@ -1,18 +1,29 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx # Tells script threads from background threads (LLM workers, outbox flusher)
 import time
 import uuid
+import functools
 import openai
 import os
 import re
 import json
-import random
+import math
 import logging
 import datetime
+import sqlite3
 # import requests # No longer needed for Edge Function
 import gspread # Added for Google Sheets
-from google.oauth2.service_account import Credentials # Added for Google Sheets auth
 import pandas as pd # Added for data handling
-import plotly.express as px # Added for chart generation
+from exhibit_render import build_exhibit_render # Plotly figures for Analysis exhibits
+from prompt_catalog import EXHIBIT_TEXT_FORMATS, PromptCatalog, PromptCatalogLoader, PromptDeck # Process-wide, indexed prompt catalog
+from interviewer_protocol import StreamingResponseParser # ###ANSWER### / ###ASSESSMENT### response parsing, buffered and streamed
+from conversation_history import InterviewerHistory # Token-budgeted interviewer history with a rolling summary
+from sheets_session import SheetsSession # Authorized Sheets client and worksheet reused across saves
+from feedback_outbox import FeedbackOutbox # Durable local queue of feedback rows, flushed to Sheets in batches
+from feedback_sinks import SheetsFeedbackSink, SQLiteFeedbackSink # Pluggable feedback backends (Google Sheets or local SQLite)
+from circuit_breaker import CircuitBreaker, CircuitOpenError # Fail fast while OpenAI or Google Sheets is degraded
+from response_cache import AnswerCache, FeedbackReportStore, SharedResponseCache, answer_cache_key, feedback_cache_key # Interviewer answers and feedback reports shared across sessions and replicas
+from llm_runtime import LLMExecutor, LLMQueueFull, PRIORITY_FEEDBACK, PRIORITY_INTERACTIVE, RetryPolicy, SessionQuotaExceeded, SessionQuotas, is_retryable_error # Shared worker pool that runs all OpenAI calls off the script thread
 # from supabase import create_client, Client # No longer needed
 
 # --- Basic Logging Setup ---
@@ -23,8 +34,11 @@ class SessionIdFilter(logging.Filter):
         # Ensure session_id is always present on the record
         if not hasattr(record, 'session_id'):
             try:
+                # Background threads have no session; touching st.session_state there logs "missing ScriptRunContext"
+                if get_script_run_ctx(suppress_warning=True) is None:
+                    record.session_id = "N/A_Filter_Background"
                 # Attempt to get session_id only if session_state is available and has the necessary keys
-                if hasattr(st, 'session_state') and 'key_prefix' in st.session_state and f"{st.session_state.key_prefix}_session_id" in st.session_state:
+                elif hasattr(st, 'session_state') and 'key_prefix' in st.session_state and f"{st.session_state.key_prefix}_session_id" in st.session_state:
                     record.session_id = st.session_state.get(f"{st.session_state.key_prefix}_session_id", "N/A_Filter_Fallback")
                 else:
                     record.session_id = "N/A_Filter_NoPrefixOrSS" # Default if session_state or keys are missing
@@ -42,17 +56,20 @@ logging.basicConfig(
 )
 
 root_logger = logging.getLogger()
-# Ensure the filter is added only once to the root logger
-if not any(isinstance(f, SessionIdFilter) for f in root_logger.filters):
-    root_logger.addFilter(SessionIdFilter())
+# Ensure the filter is added only once to the root logger and its handlers.
+# Logger filters don't see records propagated from library loggers (httpx, openai), so the handlers need it too.
+# Matched by name because the class is redefined on every rerun.
+for _log_target in [root_logger, *root_logger.handlers]:
+    if not any(type(f).__name__ == "SessionIdFilter" for f in _log_target.filters):
+        _log_target.addFilter(SessionIdFilter())
 
 
 class SessionLogAdapter(logging.LoggerAdapter):
     def process(self, msg, kwargs):
         session_id = "N/A_Adapter" # Default
         try:
-            # Check if st.session_state exists and has the key_prefix
-            if hasattr(st, 'session_state') and st.session_state.get('key_prefix'):
+            # Check if st.session_state exists and has the key_prefix (only on a script thread, see SessionIdFilter)
+            if get_script_run_ctx(suppress_warning=True) is not None and hasattr(st, 'session_state') and st.session_state.get('key_prefix'):
                 prefix = st.session_state.key_prefix
                 session_id = st.session_state.get(f"{prefix}_session_id", "N/A_Adapter_NoSessionID")
             # If st.session_state is not available or key_prefix is missing, session_id remains "N/A_Adapter"
@@ -305,17 +322,69 @@ st.markdown("""
 
 
 # --- Configuration (OpenAI, Prompts) ---
-# [ Remains the same ]
+def parse_bool(value):
+    """Interprets config values like true/1/yes/on (any case) as True."""
+    return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "on")
+
+def get_config(key, default=None, cast=None):
+    """
+    Reads a setting from Streamlit secrets, then environment variables, else returns default.
+    If cast is given (e.g. int, float, parse_bool) the value is converted; bad values fall back to default.
+    """
+    value = default
+    try:
+        if key in st.secrets:
+            value = st.secrets[key]
+        else:
+            value = os.environ.get(key, default)
+    except Exception: # No secrets.toml configured
+        value = os.environ.get(key, default)
+    if cast is not None and value is not None:
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid value for setting {key}: {value!r}. Using default {default!r}.")
+            return default
+    return value
+
+# Connection pool and timeouts for the shared OpenAI client (override via secrets or environment).
+# The read timeout applies between streamed chunks, not to the whole response.
+OPENAI_MAX_CONNECTIONS = get_config("OPENAI_MAX_CONNECTIONS", 50, cast=int)
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = get_config("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20, cast=int)
+OPENAI_KEEPALIVE_EXPIRY = get_config("OPENAI_KEEPALIVE_EXPIRY", 60.0, cast=float)
+OPENAI_CONNECT_TIMEOUT = get_config("OPENAI_CONNECT_TIMEOUT", 5.0, cast=float)
+OPENAI_READ_TIMEOUT = get_config("OPENAI_READ_TIMEOUT", 60.0, cast=float)
+OPENAI_MAX_RETRIES = get_config("OPENAI_MAX_RETRIES", 0, cast=int) # SDK-level retries; chat calls are retried per skill by the LLM executor (see LLM Retries)
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key, max_connections, max_keepalive_connections, keepalive_expiry, connect_timeout, read_timeout, max_retries):
+    """
+    Creates one OpenAI client per process (and settings), shared by all sessions and reruns.
+    Its httpx pool keeps connections alive between calls instead of re-handshaking on every rerun.
+    DefaultHttpxClient keeps the SDK's own client defaults (e.g. follow_redirects) alongside these settings;
+    Limits/Timeout come from openai's re-exports so they always match the transport it was built with.
+    """
+    connection_limits = type(openai.DEFAULT_CONNECTION_LIMITS)
+    http_client = openai.DefaultHttpxClient(
+        limits=connection_limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections, keepalive_expiry=keepalive_expiry),
+        timeout=openai.Timeout(read_timeout, connect=connect_timeout),
+    )
+    logger.info(f"Created shared OpenAI client (max_connections={max_connections}, keepalive={max_keepalive_connections}/{keepalive_expiry}s, timeouts connect={connect_timeout}s read={read_timeout}s).")
+    return openai.OpenAI(api_key=api_key, http_client=http_client, max_retries=max_retries)
+
+def _shared_openai_client(api_key):
+    return get_openai_client(api_key, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS, OPENAI_KEEPALIVE_EXPIRY, OPENAI_CONNECT_TIMEOUT, OPENAI_READ_TIMEOUT, OPENAI_MAX_RETRIES)
+
 try:
     openai.api_key = st.secrets["OPENAI_API_KEY"]
-    client = openai.OpenAI(api_key=openai.api_key)
+    client = _shared_openai_client(openai.api_key)
     logger.info("Using API Key from Streamlit secrets.")
 except KeyError:
     logger.warning("API Key not found in Streamlit secrets, checking environment variable.")
     api_key_env = os.environ.get("OPENAI_API_KEY")
     if api_key_env:
         openai.api_key = api_key_env
-        client = openai.OpenAI(api_key=openai.api_key)
+        client = _shared_openai_client(openai.api_key)
         logger.info("Using API Key from environment variable.")
     else:
         logger.error("OpenAI API key not found in secrets or environment variable.")
@@ -326,10 +395,216 @@ except Exception as e:
     st.error(f"Error initializing OpenAI client: {e}")
     st.stop()
 
+# --- LLM Executor ---
+# All OpenAI calls run on one process-wide worker pool; scripts keep the returned handle and poll it.
+LLM_MAX_WORKERS = get_config("LLM_MAX_WORKERS", 16, cast=int) # Concurrent OpenAI calls across all sessions
+LLM_MAX_HEDGES = get_config("LLM_MAX_HEDGES", 4, cast=int) # Hedge requests in flight at once (0 disables hedging)
+LLM_POLL_INTERVAL = get_config("LLM_POLL_INTERVAL", 0.25, cast=float) # Seconds between UI polls of a running call
+# Admission control: calls wait in a bounded priority queue until these per-process budgets allow them.
+# Set to the account's OpenAI limits divided by the number of replicas (0 disables a limit).
+LLM_REQUESTS_PER_MINUTE = get_config("LLM_REQUESTS_PER_MINUTE", 500, cast=int)
+LLM_TOKENS_PER_MINUTE = get_config("LLM_TOKENS_PER_MINUTE", 200000, cast=int)
+LLM_BURST_SECONDS = get_config("LLM_BURST_SECONDS", 10.0, cast=float) # Budget that may be spent at once
+LLM_MAX_QUEUE = get_config("LLM_MAX_QUEUE", 200, cast=int) # Waiting calls before new ones are turned away
+LLM_BUSY_RETRY_SECONDS = get_config("LLM_BUSY_RETRY_SECONDS", 5.0, cast=float) # Feedback retries after this long when the queue was full
+# Per-session fairness quotas for interviewer turns (0 disables a limit)
+SESSION_CALLS_PER_MINUTE = get_config("SESSION_CALLS_PER_MINUTE", 10, cast=int)
+SESSION_TOKENS_LIMIT = get_config("SESSION_TOKENS_LIMIT", 200000, cast=int) # Estimated tokens per browser session
+SESSION_MAX_IN_FLIGHT = get_config("SESSION_MAX_IN_FLIGHT", 1, cast=int)
+# Circuit breakers: open after this many consecutive transient failures, retry after the recovery time
+OPENAI_BREAKER_FAILURES = get_config("OPENAI_BREAKER_FAILURES", 5, cast=int)
+OPENAI_BREAKER_RECOVERY_SECONDS = get_config("OPENAI_BREAKER_RECOVERY_SECONDS", 30.0, cast=float)
+SHEETS_BREAKER_FAILURES = get_config("SHEETS_BREAKER_FAILURES", 3, cast=int)
+SHEETS_BREAKER_RECOVERY_SECONDS = get_config("SHEETS_BREAKER_RECOVERY_SECONDS", 60.0, cast=float)
+
+def is_sheets_outage(error):
+    """True for Sheets errors that mean the service is degraded (429/5xx, timeouts, connection errors), not misconfigured."""
+    if isinstance(error, gspread.exceptions.APIError):
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        return status is None or status == 429 or status >= 500
+    return not isinstance(error, (KeyError, ValueError, gspread.exceptions.SpreadsheetNotFound))
+
+@st.cache_resource(show_spinner=False)
+def get_circuit_breaker(name, failure_threshold, recovery_timeout, _is_failure):
+    """Creates the process-wide breaker for one dependency (see circuit_breaker.CircuitBreaker); _is_failure picks the errors that count."""
+    return CircuitBreaker(name, failure_threshold=failure_threshold, recovery_timeout=recovery_timeout, is_failure=_is_failure)
+
+OPENAI_BREAKER = get_circuit_breaker("openai", OPENAI_BREAKER_FAILURES, OPENAI_BREAKER_RECOVERY_SECONDS, is_retryable_error)
+SHEETS_BREAKER = get_circuit_breaker("google_sheets", SHEETS_BREAKER_FAILURES, SHEETS_BREAKER_RECOVERY_SECONDS, is_sheets_outage)
+
+@st.cache_resource(show_spinner=False)
+def get_sheets_session(sheet_id, _credentials_info):
+    """Creates the process-wide feedback sheet session; it authorizes on first use (see sheets_session)."""
+    return SheetsSession(_credentials_info, sheet_id)
+
+# --- Feedback Sink ---
+# Where ratings are stored: "sheets" (the feedback Google Sheet) or "sqlite" (a local indexed table at FEEDBACK_SQLITE_PATH).
+FEEDBACK_SINK_KIND = get_config("FEEDBACK_SINK", "sheets", cast=lambda value: str(value).strip().lower())
+FEEDBACK_SQLITE_PATH = get_config("FEEDBACK_SQLITE_PATH", "chip_feedback.sqlite3")
+
+@st.cache_resource(show_spinner=False)
+def get_feedback_sink(kind, sqlite_path):
+    """
+    Creates the process-wide feedback sink (see feedback_sinks).
+    Secrets are resolved here, on the script thread: the outbox flusher writes through the sink from a background
+    thread, where st.secrets and cache_resource functions have no ScriptRunContext.
+    """
+    if kind == "sqlite": return SQLiteFeedbackSink(sqlite_path)
+    if kind != "sheets": logger.warning(f"Unknown FEEDBACK_SINK '{kind}', using Google Sheets.")
+    try:
+        session = get_sheets_session(st.secrets["GSHEET_ID"], st.secrets["google_credentials"])
+    except KeyError as e:
+        logger.error(f"Google Sheets settings (GSHEET_ID, google_credentials) are missing from secrets; feedback can't be written to the sheet: {type(e).__name__}")
+        session = None
+    return SheetsFeedbackSink(session, breaker=SHEETS_BREAKER)
+
+FEEDBACK_SINK = get_feedback_sink(FEEDBACK_SINK_KIND, FEEDBACK_SQLITE_PATH)
+
+# --- Feedback Outbox ---
+# Ratings are confirmed once stored locally; a background thread sends them to the sink in batches (see feedback_outbox).
+# The SQLite sink is already a fast local write, so it's used directly. An empty FEEDBACK_OUTBOX_PATH writes through too.
+FEEDBACK_OUTBOX_PATH = get_config("FEEDBACK_OUTBOX_PATH", "chip_feedback_outbox.sqlite3")
+FEEDBACK_FLUSH_BATCH_SIZE = get_config("FEEDBACK_FLUSH_BATCH_SIZE", 50, cast=int)
+FEEDBACK_FLUSH_INTERVAL_SECONDS = get_config("FEEDBACK_FLUSH_INTERVAL_SECONDS", 5.0, cast=float)
+
+@st.cache_resource(show_spinner=False)
+def get_feedback_outbox(path, sink_kind, batch_size, flush_interval, _sink):
+    """
+    Opens the process-wide feedback outbox and starts its flusher, or returns None if it is disabled or can't be opened.
+    _sink is the sink for sink_kind (unhashed; sink_kind keys the cache so a new kind gets a new outbox).
+    """
+    if not path or sink_kind == "sqlite": return None
+    try:
+        outbox = FeedbackOutbox(path, _sink.write_rows, batch_size=batch_size, flush_interval=flush_interval, is_transient=is_sheets_outage)
+    except Exception as e:
+        logger.exception(f"Feedback outbox unavailable at {path}, writing feedback directly: {e}")
+        return None
+    outbox.start()
+    return outbox
+
+FEEDBACK_OUTBOX = get_feedback_outbox(FEEDBACK_OUTBOX_PATH, FEEDBACK_SINK_KIND, FEEDBACK_FLUSH_BATCH_SIZE, FEEDBACK_FLUSH_INTERVAL_SECONDS, FEEDBACK_SINK)
+
+@st.cache_resource(show_spinner=False)
+def get_llm_executor(max_workers, max_hedges, max_queue, requests_per_minute, tokens_per_minute, burst_seconds, session_limits, _circuit_breaker):
+    """Creates the process-wide LLM worker pool (see llm_runtime.LLMExecutor)."""
+    session_quotas = SessionQuotas(*session_limits)
+    return LLMExecutor(max_workers=max_workers, name="chip-llm", max_queue=max_queue, requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute, burst_seconds=burst_seconds, session_quotas=session_quotas, circuit_breaker=_circuit_breaker, max_hedges=max_hedges)
+
+LLM_EXECUTOR = get_llm_executor(LLM_MAX_WORKERS, LLM_MAX_HEDGES, LLM_MAX_QUEUE, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_BURST_SECONDS, (SESSION_CALLS_PER_MINUTE, SESSION_TOKENS_LIMIT, SESSION_MAX_IN_FLIGHT), OPENAI_BREAKER)
+
+# --- LLM Retries ---
+# Per-skill retry/hedging policy (see llm_runtime.RetryPolicy). hedge_after should sit near the p95 time to
+# first token (first_token_p95_seconds in the executor stats). Feedback calls retry the same way but aren't hedged.
+# Override in secrets, e.g. [LLM_RETRY_POLICIES.Clarifying] hedge_after = 2.5, or as JSON in the environment.
+DEFAULT_RETRY_POLICY = {"max_attempts": 3, "base_delay": 0.5, "max_delay": 8.0, "hedge_after": None}
+SKILL_RETRY_POLICIES = {"Clarifying": {"hedge_after": 3.0}, "Hypothesis": {"hedge_after": 3.0}}
+
+def load_retry_policies():
+    """Builds a RetryPolicy per skill from the defaults above and any LLM_RETRY_POLICIES overrides ("default" applies to all skills)."""
+    overrides = get_config("LLM_RETRY_POLICIES", {})
+    if isinstance(overrides, str):
+        try: overrides = json.loads(overrides)
+        except ValueError: logger.warning("LLM_RETRY_POLICIES is not valid JSON, ignoring it."); overrides = {}
+    policies = {}
+    for skill in SKILLS:
+        settings = {**DEFAULT_RETRY_POLICY, **dict(overrides.get("default", {})), **SKILL_RETRY_POLICIES.get(skill, {}), **dict(overrides.get(skill, {}))}
+        try: policies[skill] = RetryPolicy(**settings)
+        except (TypeError, ValueError) as e: logger.warning(f"Invalid retry policy for {skill} ({settings}), using defaults: {e}"); policies[skill] = RetryPolicy(**DEFAULT_RETRY_POLICY)
+    return policies
+
+LLM_RETRY_POLICIES = load_retry_policies()
+
+# --- Interviewer Answer Cache ---
+# First-turn answers depend only on skill, case and question, so they're reused across sessions (see response_cache).
+ANSWER_CACHE_SKILLS = ("Clarifying", "Hypothesis")
+ANSWER_CACHE_MAX_ENTRIES = get_config("ANSWER_CACHE_MAX_ENTRIES", 2048, cast=int)
+ANSWER_CACHE_TTL_SECONDS = get_config("ANSWER_CACHE_TTL_SECONDS", 86400, cast=float)
+
+@st.cache_resource(show_spinner=False)
+def get_answer_cache(max_entries, ttl_seconds):
+    """Creates the process-wide interviewer answer cache."""
+    return AnswerCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+ANSWER_CACHE = get_answer_cache(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS)
+
+# --- Shared Response Cache ---
+# Second tier shared by all replicas: point RESPONSE_CACHE_PATH at a shared volume. An empty path disables it.
+RESPONSE_CACHE_PATH = get_config("RESPONSE_CACHE_PATH", "chip_response_cache.sqlite3")
+RESPONSE_CACHE_MAX_MB = get_config("RESPONSE_CACHE_MAX_MB", 256, cast=float)
+RESPONSE_CACHE_TTL_SECONDS = get_config("RESPONSE_CACHE_TTL_SECONDS", 7 * 86400, cast=float)
+
+@st.cache_resource(show_spinner=False)
+def get_shared_response_cache(path, max_mb, ttl_seconds):
+    """Opens the cross-replica response cache, or returns None if it is disabled or can't be opened."""
+    if not path: return None
+    try:
+        return SharedResponseCache(path, max_bytes=int(max_mb * 1024 * 1024), ttl_seconds=ttl_seconds)
+    except Exception as e:
+        logger.exception(f"Shared response cache unavailable at {path}, continuing without it: {e}")
+        return None
+
+SHARED_RESPONSE_CACHE = get_shared_response_cache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_MB, RESPONSE_CACHE_TTL_SECONDS)
+
+# Finished feedback reports are kept without expiry, so a lost or refreshed session replaying the same transcript
+# gets its report back without another feedback generation. They live in their own file, since the shared cache's
+# size cap only covers its own table; point it at the shared volume too so replicas share reports.
+FEEDBACK_STORE_PATH = get_config("FEEDBACK_STORE_PATH", "chip_feedback_reports.sqlite3")
+
+@st.cache_resource(show_spinner=False)
+def get_feedback_report_store(path):
+    """Opens the durable feedback report store, or returns None if it is disabled or can't be opened."""
+    if not path: return None
+    try:
+        return FeedbackReportStore(path)
+    except Exception as e:
+        logger.exception(f"Feedback report store unavailable at {path}, continuing without it: {e}")
+        return None
+
+FEEDBACK_STORE = get_feedback_report_store(FEEDBACK_STORE_PATH)
+# Only reports that open with the rating heading the feedback prompts require ("## Overall ... Rating: n/5") are stored
+FEEDBACK_REPORT_HEADER_RE = re.compile(r"\A##\s*Overall\b[^\n]*\bRating:\s*[1-5]\s*/\s*5")
+
+def get_cached_answer(cache_key):
+    """Looks up a first-turn answer in the process cache, then the shared cache (promoting shared hits)."""
+    cached_reply = ANSWER_CACHE.get(cache_key)
+    if cached_reply is None and SHARED_RESPONSE_CACHE is not None:
+        shared_reply = SHARED_RESPONSE_CACHE.get(cache_key)
+        if shared_reply is not None:
+            cached_reply = tuple(shared_reply)
+            ANSWER_CACHE.put(cache_key, cached_reply)
+    return cached_reply
+
+def put_cached_answer(cache_key, reply):
+    """Stores a first-turn (answer, assessment) in both cache tiers."""
+    ANSWER_CACHE.put(cache_key, reply)
+    if SHARED_RESPONSE_CACHE is not None: SHARED_RESPONSE_CACHE.put(cache_key, "answer", list(reply))
+
+# --- Interviewer History Budget ---
+# The budget covers the summary plus the verbatim turns. Earlier turns are folded into an extractive summary whose oldest lines are
+# dropped when it grows too long; the latest turns stay verbatim (see conversation_history).
+HISTORY_TOKEN_BUDGET = get_config("HISTORY_TOKEN_BUDGET", 1500, cast=int)
+HISTORY_KEEP_RECENT_TURNS = get_config("HISTORY_KEEP_RECENT_TURNS", 4, cast=int)
+
 # --- Load Prompts ---
-# [ Remains the same ]
+# Parsed once per process by a shared loader; reruns only stat the file.
+# If a packed store built by `python prompt_catalog.py build` exists, prompts are mmapped and decoded on demand.
+# PROMPT_CATALOG holds the id/skill indexes; ALL_PROMPTS/ALL_PROMPT_IDS are kept for existing callers.
 PROMPTS_FILE = "prompts.json"
 ALL_PROMPTS = []
+PROMPT_CATALOG = None
+# How exhibit tables are written into feedback prompts: "table" (padded, original) or "compact" (CSV).
+# Compare token cost first with `python prompt_catalog.py compare-tokens`.
+EXHIBIT_TEXT_FORMAT = str(get_config("EXHIBIT_TEXT_FORMAT", "table")).lower()
+if EXHIBIT_TEXT_FORMAT not in EXHIBIT_TEXT_FORMATS:
+    logger.warning(f"Unknown EXHIBIT_TEXT_FORMAT '{EXHIBIT_TEXT_FORMAT}', using 'table'.")
+    EXHIBIT_TEXT_FORMAT = "table"
+
+@st.cache_resource(show_spinner=False)
+def get_prompt_catalog_loader(prompts_path, exhibit_text_format):
+    """Returns the process-wide prompt loader for prompts_path (shared across sessions and reruns)."""
+    logger.info(f"Creating shared prompt catalog loader for: {prompts_path} (exhibit text format: {exhibit_text_format})")
+    return PromptCatalogLoader(prompts_path, exhibit_text_format=exhibit_text_format)
+
 try:
     script_dir = os.path.dirname(os.path.abspath(__file__))
     prompts_path = os.path.join(script_dir, PROMPTS_FILE)
@@ -337,18 +612,14 @@ try:
          logger.warning(f"Prompts file not found at {prompts_path}, trying current directory.")
          prompts_path = PROMPTS_FILE
 
-    logger.info(f"Attempting to load prompts from: {os.path.abspath(prompts_path)}")
-    with open(prompts_path, 'r', encoding='utf-8') as f:
-        ALL_PROMPTS = json.load(f)
-    if not isinstance(ALL_PROMPTS, list) or not all(isinstance(p, dict) and 'id' in p and 'prompt_text' in p for p in ALL_PROMPTS):
-         raise ValueError("Prompts JSON must be a list of dictionaries, each with 'id' and 'prompt_text' keys.")
-    ALL_PROMPT_IDS = [p['id'] for p in ALL_PROMPTS]
+    PROMPT_CATALOG = get_prompt_catalog_loader(os.path.abspath(prompts_path), EXHIBIT_TEXT_FORMAT).get()
+    ALL_PROMPTS, ALL_PROMPT_IDS = PROMPT_CATALOG.records, PROMPT_CATALOG.prompt_ids
     if not ALL_PROMPT_IDS:
         logger.error("No prompts found in prompts.json!")
         st.error("Error: No prompts found in prompts.json!")
         ALL_PROMPTS = [{"id": "default_error", "title": "Default Prompt (Error Loading File)", "prompt_text": "Error: Could not load prompts correctly from prompts.json."}]
         ALL_PROMPT_IDS = ["default_error"]
-    logger.info(f"Loaded {len(ALL_PROMPTS)} prompts successfully.")
+    logger.debug(f"Using {len(ALL_PROMPTS)} prompts from shared catalog.")
 except FileNotFoundError:
     logger.error(f"{PROMPTS_FILE} not found!")
     st.error(f"Error: {PROMPTS_FILE} not found! Ensure it's in the same directory as the script or provide the correct path.")
@@ -364,6 +635,8 @@ except Exception as e:
     st.error(f"An unexpected error occurred loading prompts: {e}")
     ALL_PROMPTS = [{"id": "default_unknown_error", "title": "Default Prompt (Unknown Error)", "prompt_text": "Error: Unknown error loading prompts."}]
     ALL_PROMPT_IDS = ["default_unknown_error"]
+if PROMPT_CATALOG is None or not PROMPT_CATALOG.prompt_ids:
+    PROMPT_CATALOG = PromptCatalog(ALL_PROMPTS) # Index the fallback prompt so lookups behave the same
 
 
 # --- Helper Functions ---
@@ -382,9 +655,15 @@ def reset_skill_state():
         'hypothesis_count',
         'analysis_input',
         'current_exhibit_index', # Added for Analysis skill
-        'recommendation_input' # Added for Recommendation skill
+        'recommendation_input', # Added for Recommendation skill
+        'pending_reply', 'feedback_call', 'feedback_retry_at', 'feedback_cache_key', 'chat_history' # Background LLM calls (see send_question, generate_final_feedback)
     ]
     logger.info(f"Resetting state keys: {keys_to_reset}")
+    # Stop background LLM calls that belong to the run being discarded
+    pending_reply = st.session_state.get(f"{prefix}_pending_reply")
+    if pending_reply: pending_reply["call"].cancel()
+    feedback_call = st.session_state.get(f"{prefix}_feedback_call")
+    if feedback_call: feedback_call.cancel()
     for key in keys_to_reset:
         full_key = f"{prefix}_{key}"
         if full_key in st.session_state:
@@ -414,8 +693,9 @@ def reset_skill_state():
 # --- UPDATED: Function to Save User Feedback via Google Sheets ---
 def save_user_feedback(feedback_data):
     """
-    Saves the user feedback to the configured Google Sheet.
+    Saves the user feedback to the configured feedback sink (the Google Sheet by default, see FEEDBACK_SINK).
     Uses Sheet ID for robustness.
+    With the feedback outbox enabled the row is only stored locally here; the outbox flusher writes it to the sink.
     """
     prefix = st.session_state.key_prefix
     session_id = st.session_state.get(f"{prefix}_session_id", "N/A")
@@ -426,42 +706,37 @@ def save_user_feedback(feedback_data):
     timestamp = datetime.datetime.fromtimestamp(feedback_data.get("timestamp", time.time())).isoformat()
 
     log_message = (
-        f"Attempting to save USER_FEEDBACK via Google Sheets :: Skill: {selected_skill}, "
+        f"Attempting to save USER_FEEDBACK via {FEEDBACK_SINK.name} :: Skill: {selected_skill}, "
         f"PromptID: {prompt_id}, Rating: {rating}, Comment: '{comment}'"
     )
     logger.info(log_message)
 
+    # Prepare data row - ORDER MATTERS, must match your sheet columns
+    # Example order: Timestamp, SessionID, Skill, PromptID, Rating, Comment
+    row_to_insert = [
+        timestamp,
+        session_id,
+        selected_skill,
+        prompt_id,
+        rating if rating is not None else "", # Handle potential None rating
+        comment
+    ]
+
     try:
-        # Get Google Sheet credentials and sheet ID from secrets
-        creds_dict = st.secrets["google_credentials"]
-        sheet_id = st.secrets["GSHEET_ID"] # Use Sheet ID now
-        scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive.file']
-        creds = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-        gc = gspread.authorize(creds)
-
-        # Open the spreadsheet by its unique ID
-        spreadsheet = gc.open_by_key(sheet_id)
-        logger.info(f"Opened Google Sheet with ID: {sheet_id}")
-        # Assume data goes into the first worksheet
-        worksheet = spreadsheet.get_worksheet(0)
-
-        # Prepare data row - ORDER MATTERS, must match your sheet columns
-        # Example order: Timestamp, SessionID, Skill, PromptID, Rating, Comment
-        row_to_insert = [
-            timestamp,
-            session_id,
-            selected_skill,
-            prompt_id,
-            rating if rating is not None else "", # Handle potential None rating
-            comment
-        ]
-
-        # Append the row
-        worksheet.append_row(row_to_insert, value_input_option='USER_ENTERED')
-
-        logger.info(f"Successfully saved feedback to Google Sheet ID '{sheet_id}' for SessionID: {session_id}")
+        if FEEDBACK_OUTBOX is not None:
+            FEEDBACK_OUTBOX.enqueue(row_to_insert)
+            logger.info(f"Queued feedback for {FEEDBACK_SINK.name} for SessionID: {session_id}")
+            return True
+
+        # No outbox: write the row now
+        FEEDBACK_SINK.write_rows([row_to_insert])
+        logger.info(f"Successfully saved feedback to {FEEDBACK_SINK.name} for SessionID: {session_id}")
         return True
 
+    except CircuitOpenError as e:
+        logger.warning(f"Skipped saving feedback: {e}")
+        st.error(f"Saving feedback is temporarily unavailable because Google Sheets is not responding. Please try again in {math.ceil(e.retry_after)} seconds.")
+        return False
     except KeyError as e:
         logger.error(f"Missing required Google Sheets configuration in Streamlit secrets: {e}")
         st.error(f"Configuration error: Missing Google Sheets setting '{e}' in secrets. Check GSHEET_ID and google_credentials.")
@@ -475,6 +750,10 @@ def save_user_feedback(feedback_data):
          except: # If parsing fails, show the raw error
              st.error(f"Google API Error saving feedback: {e}")
          return False
+    except sqlite3.Error as e:
+        logger.exception(f"Could not store feedback locally: {e}")
+        st.error(f"Error saving feedback: {e}")
+        return False
     except gspread.exceptions.SpreadsheetNotFound:
         # This error might still occur if the ID is wrong or sharing is incorrect
         logger.error(f"Google Sheet with ID '{st.secrets.get('GSHEET_ID', 'MISSING_ID')}' not found or not shared correctly.")
@@ -486,94 +765,82 @@ def save_user_feedback(feedback_data):
         return False
 
 
-# --- Other Helper Functions (select_new_prompt, get_prompt_details, parse_interviewer_response, send_question, generate_final_feedback) ---
+# --- Other Helper Functions (select_new_prompt, get_prompt_details, send_question, generate_final_feedback) ---
 def select_new_prompt():
-    """Selects a new random prompt for the current skill, avoiding session repeats if possible."""
+    """Selects the next prompt for the current skill from the session's shuffled deck, so prompts repeat only after all were seen."""
     prefix = st.session_state.key_prefix
-    used_ids_key = f"{prefix}_used_prompt_ids"
     current_prompt_id_key = f"{prefix}_current_prompt_id"
     selected_skill = st.session_state.get(f"{prefix}_selected_skill", SKILLS[0])
 
-    init_session_state_key('used_prompt_ids', []) # Ensure it exists
+    init_session_state_key('prompt_decks', {}) # Skill -> PromptDeck (see prompt_catalog)
 
-    # Filter prompts by the currently selected skill
-    skill_prompts = [p for p in ALL_PROMPTS if p.get('skill_type') == selected_skill]
-    if not skill_prompts:
+    # Prompt ids for the currently selected skill (pre-indexed in the catalog). prompts.json repeats a few ids;
+    # each one is dealt once per round, as the old used-ids selection did.
+    skill_prompt_ids = tuple(dict.fromkeys(PROMPT_CATALOG.ids_for_skill(selected_skill)))
+    if not skill_prompt_ids:
         logger.error(f"No prompts found for skill: {selected_skill}")
         st.error(f"Error: No prompts found for the selected skill '{selected_skill}'. Please check prompts.json.")
         return None
 
-    skill_prompt_ids = [p['id'] for p in skill_prompts]
-    available_prompt_ids = [pid for pid in skill_prompt_ids if pid not in st.session_state[used_ids_key]]
-
-    if not available_prompt_ids:
+    deck = st.session_state[f"{prefix}_prompt_decks"].setdefault(selected_skill, PromptDeck())
+    selected_id, reshuffled = deck.draw(skill_prompt_ids, PROMPT_CATALOG.version)
+    if reshuffled:
         logger.warning(f"All prompts for skill '{selected_skill}' seen in this session, allowing repeats.")
         st.info("You've seen all available prompts for this skill in this session! Allowing repeats now.")
-        # Reset used IDs *only* for this skill's prompts to allow repeats
-        st.session_state[used_ids_key] = [pid for pid in st.session_state[used_ids_key] if pid not in skill_prompt_ids]
-        available_prompt_ids = skill_prompt_ids
-        if not available_prompt_ids: # Should not happen if skill_prompts was not empty
-            logger.error(f"Cannot select prompt - prompt list for skill '{selected_skill}' is empty even after reset.")
-            st.error(f"Cannot select prompt - prompt list for skill '{selected_skill}' is empty.")
-            return None
-
-    selected_id = random.choice(available_prompt_ids)
-    st.session_state[used_ids_key].append(selected_id)
+
     st.session_state[current_prompt_id_key] = selected_id
     logger.info(f"Selected Prompt ID: {selected_id} for skill {selected_skill}")
     return selected_id
 
 def get_prompt_details(prompt_id):
-    """Retrieves prompt details from the loaded list using its ID."""
+    """Retrieves prompt details from the catalog's id index."""
     if not prompt_id: return None
-    for prompt in ALL_PROMPTS:
-        if prompt.get('id') == prompt_id:
-            return prompt
+    prompt = PROMPT_CATALOG.get(prompt_id)
+    if prompt is not None:
+        return prompt
     logger.warning(f"Prompt ID '{prompt_id}' not found in loaded prompts.")
     return None
 
-def parse_interviewer_response(response_text, skill):
+# --- Exhibit Rendering (Analysis) ---
+EXHIBIT_RENDER_CACHE_SIZE = 256 # Built exhibits kept per process (LRU)
+
+@st.cache_resource(max_entries=EXHIBIT_RENDER_CACHE_SIZE, show_spinner=False)
+def get_exhibit_render(catalog_version, prompt_id, exhibit_index, _exhibit):
     """
-    Parses the LLM response based on the skill.
+    Process-wide LRU cache of built exhibits, keyed by (catalog version, prompt id, exhibit index).
+    The catalog version changes on every reload, so entries from an old catalog are never served
+    and age out of the LRU. Cached figures are shared across sessions and must not be mutated.
     """
-    # Default values
-    answer = response_text.strip() if response_text else "[Empty Response]"
-    assessment = None
-
-    # Use new skill names for checks
-    # Recommendation feedback should also be structured
-    if skill in ["Clarifying", "Frameworks", "Analysis", "Recommendation"]:
-        answer_match = re.search(r"###ANSWER###\s*(.*?)\s*###ASSESSMENT###", response_text, re.DOTALL | re.IGNORECASE)
-        assessment_match = re.search(r"###ASSESSMENT###\s*(.*)", response_text, re.DOTALL | re.IGNORECASE)
-        if answer_match: answer = answer_match.group(1).strip()
-        if assessment_match: assessment = assessment_match.group(1).strip()
-        # Simplified logging for brevity during debug
-        if not answer_match and not assessment_match and response_text: answer = response_text.strip(); assessment = "[Assessment not extracted]"
-        elif answer_match and not assessment_match: assessment = "[Assessment delimiter missing]"
-        elif not answer_match and assessment_match: answer = "[Answer delimiter missing]"
-        elif not response_text or not response_text.strip(): answer = "[LLM empty response]"; assessment = "[LLM empty response]"
-
-    elif skill == "Hypothesis":
-        # For hypothesis interaction, return the whole response as the "answer"
-        # Remove potential delimiters if the LLM accidentally includes them
-        answer = re.sub(r"###ANSWER###", "", answer, flags=re.IGNORECASE)
-        answer = re.sub(r"###ASSESSMENT###", "", answer, flags=re.IGNORECASE).strip()
-        assessment = None # No assessment during hypothesis interaction
-        if not answer:
-            logger.warning("LLM returned empty response for Hypothesis Formulation interaction.")
-            answer = "[CHIP did not provide further information]"
-
-    else:
-        logger.warning(f"Parsing response for unknown or unhandled skill: {skill}. Returning raw text.")
-        # Keep raw text as answer, assessment remains None
+    logger.info(f"Building exhibit {exhibit_index + 1} figure for PromptID: {prompt_id} (catalog version {catalog_version}).")
+    return build_exhibit_render(_exhibit, exhibit_index + 1)
 
-    return answer, assessment
+def interviewer_chat_message(skill, msg):
+    """Converts one conversation entry to a chat message, replaying interviewer turns in the format the model was asked for."""
+    if msg.get("role") != "interviewer": return {"role": "user", "content": msg.get("content", "")}
+    if skill == "Clarifying": return {"role": "assistant", "content": f"###ANSWER###\n{msg.get('content', '')}\n###ASSESSMENT###\n{msg.get('assessment') or ''}"}
+    return {"role": "assistant", "content": msg.get("content", "")}
 
+def sync_interviewer_history(skill):
+    """
+    Returns the chat messages for every conversation turn before the latest input.
+    The history is kept in session state and only extended: finished turns never change, so each
+    request converts just the turns added since. Past HISTORY_TOKEN_BUDGET (summary included), older
+    turns are folded into a rolling summary that leads the returned messages.
+    """
+    prefix = st.session_state.key_prefix
+    history_key = f"{prefix}_chat_history"
+    if st.session_state.get(history_key) is None:
+        st.session_state[history_key] = InterviewerHistory(functools.partial(interviewer_chat_message, skill), token_budget=HISTORY_TOKEN_BUDGET, keep_recent_turns=HISTORY_KEEP_RECENT_TURNS)
+    chat_history = st.session_state[history_key]
+    chat_history.sync(st.session_state.get(f"{prefix}_conversation", [])[:-1])
+    return chat_history.request_messages()
 
 def send_question(question, current_case_prompt_text, exhibit_context=None):
     """
-    Sends user question/input to LLM, gets response based on skill, updates conversation state.
+    Sends user question/input to LLM based on skill and updates conversation state.
     Includes optional exhibit_context for Analysis skill.
+    The call is queued on the shared LLM executor and the script reruns right away; the UI shows the
+    answer as it streams (render_pending_reply) and collect_interviewer_reply() stores it once finished.
     NOTE: This function is NO LONGER used for the main interaction loop of Analysis or Recommendation.
           It's kept for Clarifying Questions and Hypothesis Formulation.
     """
@@ -583,7 +850,7 @@ def send_question(question, current_case_prompt_text, exhibit_context=None):
     selected_skill = st.session_state.get(f"{prefix}_selected_skill", "N/A")
     prompt_id = st.session_state.get(f"{prefix}_current_prompt_id", "N/A")
     hypothesis_count_key = f"{prefix}_hypothesis_count" # Key for hypothesis counter
-    done_key = f"{prefix}_done_asking" # Key to end session
+    pending_reply_key = f"{prefix}_pending_reply" # Background call awaiting the interviewer's answer
 
     if not question or not question.strip(): st.warning("Please enter your input."); logger.warning("User attempted to send empty input."); return
     if not current_case_prompt_text: st.error("Internal Error: No case prompt context."); logger.error("Internal Error: send_question called without case_prompt_text."); return
@@ -600,31 +867,38 @@ def send_question(question, current_case_prompt_text, exhibit_context=None):
         st.session_state[hypothesis_count_key] = current_hypothesis_count
         logger.info(f"Hypothesis count incremented to: {current_hypothesis_count}")
 
+    # Without earlier turns the answer can't contradict anything, so a cached answer to the same question can be served
+    cache_key = None
+    if selected_skill in ANSWER_CACHE_SKILLS and len(st.session_state[conv_key]) == 1:
+        cache_key = answer_cache_key(selected_skill, prompt_id, current_case_prompt_text, question)
+        cached_reply = get_cached_answer(cache_key)
+        if cached_reply is not None:
+            logger.info(f"Skill: {selected_skill}, PromptID: {prompt_id} - Serving cached interviewer answer.")
+            interviewer_answer, interviewer_assessment = cached_reply
+            st.session_state[conv_key].append({"role": "interviewer", "content": interviewer_answer, "assessment": interviewer_assessment})
+            st.session_state[is_typing_key] = False
+            st.rerun()
 
     try:
-        history_for_prompt = "\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in st.session_state.get(conv_key, [])[:-1]]) # History *before* current input
+        # Stable system+case prefix, then the earlier turns as native chat messages and the latest input last.
+        # Consecutive turns share a byte-identical prefix, so the provider's prompt cache can reuse it.
+        history_messages = sync_interviewer_history(selected_skill) # Turns *before* current input
         latest_input = question # The user's latest question or hypothesis
 
         # --- Define LLM Prompt based on Skill ---
-        prompt_for_llm = ""
         system_message = ""
         max_tokens = 350 # Default
         temperature = 0.5 # Default
 
         if selected_skill == "Clarifying": # Use new skill name
-            prompt_for_llm = f"""
+            system_message = f"""
             You are a **strict** case interviewer simulator focusing ONLY on the clarifying questions phase. Evaluate questions **rigorously**.
+            Each user message is the interviewee's next clarifying question; your earlier replies are in the conversation.
 
             Current Case Prompt Context:
             {current_case_prompt_text}
 
-            Conversation History So Far:
-            {history_for_prompt}
-
-            Interviewee's Latest Question:
-            {latest_input}
-
-            Your Task:
+            Your Task, for the interviewee's latest question:
             1. Provide a concise, helpful answer... [rest of Task 1 remains the same - plausible answers etc.] ...**Crucially, maintain consistency with any previous answers you've given in this conversation.**
             2. Assess the quality of *this specific question* **rigorously** based on the following categories of effective clarifying questions:
                 * **Objective Clarification:** Does it clarify the case goal/problem statement?
@@ -640,20 +914,25 @@ def send_question(question, current_case_prompt_text, exhibit_context=None):
             ###ASSESSMENT###
             [Your brief but rigorous assessment of the question's quality based on the criteria above]
             """
-            system_message = "You are a strict case interview simulator for clarifying questions. Evaluate questions rigorously based on specific categories (Objective, Company, Terms, Repetition, Quality). Provide plausible answers if needed. Use the specified response format."
+            # Role summary kept first, as in the original system message
+            system_message = "You are a strict case interview simulator for clarifying questions. Evaluate questions rigorously based on specific categories (Objective, Company, Terms, Repetition, Quality). Provide plausible answers if needed. Use the specified response format.\n" + system_message
             # --- End of Reverted Prompt ---
             max_tokens = 350
             temperature = 0.5
 
         elif selected_skill == "Hypothesis": # Use new skill name
             # --- Refined Interaction Prompt v4 (Hypothesis) ---
-            prompt_for_llm = f"""
+            system_message = f"""
             You are playing the role of a case interviewer providing data/information in response to a candidate's hypothesis.
             The candidate is trying to diagnose an issue based on the case prompt.
+            Each user message is the candidate's latest hypothesis/area to investigate; your earlier replies are in the conversation.
+
+            Case Prompt Context:
+            {current_case_prompt_text}
 
-            **Your Task:** Respond to the "Candidate's Latest Hypothesis/Area to Investigate" below.
+            **Your Task:** Respond to the candidate's latest message.
 
-            * **IF** the candidate's input ("{latest_input}") is a reasonable, testable hypothesis related to the case context ("{current_case_prompt_text}"):
+            * **IF** the candidate's input is a reasonable, testable hypothesis related to the case context:
                 * Provide a concise (1-2 sentences) piece of plausible, new information that *contradicts* their current line of thinking or suggests it's not the primary driver of the issue.
                 * This information should be consistent with any previous information you've provided.
                 * Sound like a neutral source of data.
@@ -671,16 +950,8 @@ def send_question(question, current_case_prompt_text, exhibit_context=None):
             - Do NOT ask clarifying questions back to the candidate.
             - Do NOT solve the case or reveal the true cause.
             - Your entire response must be ONLY the direct text of the contradictory information OR the polite redirection.
-
-            Conversation History (Previous hypotheses and info provided):
-            {history_for_prompt}
-
-            Candidate's Latest Hypothesis/Area to Investigate:
-            {latest_input}
-
-            Your Response:
             """
-            system_message = "You are a case interviewer. If the user provides a reasonable hypothesis, give concise contradictory info. If the input is not a reasonable hypothesis (e.g., nonsensical, vague, irrelevant), politely ask for a clearer, relevant hypothesis. Be neutral, do not assess, do not use special formatting."
+            system_message = "You are a case interviewer. If the user provides a reasonable hypothesis, give concise contradictory info. If the input is not a reasonable hypothesis (e.g., nonsensical, vague, irrelevant), politely ask for a clearer, relevant hypothesis. Be neutral, do not assess, do not use special formatting.\n" + system_message
             # --- End of Refined Prompt v4 ---
             max_tokens = 150
             temperature = 0.3
@@ -704,57 +975,128 @@ def send_question(question, current_case_prompt_text, exhibit_context=None):
             st.rerun()
             return
 
-        # Call LLM API
-        # logger.debug(f"LLM Prompt:\n{prompt_for_llm}")
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", messages=[{"role": "system", "content": system_message}, {"role": "user", "content": prompt_for_llm}],
+        # Queue the LLM call; this script run ends here and later reruns poll the handle
+        # logger.debug(f"LLM System Prompt:\n{system_message}")
+        call = LLM_EXECUTOR.submit_chat(
+            client, label=f"{selected_skill}:{prompt_id}", priority=PRIORITY_INTERACTIVE, session_id=st.session_state.get(f"{prefix}_session_id"),
+            retry_policy=LLM_RETRY_POLICIES.get(selected_skill),
+            model="gpt-4o-mini", messages=[{"role": "system", "content": system_message}, *history_messages, {"role": "user", "content": latest_input}],
             max_tokens=max_tokens,
             temperature=temperature,
             stream=True
         )
-        full_response = ""
-        with st.spinner(f"CHIP is processing..."):
-             for chunk in response:
-                 if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
-                     full_response += chunk.choices[0].delta.content
-
-        # Parse response based on expected format (skill specific)
-        interviewer_answer, interviewer_assessment = parse_interviewer_response(full_response, selected_skill)
-
-        logger.info(f"Skill: {selected_skill}, PromptID: {prompt_id} - LLM Response: '{interviewer_answer[:100]}...'")
-        if interviewer_assessment:
-             logger.info(f"Skill: {selected_skill}, PromptID: {prompt_id} - LLM Assessment: '{interviewer_assessment[:100]}...'")
+        st.session_state[pending_reply_key] = {"call": call, "parser": StreamingResponseParser(selected_skill), "cursor": 0, "hypothesis_count": current_hypothesis_count, "cache_key": cache_key}
 
-        # Store the response
+    except (LLMQueueFull, SessionQuotaExceeded, CircuitOpenError) as e:
+        # Turned away before reaching the API: undo this turn so the candidate can resend it
+        logger.warning(f"Skill: {selected_skill}, PromptID: {prompt_id} - Input not sent: {e}")
+        withdraw_unanswered_turn(e, current_hypothesis_count)
+        return
+    except Exception as e:
+        logger.exception(f"Error generating LLM response: {e}")
+        st.error(f"Error generating response: {e}")
         st.session_state.setdefault(conv_key, []).append({
-            "role": "interviewer",
-            "content": interviewer_answer,
-            "assessment": interviewer_assessment
+            "role": "interviewer", "content": f"Sorry, an error occurred... ({type(e).__name__})", "assessment": None
         })
+        st.session_state[is_typing_key] = False
+    st.rerun() # Rerun to display the question and start polling for the answer
 
-        # Check if Hypothesis Formulation limit is reached
-        if selected_skill == "Hypothesis" and current_hypothesis_count >= 3: # Use new skill name
-            logger.info("Hypothesis limit reached (3). Ending session.")
-            st.session_state[done_key] = True
-            st.session_state.setdefault(conv_key, []).append({ "role": "interviewer", "content": "(Maximum hypotheses reached. Moving to feedback.)", "assessment": None })
+def withdraw_unanswered_turn(error, hypothesis_count):
+    """
+    Takes the candidate's latest input back out of the conversation after the interviewer couldn't answer it
+    (turned away at submit time, circuit open, or transient API errors that outlasted the retries), so
+    nothing is shown to the model or written to the feedback transcript for it. Warns the candidate to resend.
+    """
+    prefix = st.session_state.key_prefix
+    conversation = st.session_state.get(f"{prefix}_conversation", [])
+    if conversation and conversation[-1].get("role") == "interviewee": conversation.pop()
+    if st.session_state.get(f"{prefix}_selected_skill") == "Hypothesis": st.session_state[f"{prefix}_hypothesis_count"] = hypothesis_count - 1
+    st.session_state[f"{prefix}_is_typing"] = False
+    if isinstance(error, LLMQueueFull): st.warning("CHIP is handling a lot of requests right now. Please send your input again in a moment.")
+    elif isinstance(error, CircuitOpenError): st.warning(f"CHIP's AI service is having trouble right now. Please send your input again in {math.ceil(error.retry_after)} seconds.")
+    elif isinstance(error, SessionQuotaExceeded) and error.reason == "tokens": st.warning("You've reached the practice limit for this session. Please come back later to continue practicing.")
+    elif isinstance(error, SessionQuotaExceeded) and error.reason == "rate": st.warning(f"Slow down! You're sending inputs faster than CHIP allows. Please wait {math.ceil(error.retry_after)} seconds and try again.")
+    elif isinstance(error, SessionQuotaExceeded): st.warning("Slow down! Please wait for CHIP's answer before sending your next input.")
+    else: st.warning("CHIP's AI service couldn't answer just now. Please send your input again.")
+
+def _advance_pending_reply(pending):
+    """Feeds text that arrived since the last poll to the reply's parser; returns the answer so far."""
+    chunks, pending["cursor"] = pending["call"].chunks_since(pending["cursor"])
+    for chunk in chunks: pending["parser"].feed(chunk)
+    return pending["parser"].answer_so_far()
+
+def collect_interviewer_reply():
+    """
+    Moves a finished background interviewer call (queued by send_question) into the conversation.
+    Returns True while the call is still running.
+    """
+    prefix = st.session_state.key_prefix
+    conv_key = f"{prefix}_conversation"; is_typing_key = f"{prefix}_is_typing"; done_key = f"{prefix}_done_asking"
+    pending_reply_key = f"{prefix}_pending_reply"
+    selected_skill = st.session_state.get(f"{prefix}_selected_skill", "N/A")
+    prompt_id = st.session_state.get(f"{prefix}_current_prompt_id", "N/A")
+    pending = st.session_state.get(pending_reply_key)
+    if not pending: return False
+    if not pending["call"].done(): return True
+    del st.session_state[pending_reply_key]
 
-        # Analysis skill ending is handled in its UI function
+    try:
+        pending["call"].result()
+        _advance_pending_reply(pending)
+        # Parse response based on expected format (skill specific)
+        interviewer_answer, interviewer_assessment = pending["parser"].finish()
 
+        logger.info(f"Skill: {selected_skill}, PromptID: {prompt_id} - LLM Response: '{interviewer_answer[:100]}...'")
+        if interviewer_assessment:
+             logger.info(f"Skill: {selected_skill}, PromptID: {prompt_id} - LLM Assessment: '{interviewer_assessment[:100]}...'")
+        # Cache well-formed first-turn answers; "[...]" placeholders mark protocol/empty-response fallbacks
+        if pending.get("cache_key") and not interviewer_answer.startswith("[") and not (interviewer_assessment or "").startswith("["):
+            put_cached_answer(pending["cache_key"], (interviewer_answer, interviewer_assessment))
     except Exception as e:
+        if isinstance(e, CircuitOpenError) or is_retryable_error(e):
+            # The API was down or kept failing: the turn was never answered, so the candidate resends it
+            logger.warning(f"Skill: {selected_skill}, PromptID: {prompt_id} - No answer for input: {e!r}")
+            withdraw_unanswered_turn(e, pending["hypothesis_count"])
+            return False
         logger.exception(f"Error generating LLM response: {e}")
         st.error(f"Error generating response: {e}")
-        st.session_state.setdefault(conv_key, []).append({
-            "role": "interviewer", "content": f"Sorry, an error occurred... ({type(e).__name__})", "assessment": None
-        })
-    finally:
-        st.session_state[is_typing_key] = False
-        st.rerun() # Rerun to display new message and potentially the feedback section if done_key was set
+        interviewer_answer, interviewer_assessment = f"Sorry, an error occurred... ({type(e).__name__})", None
+
+    # Store the response
+    st.session_state.setdefault(conv_key, []).append({
+        "role": "interviewer",
+        "content": interviewer_answer,
+        "assessment": interviewer_assessment
+    })
+
+    # Check if Hypothesis Formulation limit is reached
+    if selected_skill == "Hypothesis" and pending["hypothesis_count"] >= 3: # Use new skill name
+        logger.info("Hypothesis limit reached (3). Ending session.")
+        st.session_state[done_key] = True
+        st.session_state.setdefault(conv_key, []).append({ "role": "interviewer", "content": "(Maximum hypotheses reached. Moving to feedback.)", "assessment": None })
+
+    # Analysis skill ending is handled in its UI function
+    st.session_state[is_typing_key] = False
+    return False
+
+@st.fragment(run_every=LLM_POLL_INTERVAL)
+def render_pending_reply():
+    """Shows the interviewer's answer as it streams in; reruns the whole app once the call finishes."""
+    pending = st.session_state.get(f"{st.session_state.key_prefix}_pending_reply")
+    if not pending: return
+    if pending["call"].done(): st.rerun()
+    with st.chat_message("assistant"): st.markdown(_advance_pending_reply(pending) + " ▌")
+
+STREAM_FEEDBACK = get_config("STREAM_FEEDBACK", True, cast=parse_bool) # Render feedback reports progressively
 
 def generate_final_feedback(current_case_prompt_text):
     """
     Generates overall feedback markdown based on the conversation history.
+    The call runs on the shared LLM executor: while it is running, progress is rendered where the report
+    will appear (render_feedback_progress) and the rest of the script is skipped. Once it finishes, the
+    report is stored and returned, so the caller renders the final text as before.
     """
-    prefix = st.session_state.key_prefix; conv_key = f"{prefix}_conversation"; feedback_key = f"{prefix}_feedback"
+    prefix = st.session_state.key_prefix; conv_key = f"{prefix}_conversation"; feedback_key = f"{prefix}_feedback"; feedback_call_key = f"{prefix}_feedback_call"
     feedback_submitted_key = f"{prefix}_feedback_submitted"; selected_skill = st.session_state.get(f"{prefix}_selected_skill", "N/A")
     prompt_id = st.session_state.get(f"{prefix}_current_prompt_id", "N/A") # Corrected key
     logger.info(f"Skill: {selected_skill}, PromptID: {prompt_id} - Attempting to generate final feedback.")
@@ -762,6 +1104,13 @@ def generate_final_feedback(current_case_prompt_text):
     feedback_submitted = st.session_state.get(feedback_submitted_key, False)
     if feedback_submitted: logger.info("Skipping feedback gen: Feedback already submitted by user."); return existing_feedback
     if existing_feedback is not None: logger.info("Skipping feedback gen: Feedback key exists and is not None."); return existing_feedback
+    feedback_call = st.session_state.get(feedback_call_key)
+    if feedback_call is not None:
+        if not feedback_call.done(): render_feedback_progress(); st.stop()
+        return _finish_feedback_call(feedback_call)
+    feedback_retry_key = f"{prefix}_feedback_retry_at"
+    if time.time() < st.session_state.get(feedback_retry_key, 0): render_feedback_progress(); st.stop() # Waiting to retry after a full queue
+    st.session_state.pop(feedback_retry_key, None)
 
     # Format history based on skill
     history_string = ""
@@ -799,22 +1148,8 @@ def generate_final_feedback(current_case_prompt_text):
     elif selected_skill == "Analysis": # Use new skill name
         analysis_parts = []
         current_prompt_details = get_prompt_details(st.session_state.get(f"{prefix}_current_prompt_id")) # Use full key
-        exhibits_data_for_llm = []
-        if current_prompt_details and current_prompt_details.get("exhibits"):
-            for idx, ex in enumerate(current_prompt_details["exhibits"]):
-                ex_title = ex.get("exhibit_title", f"Exhibit {idx+1}")
-                ex_desc = ex.get("description", "")
-                ex_data_summary = ""
-                if ex.get("data"):
-                    try:
-                        df = pd.DataFrame(ex.get("data"))
-                        ex_data_summary = f"Data for {ex_title}:\n{df.to_string(index=False)}\n"
-                    except Exception as e:
-                        ex_data_summary = f"Data for {ex_title}: Error processing data.\n"
-                elif ex.get("summary_text"):
-                    ex_data_summary = f"Summary Text for {ex_title}:\n{ex.get('summary_text')}\n"
-                exhibits_data_for_llm.append(f"{ex_title}\n{ex_desc}\n{ex_data_summary}")
-        exhibit_context_for_feedback = "\n\n".join(exhibits_data_for_llm)
+        # Exhibit text is rendered once when the catalog loads (see prompt_catalog.format_exhibit_context)
+        exhibit_context_for_feedback = (current_prompt_details.get("exhibit_context") or "") if current_prompt_details else ""
 
         for i, msg in enumerate(conversation_history):
              if msg.get("role") == "interviewee":
@@ -825,26 +1160,8 @@ def generate_final_feedback(current_case_prompt_text):
              return "[Could not generate feedback: Analysis not found in state]"
     elif selected_skill == "Recommendation": # Use new skill name
         current_prompt_details = get_prompt_details(st.session_state.get(f"{prefix}_current_prompt_id")) # Use full key
-        exhibits_data_for_llm = []
-        if current_prompt_details and current_prompt_details.get("exhibits"):
-            for idx, ex in enumerate(current_prompt_details["exhibits"]):
-                ex_title = ex.get("exhibit_title", f"Exhibit {idx+1}")
-                ex_desc = ex.get("description", "")
-                ex_data_summary = ""
-                if ex.get("data"):
-                    try:
-                        df = pd.DataFrame(ex.get("data"))
-                        ex_data_summary = f"Data for {ex_title}:\n{df.to_string(index=False)}\n"
-                    except Exception as e:
-                        ex_data_summary = f"Data for {ex_title}: Error processing data.\n"
-                elif ex.get("summary_text"):
-                     summary_text_content = ex.get("summary_text")
-                     if isinstance(summary_text_content, list):
-                         ex_data_summary = f"Summary Text for {ex_title}:\n" + "\n".join([f"- {item}" for item in summary_text_content]) + "\n"
-                     else:
-                         ex_data_summary = f"Summary Text for {ex_title}:\n{summary_text_content}\n"
-                exhibits_data_for_llm.append(f"{ex_title}\n{ex_desc}\n{ex_data_summary}")
-        exhibit_context_for_feedback = "\n\n".join(exhibits_data_for_llm)
+        # Exhibit text is rendered once when the catalog loads (see prompt_catalog.format_exhibit_context)
+        exhibit_context_for_feedback = (current_prompt_details.get("exhibit_context") or "") if current_prompt_details else ""
 
         if conversation_history and conversation_history[0].get("role") == "interviewee":
              history_string = f"Candidate's Submitted Recommendation:\n{conversation_history[0].get('content', '[Recommendation not found]')}"
@@ -869,235 +1186,283 @@ def generate_final_feedback(current_case_prompt_text):
     if exhibit_context_for_feedback:
         logger.debug(f"Exhibit context for feedback:\n{exhibit_context_for_feedback}")
 
+    # A report for this exact transcript may already exist (lost/refreshed session, or another replica)
+    feedback_cache_key_key = f"{prefix}_feedback_cache_key"
+    st.session_state[feedback_cache_key_key] = feedback_cache_key(selected_skill, prompt_id, current_case_prompt_text, history_string, exhibit_context_for_feedback)
+    cached_feedback = FEEDBACK_STORE.get(st.session_state[feedback_cache_key_key]) if FEEDBACK_STORE is not None else None
+    if cached_feedback:
+        logger.info(f"Skill: {selected_skill}, PromptID: {prompt_id} - Serving stored feedback report.")
+        st.session_state[feedback_key] = cached_feedback
+        return cached_feedback
 
-    with st.spinner(f"Generating Final Feedback for {selected_skill}..."):
-        try:
-            # --- Define Feedback Prompt based on Skill ---
-            feedback_prompt = ""
-            system_message_feedback = ""
-            max_tokens_feedback = 800 # Default
 
-            if selected_skill == "Clarifying": # Use new skill name
-                # --- Refined Clarifying Feedback Prompt v2 ---
-                feedback_prompt = f"""
-                You are an experienced case interview coach providing feedback on the clarifying questions phase ONLY.
-                The candidate has finished asking questions. You must now provide overall feedback.
+    try:
+        # --- Define Feedback Prompt based on Skill ---
+        feedback_prompt = ""
+        system_message_feedback = ""
+        max_tokens_feedback = 800 # Default
 
-                Case Prompt Context for this Session:
-                {current_case_prompt_text}
+        if selected_skill == "Clarifying": # Use new skill name
+            # --- Refined Clarifying Feedback Prompt v2 ---
+            feedback_prompt = f"""
+            You are an experienced case interview coach providing feedback on the clarifying questions phase ONLY.
+            The candidate has finished asking questions. You must now provide overall feedback.
 
-                Interview Interaction History (User questions, your answers as INTERVIEWER, and your per-question assessments):
-                {history_string}
+            Case Prompt Context for this Session:
+            {current_case_prompt_text}
 
-                Your Task:
-                Provide detailed, professional, and direct feedback on the interviewee's clarifying questions phase based *only* on the interaction history provided. Use markdown formatting effectively, including paragraph breaks for readability.
+            Interview Interaction History (User questions, your answers as INTERVIEWER, and your per-question assessments):
+            {history_string}
 
-                **IMPORTANT: Your response MUST start *directly* with the "## Overall Rating:" heading on the first line. Do not include any introductory phrases like "Sure, here's the feedback..." or any text before this heading. Your entire response must strictly follow the specified markdown structure.**
+            Your Task:
+            Provide detailed, professional, and direct feedback on the interviewee's clarifying questions phase based *only* on the interaction history provided. Use markdown formatting effectively, including paragraph breaks for readability.
 
-                Structure your feedback precisely as follows using Markdown:
+            **IMPORTANT: Your response MUST start *directly* with the "## Overall Rating:" heading on the first line. Do not include any introductory phrases like "Sure, here's the feedback..." or any text before this heading. Your entire response must strictly follow the specified markdown structure.**
 
-                ## Overall Rating: [1-5]/5
-                *(Provide a brief justification for the rating here, referencing the conversation specifics or assessments. Be very critical and use the full range of scores based on the criteria below. Critically consider the number and quality of questions asked in relation to the case complexity and the information already provided in the case prompt or prior answers.)*
+            Structure your feedback precisely as follows using Markdown:
 
-                ---
+            ## Overall Rating: [1-5]/5
+            *(Provide a brief justification for the rating here, referencing the conversation specifics or assessments. Be very critical and use the full range of scores based on the criteria below. Critically consider the number and quality of questions asked in relation to the case complexity and the information already provided in the case prompt or prior answers.)*
 
-                1.  **Overall Summary:** Briefly summarize the interviewee's performance in asking clarifying questions for *this specific case context*.
+            ---
 
-                2.  **Strengths:** Identify 1-2 specific strengths demonstrated (e.g., good initial questions, logical flow, conciseness). Refer to specific question numbers or assessments if possible.
+            1.  **Overall Summary:** Briefly summarize the interviewee's performance in asking clarifying questions for *this specific case context*.
 
-                3.  **Areas for Improvement:** Identify 1-2 key areas where the interviewee could improve (e.g., question relevance, depth, avoiding compound questions, structure, digging deeper based on answers, asking redundant questions). Refer to specific question numbers or assessments.
+            2.  **Strengths:** Identify 1-2 specific strengths demonstrated (e.g., good initial questions, logical flow, conciseness). Refer to specific question numbers or assessments if possible.
 
-                4.  **Actionable Next Steps:** Provide at least two concrete, actionable steps the interviewee can take to improve their clarifying questions skills *for future cases*.
+            3.  **Areas for Improvement:** Identify 1-2 key areas where the interviewee could improve (e.g., question relevance, depth, avoiding compound questions, structure, digging deeper based on answers, asking redundant questions). Refer to specific question numbers or assessments.
 
-                5.  **Example Questions:** For *each* actionable next step that relates to the *content* or *quality* of the questions asked, provide 1-2 specific *alternative* example questions the interviewee *could have asked* in *this case* to demonstrate improvement in that area.
+            4.  **Actionable Next Steps:** Provide at least two concrete, actionable steps the interviewee can take to improve their clarifying questions skills *for future cases*.
 
-                **Rating Criteria Reference (Apply Strictly):**
-                    * 1: **Must use this score** if questions were predominantly vague (like single words), irrelevant, unclear, compound, or demonstrated a fundamental lack of understanding of how to clarify effectively. Added little to no value. Insufficient number of questions for the case complexity, or questions were mostly redundant.
-                    * 2: Significant issues remain. Many questions were poor, with only occasional relevant ones, or showed a consistent lack of focus/structure. May have asked too few questions or many redundant ones.
-                    * 3: A mixed bag. Some decent questions fitting the ideal categories (Objective, Company, Terms, Repetition) but also notable lapses in quality, relevance, or efficiency. Number of questions might be borderline or some redundancy.
-                    * 4: Generally strong performance. Most questions were relevant, clear, targeted, and fit the ideal categories. Good progress made in clarifying the case, with only minor areas for refinement. Sufficient number of quality questions.
-                    * 5: Excellent. Consistently high-quality questions that were relevant, concise, targeted, and demonstrated a strong grasp of the ideal clarifying categories. Effectively and efficiently clarified key aspects of the case prompt. Comprehensive and insightful questioning.
-                   *(Remember to consider the per-question assessments provided in the history when assigning the overall rating.)*
+            5.  **Example Questions:** For *each* actionable next step that relates to the *content* or *quality* of the questions asked, provide 1-2 specific *alternative* example questions the interviewee *could have asked* in *this case* to demonstrate improvement in that area.
 
-                Ensure your response does **not** start with any other title. Start directly with the '## Overall Rating:' heading. Use paragraph breaks between sections.
-                """
-                system_message_feedback = "You are an expert case interview coach providing structured feedback on clarifying questions. IMPORTANT: Start your response *directly* with the '## Overall Rating:' heading. Evaluate critically based on history and assessments, including the number and quality of questions. Use markdown effectively for readability."
-                # --- End of Refined Clarifying Feedback Prompt v2 ---
-                max_tokens_feedback = 800
+            **Rating Criteria Reference (Apply Strictly):**
+                * 1: **Must use this score** if questions were predominantly vague (like single words), irrelevant, unclear, compound, or demonstrated a fundamental lack of understanding of how to clarify effectively. Added little to no value. Insufficient number of questions for the case complexity, or questions were mostly redundant.
+                * 2: Significant issues remain. Many questions were poor, with only occasional relevant ones, or showed a consistent lack of focus/structure. May have asked too few questions or many redundant ones.
+                * 3: A mixed bag. Some decent questions fitting the ideal categories (Objective, Company, Terms, Repetition) but also notable lapses in quality, relevance, or efficiency. Number of questions might be borderline or some redundancy.
+                * 4: Generally strong performance. Most questions were relevant, clear, targeted, and fit the ideal categories. Good progress made in clarifying the case, with only minor areas for refinement. Sufficient number of quality questions.
+                * 5: Excellent. Consistently high-quality questions that were relevant, concise, targeted, and demonstrated a strong grasp of the ideal clarifying categories. Effectively and efficiently clarified key aspects of the case prompt. Comprehensive and insightful questioning.
+               *(Remember to consider the per-question assessments provided in the history when assigning the overall rating.)*
 
-            elif selected_skill == "Frameworks": # Use new skill name
-                 # --- Refined Framework Feedback Prompt v2 ---
-                 feedback_prompt = f"""
-                 You are an experienced case interview coach providing final summary feedback on the framework development phase based on a single framework submission.
+            Ensure your response does **not** start with any other title. Start directly with the '## Overall Rating:' heading. Use paragraph breaks between sections.
+            """
+            system_message_feedback = "You are an expert case interview coach providing structured feedback on clarifying questions. IMPORTANT: Start your response *directly* with the '## Overall Rating:' heading. Evaluate critically based on history and assessments, including the number and quality of questions. Use markdown effectively for readability."
+            # --- End of Refined Clarifying Feedback Prompt v2 ---
+            max_tokens_feedback = 800
 
-                 Case Prompt Context for this Session:
-                 {current_case_prompt_text}
+        elif selected_skill == "Frameworks": # Use new skill name
+             # --- Refined Framework Feedback Prompt v2 ---
+             feedback_prompt = f"""
+             You are an experienced case interview coach providing final summary feedback on the framework development phase based on a single framework submission.
 
-                 Candidate's Submitted Framework:
-                 {history_string}
+             Case Prompt Context for this Session:
+             {current_case_prompt_text}
 
-                 Your Task:
-                 Provide detailed, professional, final feedback on the candidate's submitted framework. Use markdown formatting effectively.
+             Candidate's Submitted Framework:
+             {history_string}
 
-                 **IMPORTANT: Your response MUST start *directly* with the "## Overall Framework Rating:" heading on the first line. Do not include any introductory phrases like "Sure, here's the feedback..." or any text before this heading. Your entire response must strictly follow the specified markdown structure.**
+             Your Task:
+             Provide detailed, professional, final feedback on the candidate's submitted framework. Use markdown formatting effectively.
 
-                 Structure your feedback precisely as follows using Markdown, starting DIRECTLY with the rating heading:
+             **IMPORTANT: Your response MUST start *directly* with the "## Overall Framework Rating:" heading on the first line. Do not include any introductory phrases like "Sure, here's the feedback..." or any text before this heading. Your entire response must strictly follow the specified markdown structure.**
 
-                 ## Overall Framework Rating: [1-5]/5
-                 *(Provide a brief justification for the rating here, considering the quality of the submitted framework based on MECE, Relevance, Prioritization, Actionability, and Clarity criteria below)*
+             Structure your feedback precisely as follows using Markdown, starting DIRECTLY with the rating heading:
 
-                 ---
+             ## Overall Framework Rating: [1-5]/5
+             *(Provide a brief justification for the rating here, considering the quality of the submitted framework based on MECE, Relevance, Prioritization, Actionability, and Clarity criteria below)*
 
-                 1.  **Overall Summary:** Summarize the effectiveness and quality of the proposed framework for tackling *this specific case*. Did the candidate create a solid structure?
+             ---
 
-                 2.  **Strengths:** Identify 1-2 specific strengths of the submitted framework (e.g., good structure, relevant buckets, clear logic).
+             1.  **Overall Summary:** Summarize the effectiveness and quality of the proposed framework for tackling *this specific case*. Did the candidate create a solid structure?
 
-                 3.  **Areas for Improvement:** Identify 1-2 key weaknesses or areas for development based on the submitted framework (e.g., not MECE, missing key drivers from the prompt, poor prioritization, too generic, structure unclear).
+             2.  **Strengths:** Identify 1-2 specific strengths of the submitted framework (e.g., good structure, relevant buckets, clear logic).
 
-                 4.  **Actionable Next Steps:** Provide at least two concrete, actionable steps the candidate can take to improve their framework development skills *for future cases*.
+             3.  **Areas for Improvement:** Identify 1-2 key weaknesses or areas for development based on the submitted framework (e.g., not MECE, missing key drivers from the prompt, poor prioritization, too generic, structure unclear).
 
-                 5.  **Example Refinement / Alternative:** Suggest one specific, significant refinement to the submitted framework *or* propose a concise alternative structure that might have been more effective for *this case*, explaining why briefly.
+             4.  **Actionable Next Steps:** Provide at least two concrete, actionable steps the candidate can take to improve their framework development skills *for future cases*.
 
+             5.  **Example Refinement / Alternative:** Suggest one specific, significant refinement to the submitted framework *or* propose a concise alternative structure that might have been more effective for *this case*, explaining why briefly.
 
-                 **Rating Criteria Reference:**
-                 * 1: **Fundamentally flawed.** Not MECE, irrelevant to the case, unclear structure, unusable for analysis. Little understanding shown.
-                 * 2: **Major issues.** Significant gaps or overlaps (not MECE), poor structure, lacks relevance to key case issues, unclear or difficult to follow.
-                 * 3: **Partially effective.** Some relevant components, but structure could be significantly improved (e.g., not fully MECE, poor prioritization, some irrelevant buckets). Shows basic understanding but needs refinement.
-                 * 4: **Good framework.** Mostly MECE, relevant to the case, actionable, and reasonably prioritized. Structure is clear. Only minor refinements possible.
-                 * 5: **Excellent.** Clear, MECE, highly relevant to the core issues, well-prioritized, actionable, and tailored effectively to the case specifics. Demonstrates strong strategic thinking.
 
-                 Ensure your response does **not** start with any other title besides "## Overall Framework Rating:". Use paragraph breaks between sections.
-                 """
-                 system_message_feedback = "You are an expert case interview coach providing structured feedback on framework development based on a single submission. IMPORTANT: Start your response *directly* with the '## Overall Framework Rating:' heading. Evaluate critically based on the submitted framework. Use markdown effectively."
-                 # --- End of Refined Framework Feedback Prompt v2 ---
-                 max_tokens_feedback = 700
+             **Rating Criteria Reference:**
+             * 1: **Fundamentally flawed.** Not MECE, irrelevant to the case, unclear structure, unusable for analysis. Little understanding shown.
+             * 2: **Major issues.** Significant gaps or overlaps (not MECE), poor structure, lacks relevance to key case issues, unclear or difficult to follow.
+             * 3: **Partially effective.** Some relevant components, but structure could be significantly improved (e.g., not fully MECE, poor prioritization, some irrelevant buckets). Shows basic understanding but needs refinement.
+             * 4: **Good framework.** Mostly MECE, relevant to the case, actionable, and reasonably prioritized. Structure is clear. Only minor refinements possible.
+             * 5: **Excellent.** Clear, MECE, highly relevant to the core issues, well-prioritized, actionable, and tailored effectively to the case specifics. Demonstrates strong strategic thinking.
 
-            elif selected_skill == "Hypothesis": # Use new skill name
-                 # --- Refined Hypothesis Feedback Prompt ---
-                 feedback_prompt = f"""
-                 You are an experienced case interview coach providing final summary feedback on the hypothesis formulation phase.
-                 The candidate attempted to form hypotheses, and you (as the interviewer) provided contradictory information after each attempt.
+             Ensure your response does **not** start with any other title besides "## Overall Framework Rating:". Use paragraph breaks between sections.
+             """
+             system_message_feedback = "You are an expert case interview coach providing structured feedback on framework development based on a single submission. IMPORTANT: Start your response *directly* with the '## Overall Framework Rating:' heading. Evaluate critically based on the submitted framework. Use markdown effectively."
+             # --- End of Refined Framework Feedback Prompt v2 ---
+             max_tokens_feedback = 700
 
-                 Case Prompt Context for this Session:
-                 {current_case_prompt_text}
+        elif selected_skill == "Hypothesis": # Use new skill name
+             # --- Refined Hypothesis Feedback Prompt ---
+             feedback_prompt = f"""
+             You are an experienced case interview coach providing final summary feedback on the hypothesis formulation phase.
+             The candidate attempted to form hypotheses, and you (as the interviewer) provided contradictory information after each attempt.
 
-                 Interaction History (Candidate hypotheses and info provided by interviewer):
-                 {history_string}
+             Case Prompt Context for this Session:
+             {current_case_prompt_text}
 
-                 Your Task:
-                 Provide detailed, professional, final feedback on the candidate's overall performance during the hypothesis formulation process based *only* on the interaction history. Use markdown formatting effectively.
+             Interaction History (Candidate hypotheses and info provided by interviewer):
+             {history_string}
 
-                 **IMPORTANT: Your response MUST start *directly* with the "## Overall Hypothesis Formulation Rating:" heading on the first line. Do not include any introductory phrases like "Sure, here's the feedback..." or any text before this heading. Your entire response must strictly follow the specified markdown structure.**
+             Your Task:
+             Provide detailed, professional, final feedback on the candidate's overall performance during the hypothesis formulation process based *only* on the interaction history. Use markdown formatting effectively.
 
-                 Structure your feedback precisely as follows using Markdown, starting DIRECTLY with the rating heading:
+             **IMPORTANT: Your response MUST start *directly* with the "## Overall Hypothesis Formulation Rating:" heading on the first line. Do not include any introductory phrases like "Sure, here's the feedback..." or any text before this heading. Your entire response must strictly follow the specified markdown structure.**
 
-                 ## Overall Hypothesis Formulation Rating: [1-5]/5
-                 *(Provide a brief justification for the rating here, considering the quality, logic, and relevance of the hypotheses, and how well the candidate adapted to the new information provided. Use the criteria below)*
+             Structure your feedback precisely as follows using Markdown, starting DIRECTLY with the rating heading:
 
-                 ---
+             ## Overall Hypothesis Formulation Rating: [1-5]/5
+             *(Provide a brief justification for the rating here, considering the quality, logic, and relevance of the hypotheses, and how well the candidate adapted to the new information provided. Use the criteria below)*
 
-                 1.  **Overall Summary:** Briefly summarize the candidate's approach to formulating and refining hypotheses in response to the information provided.
+             ---
 
-                 2.  **Strengths:** Identify 1-2 specific strengths demonstrated (e.g., logical initial hypothesis, good adaptation to new data, clear articulation, relevant focus areas). Refer to specific hypothesis numbers (H1, H2, H3).
+             1.  **Overall Summary:** Briefly summarize the candidate's approach to formulating and refining hypotheses in response to the information provided.
 
-                 3.  **Areas for Improvement:** Identify 1-2 key weaknesses (e.g., initial hypothesis too broad/narrow, poor adaptation to contradictory info, illogical jumps, sticking too long to a disproven path, unclear articulation). Refer to specific hypothesis numbers.
+             2.  **Strengths:** Identify 1-2 specific strengths demonstrated (e.g., logical initial hypothesis, good adaptation to new data, clear articulation, relevant focus areas). Refer to specific hypothesis numbers (H1, H2, H3).
 
-                 4.  **Actionable Next Steps:** Provide at least two concrete, actionable steps the candidate can take to improve their hypothesis generation and testing skills *for future cases*.
+             3.  **Areas for Improvement:** Identify 1-2 key weaknesses (e.g., initial hypothesis too broad/narrow, poor adaptation to contradictory info, illogical jumps, sticking too long to a disproven path, unclear articulation). Refer to specific hypothesis numbers.
 
+             4.  **Actionable Next Steps:** Provide at least two concrete, actionable steps the candidate can take to improve their hypothesis generation and testing skills *for future cases*.
 
-                 **Rating Criteria Reference:**
-                 * 1: Poor. Hypotheses were illogical, irrelevant, or candidate failed completely to adapt to new information.
-                 * 2: Weak. Significant issues with hypothesis logic/relevance, or very slow/poor adaptation to contradictory data.
-                 * 3: Fair. Some logical hypotheses but notable weaknesses in structure, relevance, or adaptation. Mixed performance.
-                 * 4: Good. Generally logical and relevant hypotheses, demonstrated reasonable adaptation to new information with only minor areas for improvement.
-                 * 5: Excellent. Consistently logical, relevant, well-articulated hypotheses. Showed strong ability to adapt and pivot based on new information effectively.
 
-                 Ensure your response does **not** start with any other title besides "## Overall Hypothesis Formulation Rating:". Use paragraph breaks between sections.
-                 """
-                 system_message_feedback = "You are an expert case interview coach providing structured feedback on hypothesis formulation. IMPORTANT: Start your response *directly* with the '## Overall Hypothesis Formulation Rating:' heading. Evaluate critically based on the interaction history. Use markdown effectively."
-                 # --- End of Refined Hypothesis Feedback Prompt ---
-                 max_tokens_feedback = 700
+             **Rating Criteria Reference:**
+             * 1: Poor. Hypotheses were illogical, irrelevant, or candidate failed completely to adapt to new information.
+             * 2: Weak. Significant issues with hypothesis logic/relevance, or very slow/poor adaptation to contradictory data.
+             * 3: Fair. Some logical hypotheses but notable weaknesses in structure, relevance, or adaptation. Mixed performance.
+             * 4: Good. Generally logical and relevant hypotheses, demonstrated reasonable adaptation to new information with only minor areas for improvement.
+             * 5: Excellent. Consistently logical, relevant, well-articulated hypotheses. Showed strong ability to adapt and pivot based on new information effectively.
 
-            elif selected_skill == "Analysis": # Use new skill name
-                 feedback_prompt = f"""... [Analysis Feedback Prompt as before - Rating First] ..."""
-                 system_message_feedback = "You are an expert case interview coach providing structured feedback on exhibit analysis..."
-                 max_tokens_feedback = 800
+             Ensure your response does **not** start with any other title besides "## Overall Hypothesis Formulation Rating:". Use paragraph breaks between sections.
+             """
+             system_message_feedback = "You are an expert case interview coach providing structured feedback on hypothesis formulation. IMPORTANT: Start your response *directly* with the '## Overall Hypothesis Formulation Rating:' heading. Evaluate critically based on the interaction history. Use markdown effectively."
+             # --- End of Refined Hypothesis Feedback Prompt ---
+             max_tokens_feedback = 700
 
-            elif selected_skill == "Recommendation": # Use new skill name
-                 # --- Refined Recommendation Final Feedback Prompt ---
-                 feedback_prompt = f"""
-                 You are an experienced case interview coach providing final summary feedback on the Recommendation phase.
-                 The candidate was presented with a case prompt and summary findings/exhibits and submitted their final recommendation.
+        elif selected_skill == "Analysis": # Use new skill name
+             feedback_prompt = f"""... [Analysis Feedback Prompt as before - Rating First] ..."""
+             system_message_feedback = "You are an expert case interview coach providing structured feedback on exhibit analysis..."
+             max_tokens_feedback = 800
 
-                 Case Prompt Context for this Session:
-                 {current_case_prompt_text}
+        elif selected_skill == "Recommendation": # Use new skill name
+             # --- Refined Recommendation Final Feedback Prompt ---
+             feedback_prompt = f"""
+             You are an experienced case interview coach providing final summary feedback on the Recommendation phase.
+             The candidate was presented with a case prompt and summary findings/exhibits and submitted their final recommendation.
 
-                 Summary of Exhibits/Key Findings Provided to Candidate:
-                 {exhibit_context_for_feedback}
+             Case Prompt Context for this Session:
+             {current_case_prompt_text}
 
-                 Candidate's Submitted Recommendation:
-                 {history_string}
+             Summary of Exhibits/Key Findings Provided to Candidate:
+             {exhibit_context_for_feedback}
 
-                 Your Task:
-                 Provide detailed, professional, final feedback on the candidate's submitted recommendation. Evaluate the structure (Pyramid Principle), synthesis of information (from case prompt and provided exhibits/findings), clarity, and inclusion of risks and next steps. Use markdown formatting effectively.
+             Candidate's Submitted Recommendation:
+             {history_string}
 
-                 **IMPORTANT: Your response MUST start *directly* with the "## Overall Recommendation Rating:" heading on the first line. Do not include any introductory phrases like "Sure, here's the feedback..." or any text before this heading. Your entire response must strictly follow the specified markdown structure.**
+             Your Task:
+             Provide detailed, professional, final feedback on the candidate's submitted recommendation. Evaluate the structure (Pyramid Principle), synthesis of information (from case prompt and provided exhibits/findings), clarity, and inclusion of risks and next steps. Use markdown formatting effectively.
 
-                 Structure your feedback precisely as follows using Markdown:
+             **IMPORTANT: Your response MUST start *directly* with the "## Overall Recommendation Rating:" heading on the first line. Do not include any introductory phrases like "Sure, here's the feedback..." or any text before this heading. Your entire response must strictly follow the specified markdown structure.**
 
-                 ## Overall Recommendation Rating: [1-5]/5
-                 *(Provide a brief justification for the rating here, considering the quality criteria below based on the candidate's recommendation and the provided case/exhibit context)*
+             Structure your feedback precisely as follows using Markdown:
 
-                 ---
+             ## Overall Recommendation Rating: [1-5]/5
+             *(Provide a brief justification for the rating here, considering the quality criteria below based on the candidate's recommendation and the provided case/exhibit context)*
 
-                 1.  **Structure (Pyramid Principle):** Did the recommendation start with a clear conclusion/answer to the main case question? Was it followed by logical supporting rationale and evidence (implicitly or explicitly referencing the provided exhibits/findings)?
+             ---
 
-                 2.  **Synthesis & Logic:** How well did the candidate synthesize the information from the case prompt and provided exhibits/findings to arrive at their recommendation? Was the rationale sound and logical?
+             1.  **Structure (Pyramid Principle):** Did the recommendation start with a clear conclusion/answer to the main case question? Was it followed by logical supporting rationale and evidence (implicitly or explicitly referencing the provided exhibits/findings)?
 
-                 3.  **Risks & Next Steps:** Did the candidate appropriately identify potential risks associated with their recommendation? Were the proposed next steps relevant and actionable?
+             2.  **Synthesis & Logic:** How well did the candidate synthesize the information from the case prompt and provided exhibits/findings to arrive at their recommendation? Was the rationale sound and logical?
 
-                 4.  **Clarity & Conciseness:** Was the recommendation communicated clearly, professionally, and concisely?
+             3.  **Risks & Next Steps:** Did the candidate appropriately identify potential risks associated with their recommendation? Were the proposed next steps relevant and actionable?
 
-                 5.  **Actionable Next Steps (for the candidate):** Provide at least two concrete, actionable steps the candidate can take to improve their recommendation structuring and delivery skills *for future cases*.
+             4.  **Clarity & Conciseness:** Was the recommendation communicated clearly, professionally, and concisely?
 
+             5.  **Actionable Next Steps (for the candidate):** Provide at least two concrete, actionable steps the candidate can take to improve their recommendation structuring and delivery skills *for future cases*.
 
-                 **Rating Criteria Reference:**
-                 * 1: Poor. Recommendation missing or completely off-base. No clear structure, risks/next steps missing. Poor synthesis.
-                 * 2: Weak. Unclear conclusion or weak rationale. Poor structure (e.g., no Pyramid Principle). Risks/steps generic or missing. Weak synthesis.
-                 * 3: Fair. Recommendation addresses the prompt but structure could be better. Rationale is present but may lack depth or clear link to data. Risks/steps are basic. Adequate synthesis.
-                 * 4: Good. Clear recommendation, mostly follows structure. Good synthesis of information. Relevant risks and next steps identified. Generally clear language.
-                 * 5: Excellent. Clear, concise, actionable recommendation following Pyramid Principle. Strong synthesis of case facts/exhibits. Insightful risks and concrete next steps. Professional delivery.
 
-                 Ensure your response does **not** start with any other title besides "## Overall Recommendation Rating:". Use paragraph breaks between sections.
-                 """
-                 system_message_feedback = "You are an expert case interview coach providing structured feedback on a final case recommendation. IMPORTANT: Start your response *directly* with the '## Overall Recommendation Rating:' heading. Evaluate structure, synthesis of provided information, risks, and next steps. Use markdown effectively."
-                 # --- End of Refined Recommendation Final Feedback Prompt ---
-                 max_tokens_feedback = 800
+             **Rating Criteria Reference:**
+             * 1: Poor. Recommendation missing or completely off-base. No clear structure, risks/next steps missing. Poor synthesis.
+             * 2: Weak. Unclear conclusion or weak rationale. Poor structure (e.g., no Pyramid Principle). Risks/steps generic or missing. Weak synthesis.
+             * 3: Fair. Recommendation addresses the prompt but structure could be better. Rationale is present but may lack depth or clear link to data. Risks/steps are basic. Adequate synthesis.
+             * 4: Good. Clear recommendation, mostly follows structure. Good synthesis of information. Relevant risks and next steps identified. Generally clear language.
+             * 5: Excellent. Clear, concise, actionable recommendation following Pyramid Principle. Strong synthesis of case facts/exhibits. Insightful risks and concrete next steps. Professional delivery.
 
-            else:
-                logger.error(f"Cannot generate feedback for unhandled skill: {selected_skill}")
-                st.error(f"Feedback generation for '{selected_skill}' is not yet implemented.")
-                st.session_state[feedback_key] = f"Error: Feedback generation not implemented for {selected_skill}."
-                return st.session_state[feedback_key]
-
-            logger.info("Calling OpenAI API for final feedback...")
-            # --- Add Debug Logging ---
-            logger.debug(f"Feedback Prompt for {selected_skill}:\n{feedback_prompt}")
-            # --- End Debug Logging ---
-            feedback_response = client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "system", "content": system_message_feedback}, {"role": "user", "content": feedback_prompt}], max_tokens=max_tokens_feedback, temperature=0.5)
-            feedback = feedback_response.choices[0].message.content.strip()
-            # --- Add Debug Logging ---
-            logger.info(f"Raw feedback received from API (first 500 chars): {feedback[:500]}")
-            # --- End Debug Logging ---
-            if feedback: st.session_state[feedback_key] = feedback
-            else: logger.warning("LLM returned empty feedback."); st.session_state[feedback_key] = "[Feedback generation returned empty]"
-            return st.session_state[feedback_key]
-        except Exception as e:
-            logger.exception(f"Error during feedback generation API call: {e}")
-            st.error(f"Could not generate feedback. Error: {e}")
-            st.session_state[feedback_key] = f"Error generating feedback: {type(e).__name__}"
+             Ensure your response does **not** start with any other title besides "## Overall Recommendation Rating:". Use paragraph breaks between sections.
+             """
+             system_message_feedback = "You are an expert case interview coach providing structured feedback on a final case recommendation. IMPORTANT: Start your response *directly* with the '## Overall Recommendation Rating:' heading. Evaluate structure, synthesis of provided information, risks, and next steps. Use markdown effectively."
+             # --- End of Refined Recommendation Final Feedback Prompt ---
+             max_tokens_feedback = 800
+
+        else:
+            logger.error(f"Cannot generate feedback for unhandled skill: {selected_skill}")
+            st.error(f"Feedback generation for '{selected_skill}' is not yet implemented.")
+            st.session_state[feedback_key] = f"Error: Feedback generation not implemented for {selected_skill}."
             return st.session_state[feedback_key]
 
+        logger.info("Calling OpenAI API for final feedback...")
+        # --- Add Debug Logging ---
+        logger.debug(f"Feedback Prompt for {selected_skill}:\n{feedback_prompt}")
+        # --- End Debug Logging ---
+        feedback_messages = [{"role": "system", "content": system_message_feedback}, {"role": "user", "content": feedback_prompt}]
+        st.session_state[feedback_call_key] = LLM_EXECUTOR.submit_chat(client, label=f"feedback:{selected_skill}:{prompt_id}", priority=PRIORITY_FEEDBACK, retry_policy=LLM_RETRY_POLICIES[selected_skill].without_hedging(), model="gpt-4o-mini", messages=feedback_messages, max_tokens=max_tokens_feedback, temperature=0.5, stream=STREAM_FEEDBACK)
+    except (LLMQueueFull, CircuitOpenError) as e:
+        retry_delay = max(LLM_BUSY_RETRY_SECONDS, getattr(e, "retry_after", 0))
+        logger.warning(f"Feedback for {selected_skill} not queued ({e}), retrying in {retry_delay:.0f}s.")
+        st.session_state[feedback_retry_key] = time.time() + retry_delay
+    except Exception as e:
+        logger.exception(f"Error during feedback generation API call: {e}")
+        st.error(f"Could not generate feedback. Error: {e}")
+        st.session_state[feedback_key] = f"Error generating feedback: {type(e).__name__}"
+        return st.session_state[feedback_key]
+    render_feedback_progress(); st.stop()
+
+def _finish_feedback_call(feedback_call):
+    """Stores the outcome of a finished background feedback call and returns it."""
+    prefix = st.session_state.key_prefix; feedback_key = f"{prefix}_feedback"
+    st.session_state.pop(f"{prefix}_feedback_call", None)
+    try:
+        feedback = feedback_call.result().strip()
+        # --- Add Debug Logging ---
+        logger.info(f"Raw feedback received from API (first 500 chars): {feedback[:500]}")
+        # --- End Debug Logging ---
+        if feedback:
+            st.session_state[feedback_key] = feedback
+            cache_key = st.session_state.get(f"{prefix}_feedback_cache_key")
+            if cache_key and FEEDBACK_STORE is not None and not feedback_call.cancelled:
+                if FEEDBACK_REPORT_HEADER_RE.match(feedback): FEEDBACK_STORE.put(cache_key, st.session_state.get(f"{prefix}_selected_skill", "N/A"), st.session_state.get(f"{prefix}_current_prompt_id", "N/A"), feedback)
+                else: logger.warning("Feedback report doesn't start with the expected rating heading; not storing it.")
+        else: logger.warning("LLM returned empty feedback."); st.session_state[feedback_key] = "[Feedback generation returned empty]"
+    except Exception as e:
+        logger.exception(f"Error during feedback generation API call: {e}")
+        st.error(f"Could not generate feedback. Error: {e}")
+        st.session_state[feedback_key] = f"Error generating feedback: {type(e).__name__}"
+    return st.session_state[feedback_key]
+
+@st.fragment(run_every=LLM_POLL_INTERVAL)
+def render_feedback_progress():
+    """
+    Shows the running feedback call (the partial report when STREAM_FEEDBACK is on); reruns the whole app once it finishes.
+    If the call couldn't be queued (queue full or OpenAI circuit open), waits until the scheduled retry instead.
+    """
+    prefix = st.session_state.key_prefix
+    feedback_call = st.session_state.get(f"{prefix}_feedback_call")
+    if feedback_call is None:
+        retry_at = st.session_state.get(f"{prefix}_feedback_retry_at")
+        if retry_at is None: return
+        if time.time() >= retry_at: st.rerun()
+        st.caption("CHIP is busy right now. Your feedback will start shortly...")
+        return
+    if feedback_call.done(): st.rerun()
+    st.caption(f"CHIP is writing your {st.session_state.get(f'{prefix}_selected_skill', '')} feedback...")
+    partial_feedback = feedback_call.text()
+    if partial_feedback: st.markdown(partial_feedback + " ▌")
+
 # --- Main Streamlit Application Function ---
 def main_app():
     # [ Code remains unchanged ]
@@ -1156,6 +1521,7 @@ def clarifying_questions_bot_ui():
     case_title = current_prompt.get('title', 'N/A'); case_prompt_text = current_prompt.get('prompt_text', 'Error: Prompt text missing.')
     if case_prompt_text.startswith("Error"): st.error(case_prompt_text); st.stop()
     else: st.info(f"**{case_title}**\n\n{case_prompt_text}"); logger.debug(f"Displayed prompt: {case_title}")
+    reply_pending = collect_interviewer_reply()
     if not st.session_state.get(done_key):
         st.header("Clarifying Questions")
         chat_container = st.container()
@@ -1165,6 +1531,7 @@ def clarifying_questions_bot_ui():
                  for msg in conversation_history:
                      role = msg.get("role"); display_role = "user" if role == "interviewee" else "assistant"
                      with st.chat_message(display_role): st.markdown(msg.get("content", ""))
+            if reply_pending: render_pending_reply()
         typing_placeholder = st.empty()
         if st.session_state.get(is_typing_key): typing_placeholder.text("CHIP is thinking...")
         else: typing_placeholder.empty()
@@ -1175,7 +1542,7 @@ def clarifying_questions_bot_ui():
         st.write(" ")
         col_btn1, col_btn2, col_btn3 = st.columns([1, 1.5, 1])
         with col_btn2:
-            if st.button("End Clarification Questions", use_container_width=True):
+            if st.button("End Clarification Questions", use_container_width=True, disabled=reply_pending): # Not while an answer is still streaming in
                 logger.info("User clicked 'End Clarification Questions'.")
                 end_time = time.time(); start_time = st.session_state.get(start_time_key)
                 if start_time is not None: st.session_state[time_key] = end_time - start_time
@@ -1368,6 +1735,7 @@ def hypothesis_formulation_ui():
     case_title = current_prompt.get('title', 'N/A'); case_prompt_text = current_prompt.get('prompt_text', 'Error: Prompt text missing.')
     if case_prompt_text.startswith("Error"): st.error(case_prompt_text); st.stop()
     else: st.info(f"**{case_title}**\n\n{case_prompt_text}"); logger.debug(f"Displayed prompt (Hypothesis): {case_title}")
+    reply_pending = collect_interviewer_reply() # May end the session when the hypothesis limit is reached
     if not st.session_state.get(done_key):
         st.header("Hypothesis Formulation")
         chat_container = st.container()
@@ -1378,6 +1746,7 @@ def hypothesis_formulation_ui():
                      role = msg.get("role"); display_role = "user" if role == "interviewee" else "assistant"
                      label = "Your Hypothesis" if role == "interviewee" else "Interviewer Information"
                      with st.chat_message(display_role): st.markdown(msg.get("content", ""))
+            if reply_pending: render_pending_reply()
         typing_placeholder = st.empty()
         if st.session_state.get(is_typing_key): typing_placeholder.text("CHIP is processing...")
         else: typing_placeholder.empty()
@@ -1391,7 +1760,7 @@ def hypothesis_formulation_ui():
         st.write(" ")
         col_btn1, col_btn2, col_btn3 = st.columns([1, 1.5, 1])
         with col_btn2:
-            if st.button("End Hypothesis Formulation", use_container_width=True):
+            if st.button("End Hypothesis Formulation", use_container_width=True, disabled=reply_pending): # Not while an answer is still streaming in
                 logger.info("User clicked 'End Hypothesis Formulation'.")
                 end_time = time.time(); start_time = st.session_state.get(start_time_key)
                 if start_time is not None: st.session_state[time_key] = end_time - start_time
@@ -1498,33 +1867,12 @@ def analysis_ui():
         st.header(f"Exhibit {current_index + 1} of {total_exhibits}")
         st.subheader(exhibit.get("exhibit_title", f"Exhibit {current_index + 1}"))
         if exhibit.get("description"): st.caption(exhibit.get("description"))
-        chart_type = exhibit.get("chart_type", "unknown"); data = exhibit.get("data")
-        if data:
+        if exhibit.get("data"):
             try:
-                df = pd.DataFrame(data); fig = None
-                if chart_type == "bar":
-                    x_col = exhibit.get("x_axis"); y_cols = exhibit.get("y_axis")
-                    if x_col and y_cols:
-                        if not isinstance(y_cols, list): y_cols = [y_cols]
-                        fig = px.bar(df, x=x_col, y=y_cols, title="", barmode='group'); fig.update_layout(legend_title_text='')
-                    else: st.warning(f"Exhibit {current_index + 1}: Bar chart data needs 'x_axis' and 'y_axis' keys.")
-                elif chart_type == "line":
-                    x_col = exhibit.get("x_axis"); y_cols = exhibit.get("y_axis")
-                    if x_col and y_cols:
-                        if not isinstance(y_cols, list): y_cols = [y_cols]
-                        fig = px.line(df, x=x_col, y=y_cols, title=""); fig.update_layout(legend_title_text='')
-                    else: st.warning(f"Exhibit {current_index + 1}: Line chart data needs 'x_axis' and 'y_axis' keys.")
-                elif chart_type == "pie":
-                    names_col = exhibit.get("names"); values_col = exhibit.get("values")
-                    if names_col and values_col: fig = px.pie(df, names=names_col, values=values_col, title="")
-                    else: st.warning(f"Exhibit {current_index + 1}: Pie chart data needs 'names' and 'values' keys.")
-                elif chart_type == "scatter":
-                    x_col = exhibit.get("x_axis"); y_col = exhibit.get("y_axis")
-                    if x_col and y_col: color_col = exhibit.get("color"); size_col = exhibit.get("size"); fig = px.scatter(df, x=x_col, y=y_col, title="", color=color_col, size=size_col)
-                    else: st.warning(f"Exhibit {current_index + 1}: Scatter chart data needs 'x_axis' and 'y_axis' keys.")
-                elif chart_type == "table": st.dataframe(df, hide_index=True); fig = None
-                else: st.warning(f"Exhibit {current_index + 1}: Unsupported or unspecified chart type '{chart_type}'. Displaying table."); st.dataframe(df, hide_index=True); fig = None
-                if fig: fig.update_layout(margin=dict(l=20, r=20, t=30, b=20), height=400); st.plotly_chart(fig, use_container_width=True)
+                fig, table_df, render_warning = get_exhibit_render(PROMPT_CATALOG.version, current_prompt.get("id"), current_index, exhibit)
+                if render_warning: st.warning(render_warning)
+                if table_df is not None: st.dataframe(table_df, hide_index=True)
+                if fig: st.plotly_chart(fig, use_container_width=True)
             except Exception as e: logger.error(f"Error processing exhibit {current_index + 1} data: {e}"); st.error(f"Error displaying exhibit {current_index + 1}.")
         else: st.warning(f"Exhibit {current_index + 1}: No data found.")
         st.header(f"Your Analysis (Exhibit {current_index + 1})")
@@ -1648,7 +1996,7 @@ def recommendation_ui():
                 try: df = pd.DataFrame(data); st.dataframe(df, use_container_width=True, hide_index=True)
                 except Exception as e: logger.error(f"Error processing exhibit {i+1} data for Recommendation: {e}"); st.error(f"Error displaying exhibit {i+1}. Please check data format in prompts.json.")
             elif summary_text:
-                 if isinstance(summary_text, list): markdown_summary = "\n".join([f"- {item}  " for item in summary_text]); logger.debug(f"Formatted summary text for Exhibit {i+1}: {markdown_summary}"); st.markdown(markdown_summary, unsafe_allow_html=True)
+                 if isinstance(summary_text, (list, tuple)): markdown_summary = "\n".join([f"- {item}  " for item in summary_text]); logger.debug(f"Formatted summary text for Exhibit {i+1}: {markdown_summary}"); st.markdown(markdown_summary, unsafe_allow_html=True)
                  else: st.markdown(summary_text)
             else: st.warning(f"Exhibit {i+1}: No data or summary text found.")
     if not st.session_state.get(done_key):
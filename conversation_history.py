@@ -0,0 +1,147 @@
+"""
+Token-budgeted interviewer history for CHIP.
+
+Clarifying sessions have no turn limit, and every interviewer request carries
+the earlier turns as chat messages (see sync_interviewer_history in
+clarifybot.py). Without a cap, input tokens and latency grow with every turn.
+
+InterviewerHistory holds the chat messages for finished turns. It is
+append-only, and a conversation entry is converted once, when it is first
+seen. token_budget covers everything the history adds to a request: the
+summary message and the verbatim turns. When they pass it, the oldest turns
+are folded into a rolling summary until the total is back under
+low_water * token_budget. The most recent keep_recent_turns turns stay
+verbatim unless they alone are over budget; the latest turn always does.
+If the summary itself grows too long, every line is extracted again with a
+tighter cap per message (SUMMARY_LEVELS). Only past the tightest cap are lines
+dropped, and then from the middle: the opening turns, where the case facts came
+out, always stay, followed by a count of omitted turns.
+
+The summary is extractive and needs no extra LLM call. Each folded turn adds
+one line with the candidate's input and the opening sentences of the
+interviewer's reply. Assessments are dropped. The facts the interviewer has
+already stated therefore stay in context, and later answers remain consistent
+with them. Lines are only recomputed when the cap tightens. Folding and
+trimming several turns at once keeps the request prefix unchanged for several
+turns between compactions, so provider prompt caching still applies.
+"""
+import logging
+import re
+
+from llm_runtime import estimate_chat_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = "Earlier turns of this interview, condensed. What you told the candidate there is established; stay consistent with it:"
+SUMMARY_SENTENCES = 2 # Sentences kept from each folded message
+SUMMARY_MAX_CHARS = 300 # Hard cap per folded message
+# (sentences, max_chars) per folded message, tightened in turn while the summary is over budget
+SUMMARY_LEVELS = ((SUMMARY_SENTENCES, SUMMARY_MAX_CHARS), (1, 160), (1, 80))
+SUMMARY_KEEP_FIRST_TURNS = 2 # Opening turns whose lines are never dropped
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def summarize_text(text, sentences=SUMMARY_SENTENCES, max_chars=SUMMARY_MAX_CHARS):
+    """First few sentences of text on one line, capped at max_chars."""
+    text = " ".join((text or "").split())
+    summary = " ".join(_SENTENCE_END_RE.split(text)[:sentences])
+    return summary if len(summary) <= max_chars else summary[:max_chars - 1].rstrip() + "…"
+
+
+def summarize_turn(entries, sentences=SUMMARY_SENTENCES, max_chars=SUMMARY_MAX_CHARS):
+    """One summary line for a turn (the candidate's input and the interviewer's reply)."""
+    parts = [f"{'Candidate' if entry.get('role') == 'interviewee' else 'You'}: {summarize_text(entry.get('content'), sentences, max_chars)}" for entry in entries]
+    return "- " + " | ".join(parts)
+
+
+class InterviewerHistory:
+    """
+    Append-only chat history for one interviewer session, compacted to a token budget.
+    to_message converts a conversation entry into a chat message. Token counts use the
+    executor's estimate (estimate_chat_tokens).
+    """
+
+    def __init__(self, to_message, token_budget=1500, keep_recent_turns=4, low_water=0.6):
+        self.to_message = to_message
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.low_water = low_water
+        self.messages = [] # One per finished conversation entry
+        self._tokens = [] # Estimated tokens per message
+        self.folded = 0 # messages[:folded] are represented by the summary
+        self.summary_lines = []
+        self._line_spans = [] # (start, end) entry indexes of the turn behind each summary line
+        self.summary_level = 0 # Index into SUMMARY_LEVELS
+        self.omitted_turns = 0 # Folded turns whose summary lines were dropped again
+        self._summary_message = None
+
+    def sync(self, entries):
+        """Converts conversation entries not seen yet, then compacts if the history is over budget."""
+        if len(self.messages) > len(entries): # Conversation was cut back (shouldn't happen for finished turns)
+            self.__init__(self.to_message, self.token_budget, self.keep_recent_turns, self.low_water)
+        for entry in entries[len(self.messages):]:
+            message = self.to_message(entry)
+            self.messages.append(message)
+            self._tokens.append(estimate_chat_tokens([message]))
+        self._compact(entries)
+
+    @property
+    def verbatim_tokens(self):
+        return sum(self._tokens[self.folded:])
+
+    @property
+    def request_tokens(self):
+        """Estimated tokens request_messages() adds to a request (summary plus verbatim turns)."""
+        return estimate_chat_tokens(self.request_messages())
+
+    def _compact(self, entries):
+        if self.request_tokens <= self.token_budget:
+            return
+        target = self.token_budget * self.low_water
+        before = (self.folded, self.summary_level, self.omitted_turns)
+        keep_from = max(self.folded, len(self.messages) - 2 * self.keep_recent_turns)
+        while self.folded < keep_from and self.request_tokens > target:
+            self._fold_turn(entries, keep_from)
+        latest_turn = self._latest_turn_start(entries)
+        while self.folded < latest_turn and self.verbatim_tokens > target: # The recent turns alone are over budget
+            self._fold_turn(entries, latest_turn)
+        while self.request_tokens > target and self.summary_level < len(SUMMARY_LEVELS) - 1:
+            self.summary_level += 1
+            self.summary_lines = [summarize_turn(entries[start:end], *SUMMARY_LEVELS[self.summary_level]) for start, end in self._line_spans]
+            self._build_summary()
+        while len(self.summary_lines) > SUMMARY_KEEP_FIRST_TURNS and self.request_tokens > target:
+            del self.summary_lines[SUMMARY_KEEP_FIRST_TURNS], self._line_spans[SUMMARY_KEEP_FIRST_TURNS]
+            self.omitted_turns += 1
+            self._build_summary()
+        if (self.folded, self.summary_level, self.omitted_turns) != before:
+            logger.info(f"Compacted history: {len(self.summary_lines)} summary lines (level {self.summary_level}), {self.omitted_turns} turns omitted, ~{self.request_tokens} tokens.")
+
+    def _fold_turn(self, entries, limit):
+        """Moves the oldest verbatim turn (ending before limit) into the summary."""
+        end = self.folded + 1 # A turn is the candidate's input plus the interviewer reply to it
+        if end < limit and entries[end].get("role") == "interviewer":
+            end += 1
+        self.summary_lines.append(summarize_turn(entries[self.folded:end], *SUMMARY_LEVELS[self.summary_level]))
+        self._line_spans.append((self.folded, end))
+        self.folded = end
+        self._build_summary()
+
+    def _latest_turn_start(self, entries):
+        start = len(self.messages) - 1
+        if start > 0 and entries[start].get("role") == "interviewer" and entries[start - 1].get("role") == "interviewee":
+            start -= 1
+        return max(self.folded, start)
+
+    def _build_summary(self):
+        if not self.summary_lines:
+            self._summary_message = None
+            return
+        lines = list(self.summary_lines)
+        if self.omitted_turns:
+            lines.insert(SUMMARY_KEEP_FIRST_TURNS, f"- ({self.omitted_turns} turns omitted here)")
+        self._summary_message = {"role": "system", "content": SUMMARY_HEADER + "\n" + "\n".join(lines)}
+
+    def request_messages(self):
+        """The summary (once anything is folded) followed by the verbatim recent turns."""
+        recent = self.messages[self.folded:]
+        return [self._summary_message, *recent] if self._summary_message else list(recent)
@@ -0,0 +1,49 @@
+"""
+Plotly figures for CHIP's Analysis exhibits.
+
+build_exhibit_render turns one exhibit record into a figure or a table. It has
+no Streamlit dependency, so clarifybot can cache its results per process
+(get_exhibit_render) and tests can build every exhibit in prompts.json.
+
+Catalog records are frozen: list fields such as y_axis are tuples (see
+prompt_catalog). plotly express only accepts lists for column arguments, so
+every argument passed to px goes through thaw().
+"""
+import pandas as pd
+import plotly.express as px
+
+from prompt_catalog import thaw
+
+
+def _column_list(value):
+    """y_axis may name one column or several; px gets a list either way."""
+    return thaw(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def build_exhibit_render(exhibit, exhibit_number):
+    """
+    Builds the Plotly figure (or table DataFrame) for one exhibit.
+    Returns (fig, table_df, warning_message); any of them may be None.
+    """
+    chart_type = exhibit.get("chart_type", "unknown")
+    df = pd.DataFrame(exhibit.get("data")); fig = None
+    if chart_type == "bar":
+        x_col = exhibit.get("x_axis"); y_cols = exhibit.get("y_axis")
+        if not (x_col and y_cols): return None, None, f"Exhibit {exhibit_number}: Bar chart data needs 'x_axis' and 'y_axis' keys."
+        fig = px.bar(df, x=thaw(x_col), y=_column_list(y_cols), title="", barmode='group'); fig.update_layout(legend_title_text='')
+    elif chart_type == "line":
+        x_col = exhibit.get("x_axis"); y_cols = exhibit.get("y_axis")
+        if not (x_col and y_cols): return None, None, f"Exhibit {exhibit_number}: Line chart data needs 'x_axis' and 'y_axis' keys."
+        fig = px.line(df, x=thaw(x_col), y=_column_list(y_cols), title=""); fig.update_layout(legend_title_text='')
+    elif chart_type == "pie":
+        names_col = exhibit.get("names"); values_col = exhibit.get("values")
+        if not (names_col and values_col): return None, None, f"Exhibit {exhibit_number}: Pie chart data needs 'names' and 'values' keys."
+        fig = px.pie(df, names=thaw(names_col), values=thaw(values_col), title="")
+    elif chart_type == "scatter":
+        x_col = exhibit.get("x_axis"); y_col = exhibit.get("y_axis")
+        if not (x_col and y_col): return None, None, f"Exhibit {exhibit_number}: Scatter chart data needs 'x_axis' and 'y_axis' keys."
+        fig = px.scatter(df, x=thaw(x_col), y=thaw(y_col), title="", color=thaw(exhibit.get("color")), size=thaw(exhibit.get("size")))
+    elif chart_type == "table": return None, df, None
+    else: return None, df, f"Exhibit {exhibit_number}: Unsupported or unspecified chart type '{chart_type}'. Displaying table."
+    fig.update_layout(margin=dict(l=20, r=20, t=30, b=20), height=400)
+    return fig, None, None
@@ -0,0 +1,192 @@
+"""
+Incremental local mirror of CHIP's feedback Google Sheet, for analytics.
+
+Analyzing ratings used to mean downloading the whole sheet every time, and
+that got slower as the sheet grew. save_user_feedback only ever appends rows,
+so FeedbackMirror keeps a row cursor: the last sheet row already copied. Each
+sync reads just the rows below the cursor, in chunks of CHUNK_ROWS, into a
+local SQLite (WAL) database.
+
+Within the same transaction as the copied rows, the sync updates rollups per
+(prompt id, skill, day):
+* the number of ratings, their sum and count (the mean is sum / count), and
+* low_rating_comments, the number of ratings of LOW_RATING_MAX or less that
+  came with a comment.
+
+A row and its rollup contribution therefore commit together with the cursor.
+An interrupted sync never double-counts, and dashboard queries (rollups())
+read a few pre-aggregated rows instead of the sheet.
+
+Rows without a timestamp or skill (blank rows, e.g. cleared by hand) are not
+feedback: they are skipped, but the cursor still moves past them.
+
+Run it as a job, once or in a loop:
+
+    python feedback_mirror.py sync [--db chip_feedback_mirror.sqlite3] [--every 300]
+    python feedback_mirror.py report [--prompt-id ID] [--skill SKILL]
+
+Credentials and the sheet id come from .streamlit/secrets.toml
+(google_credentials, GSHEET_ID), the same settings the app uses.
+"""
+import argparse
+import datetime
+import logging
+import os
+import sys
+import time
+
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 1000 # Sheet rows fetched per request
+LOW_RATING_MAX = 3 # Ratings at or below this ask the user for a comment in the app
+FEEDBACK_RANGE_COLUMNS = ("A", "F") # Timestamp .. Comment, see feedback_sinks.FEEDBACK_COLUMNS
+
+
+def _parse_rating(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_day(timestamp):
+    """YYYY-MM-DD for an ISO timestamp (as written by save_user_feedback) or a Sheets-formatted date, else 'unknown'."""
+    text = str(timestamp or "").strip()
+    try:
+        return datetime.date.fromisoformat(text[:10]).isoformat()
+    except ValueError:
+        pass
+    for fmt in ("%m/%d/%Y %H:%M:%S", "%m/%d/%Y"):
+        try:
+            return datetime.datetime.strptime(text.split(".")[0], fmt).date().isoformat()
+        except ValueError:
+            continue
+    return "unknown"
+
+
+class FeedbackMirror(SQLiteStore):
+    """Local SQLite copy of the feedback sheet plus (prompt_id, skill, day) rollups, synced by row cursor."""
+
+    def __init__(self, path):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS sheet_rows (sheet_id TEXT NOT NULL, row_number INTEGER NOT NULL, timestamp TEXT, session_id TEXT, skill TEXT, prompt_id TEXT, rating INTEGER, comment TEXT, PRIMARY KEY (sheet_id, row_number))",
+            "CREATE TABLE IF NOT EXISTS sync_state (sheet_id TEXT PRIMARY KEY, last_row INTEGER NOT NULL, synced_at REAL NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS rollups (prompt_id TEXT NOT NULL, skill TEXT NOT NULL, day TEXT NOT NULL, count INTEGER NOT NULL, rating_count INTEGER NOT NULL, rating_sum INTEGER NOT NULL, low_rating_comments INTEGER NOT NULL, PRIMARY KEY (prompt_id, skill, day))",
+            "CREATE INDEX IF NOT EXISTS rollups_skill_day ON rollups (skill, day)",
+        ])
+
+    def cursor(self, sheet_id):
+        """Last sheet row already mirrored (0 before the first sync)."""
+        row = self._connect().execute("SELECT last_row FROM sync_state WHERE sheet_id = ?", (sheet_id,)).fetchone()
+        return row[0] if row else 0
+
+    def sync(self, sheet_id, fetch_rows, chunk_rows=CHUNK_ROWS):
+        """
+        Copies rows below the cursor. fetch_rows(first, last) returns the sheet's values for rows first..last
+        (1-based, inclusive; fewer rows at the end of the sheet). Returns the number of rows copied.
+        """
+        copied = 0
+        while True:
+            first = self.cursor(sheet_id) + 1
+            values = fetch_rows(first, first + chunk_rows - 1)
+            if not values:
+                break
+            copied += self._apply(sheet_id, first, values)
+            if len(values) < chunk_rows:
+                break
+        logger.info(f"Feedback mirror synced {copied} new rows from sheet {sheet_id} (cursor now at row {self.cursor(sheet_id)}).")
+        return copied
+
+    def _apply(self, sheet_id, first, values):
+        """Stores one chunk, its rollup deltas and the new cursor in one transaction; returns the feedback rows stored."""
+        rows, deltas = [], {}
+        for offset, cells in enumerate(values):
+            cells = list(cells) + [""] * (6 - len(cells))
+            timestamp, session_id, skill, prompt_id, rating, comment = cells[:6]
+            if first + offset == 1 and str(timestamp).strip().lower() == "timestamp": # Header row
+                continue
+            if not str(timestamp).strip() or not str(skill).strip(): # Blank row
+                continue
+            rating = _parse_rating(rating)
+            rows.append((sheet_id, first + offset, str(timestamp), session_id, skill, str(prompt_id), rating, comment))
+            key = (str(prompt_id), skill or "", _parse_day(timestamp))
+            delta = deltas.setdefault(key, [0, 0, 0, 0])
+            delta[0] += 1
+            if rating is not None:
+                delta[1] += 1
+                delta[2] += rating
+                if rating <= LOW_RATING_MAX and str(comment).strip():
+                    delta[3] += 1
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO sheet_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany(
+                "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (prompt_id, skill, day) DO UPDATE SET "
+                "count = count + excluded.count, rating_count = rating_count + excluded.rating_count, "
+                "rating_sum = rating_sum + excluded.rating_sum, low_rating_comments = low_rating_comments + excluded.low_rating_comments",
+                [(*key, *delta) for key, delta in deltas.items()],
+            )
+            conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", (sheet_id, first + len(values) - 1, time.time()))
+        return len(rows)
+
+    def rollups(self, prompt_id=None, skill=None, since_day=None):
+        """Rollup rows as dicts (prompt_id, skill, day, count, mean_rating, low_rating_comments), newest day first."""
+        clauses, params = [], []
+        for column, value in (("prompt_id", prompt_id), ("skill", skill)):
+            if value is not None:
+                clauses.append(f"{column} = ?"); params.append(str(value))
+        if since_day is not None:
+            clauses.append("day >= ?"); params.append(since_day)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(f"SELECT prompt_id, skill, day, count, rating_count, rating_sum, low_rating_comments FROM rollups {where} ORDER BY day DESC, prompt_id", params).fetchall()
+        return [
+            {"prompt_id": pid, "skill": sk, "day": day, "count": count, "mean_rating": round(rating_sum / rating_count, 3) if rating_count else None, "low_rating_comments": low}
+            for pid, sk, day, count, rating_count, rating_sum, low in rows
+        ]
+
+
+def load_sheet_settings(secrets_path):
+    """Reads (google_credentials, GSHEET_ID) from a Streamlit secrets.toml."""
+    import tomllib
+    with open(secrets_path, "rb") as f:
+        secrets = tomllib.load(f)
+    return secrets["google_credentials"], secrets["GSHEET_ID"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CHIP feedback sheet mirror.")
+    parser.add_argument("--db", default="chip_feedback_mirror.sqlite3", help="Mirror database path.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sync_parser = subparsers.add_parser("sync", help="Copy new sheet rows into the mirror and update rollups.")
+    sync_parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"), help="secrets.toml with google_credentials and GSHEET_ID.")
+    sync_parser.add_argument("--every", type=float, default=0, help="Keep syncing every N seconds (default: once).")
+    report_parser = subparsers.add_parser("report", help="Print rating rollups per prompt, skill and day.")
+    report_parser.add_argument("--prompt-id", default=None)
+    report_parser.add_argument("--skill", default=None)
+    report_parser.add_argument("--since", default=None, help="First day to include (YYYY-MM-DD).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    mirror = FeedbackMirror(args.db)
+    if args.command == "sync":
+        from sheets_session import SheetsSession
+        credentials, sheet_id = load_sheet_settings(args.secrets)
+        session = SheetsSession(credentials, sheet_id)
+        start_col, end_col = FEEDBACK_RANGE_COLUMNS
+        fetch_rows = lambda first, last: session.run(lambda worksheet: worksheet.get(f"{start_col}{first}:{end_col}{last}"))
+        while True:
+            mirror.sync(sheet_id, fetch_rows)
+            if not args.every:
+                break
+            time.sleep(args.every)
+    elif args.command == "report":
+        print(f"{'day':<11} {'skill':<15} {'prompt_id':<24} {'count':>6} {'mean':>6} {'low+comment':>12}")
+        for row in mirror.rollups(args.prompt_id, args.skill, args.since):
+            mean = f"{row['mean_rating']:.2f}" if row["mean_rating"] is not None else "-"
+            print(f"{row['day']:<11} {row['skill']:<15} {row['prompt_id']:<24} {row['count']:>6} {mean:>6} {row['low_rating_comments']:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
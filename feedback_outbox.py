@@ -0,0 +1,157 @@
+"""
+Durable outbox for CHIP's feedback rows.
+
+Writing each rating to Google Sheets inside the click handler made users wait
+on the Sheets API, and under load it ran into Sheets write quotas. Instead,
+save_user_feedback enqueues the row into a local SQLite (WAL) outbox. One
+local insert is enough to confirm to the user. A background flusher thread
+sends pending rows in batches through a sink callable, such as a Sheets
+append_rows.
+
+A flush runs when batch_size rows are pending or every flush_interval
+seconds, whichever comes first. To claim a batch, the flusher leases its rows
+for lease_seconds. Replicas sharing the outbox file therefore don't send the
+same rows twice. Rows are deleted only after the sink succeeds. A failed batch
+is released and retried with exponential backoff, and rows left by a crash or
+restart are picked up once their lease expires. Delivery is at-least-once: a
+process that dies between the append and the delete sends that batch again.
+
+Errors that is_transient() says are outages (rate limits, 5xx, an open circuit)
+are retried for as long as they last. Rows whose batch keeps failing with other
+errors, such as a misconfigured sheet, are moved to a dead-letter table after
+max_attempts tries instead of being retried forever. They are kept there, logged
+and counted in stats(), and requeue_dead_letters() sends them again once the
+cause is fixed.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackOutbox(SQLiteStore):
+    """
+    SQLite-backed queue of feedback rows (lists of cell values) flushed to sink(rows) by a daemon thread.
+    Call start() once per process; enqueue() is safe from any thread.
+    """
+
+    def __init__(self, path, sink, batch_size=50, flush_interval=5.0, lease_seconds=60.0, base_backoff=5.0, max_backoff=300.0, max_attempts=10, is_transient=None):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT NOT NULL, created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL DEFAULT 0, lease_owner TEXT, lease_until REAL NOT NULL DEFAULT 0)",
+            "CREATE INDEX IF NOT EXISTS outbox_next_attempt_at ON outbox (next_attempt_at)",
+            "CREATE TABLE IF NOT EXISTS outbox_dead (id INTEGER PRIMARY KEY, row TEXT NOT NULL, created_at REAL NOT NULL, attempts INTEGER NOT NULL, failed_at REAL NOT NULL, error TEXT)",
+        ])
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lease_seconds = lease_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.is_transient = is_transient or (lambda error: False)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._wake = threading.Event()
+        self._thread = None
+        self._pending_hint = 0 # Rows enqueued by this process since the last flush
+        self.counters = {"enqueued": 0, "sent": 0, "failed_batches": 0, "dead_lettered": 0}
+
+    def start(self):
+        """Starts the background flusher (once)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="feedback-outbox-flusher", daemon=True)
+                self._thread.start()
+                logger.info(f"Feedback outbox at {self.path} (batch {self.batch_size}, every {self.flush_interval:g}s).")
+
+    def enqueue(self, row):
+        """Durably stores one row for sending; raises sqlite3.Error if the local write fails."""
+        self._connect().execute("INSERT INTO outbox (row, created_at) VALUES (?, ?)", (json.dumps(row), time.time()))
+        with self._lock:
+            self.counters["enqueued"] += 1
+            self._pending_hint += 1
+            if self._pending_hint >= self.batch_size:
+                self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                self._pending_hint = 0
+            try:
+                while self.flush_once() == self.batch_size: # A full batch means more rows may be waiting
+                    pass
+            except Exception as e:
+                logger.exception(f"Feedback outbox flush failed: {e}")
+
+    def _claim(self):
+        """Leases up to batch_size due rows to this process; returns [(id, row, attempts)]."""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT id, row, attempts FROM outbox WHERE next_attempt_at <= ? AND lease_until <= ? ORDER BY id LIMIT ?", (now, now, self.batch_size)).fetchall()
+            conn.executemany("UPDATE outbox SET lease_owner = ?, lease_until = ? WHERE id = ?", [(self.owner, now + self.lease_seconds, row_id) for row_id, _, _ in rows])
+        return rows
+
+    def flush_once(self):
+        """Sends one batch of due rows; returns how many rows were sent."""
+        claimed = self._claim()
+        if not claimed:
+            return 0
+        ids = [(row_id,) for row_id, _, _ in claimed]
+        try:
+            self.sink([json.loads(row) for _, row, _ in claimed])
+        except Exception as e:
+            self._release_failed(claimed, e)
+            return 0
+        self._connect().executemany("DELETE FROM outbox WHERE id = ? AND lease_owner = ?", [(row_id, self.owner) for row_id, in ids])
+        with self._lock:
+            self.counters["sent"] += len(ids)
+        logger.info(f"Feedback outbox sent {len(ids)} rows.")
+        return len(ids)
+
+    def _release_failed(self, claimed, error):
+        """Schedules a failed batch for retry; rows out of attempts after a non-transient error go to the dead-letter table."""
+        now = time.time()
+        attempts = max(attempts for _, _, attempts in claimed) + 1
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+        delay = max(delay, getattr(error, "retry_after", 0)) # e.g. CircuitOpenError
+        dead = [] if self.is_transient(error) else [row_id for row_id, _, row_attempts in claimed if row_attempts + 1 >= self.max_attempts]
+        with self._transaction() as conn:
+            conn.executemany("UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, lease_owner = NULL, lease_until = 0 WHERE id = ?", [(now + delay, row_id) for row_id, _, _ in claimed])
+            for row_id in dead:
+                conn.execute("INSERT OR REPLACE INTO outbox_dead SELECT id, row, created_at, attempts, ?, ? FROM outbox WHERE id = ?", (now, repr(error), row_id))
+                conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+        with self._lock:
+            self.counters["failed_batches"] += 1
+            self.counters["dead_lettered"] += len(dead)
+        logger.warning(f"Feedback outbox could not send {len(claimed)} rows (attempt {attempts}): {error}; retrying in {delay:.1f}s.")
+        if dead:
+            logger.error(f"Feedback outbox gave up on {len(dead)} rows after {self.max_attempts} attempts ({error!r}); moved to outbox_dead (ids {dead[0]}..{dead[-1]}).")
+
+    def requeue_dead_letters(self):
+        """Moves every dead-lettered row back into the outbox with a fresh attempt count; returns how many."""
+        with self._transaction() as conn:
+            count = conn.execute("INSERT INTO outbox (id, row, created_at) SELECT id, row, created_at FROM outbox_dead").rowcount
+            conn.execute("DELETE FROM outbox_dead")
+        if count:
+            logger.info(f"Feedback outbox requeued {count} dead-lettered rows.")
+            self._wake.set()
+        return count
+
+    def stats(self):
+        try:
+            conn = self._connect()
+            pending, oldest = conn.execute("SELECT COUNT(*), MIN(created_at) FROM outbox").fetchone()
+            dead_letters, = conn.execute("SELECT COUNT(*) FROM outbox_dead").fetchone()
+        except sqlite3.Error:
+            pending, oldest, dead_letters = None, None, None
+        with self._lock:
+            return {"pending": pending, "oldest_age_seconds": round(time.time() - oldest, 1) if oldest else 0.0, "dead_letters": dead_letters, **self.counters}
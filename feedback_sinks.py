@@ -0,0 +1,89 @@
+"""
+Feedback sinks: where CHIP's user ratings end up.
+
+A FeedbackSink takes rows in the feedback sheet's column order, FEEDBACK_COLUMNS
+(Timestamp, SessionID, Skill, PromptID, Rating, Comment). write_rows() stores a
+batch of them. save_user_feedback and the feedback outbox only depend on this
+interface, and the FEEDBACK_SINK setting in clarifybot.py picks the backend:
+
+* SheetsFeedbackSink appends to the first worksheet of the feedback Google
+  Sheet. This is the original behaviour.
+* SQLiteFeedbackSink writes to a local, indexed SQLite (WAL) table. Writes
+  need no network, so the feedback path can be load-tested offline, and
+  per-prompt rating queries (rating_summary) are served from the index.
+"""
+import abc
+import logging
+
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_COLUMNS = ("Timestamp", "SessionID", "Skill", "PromptID", "Rating", "Comment")
+
+
+class FeedbackSink(abc.ABC):
+    """Interface for feedback backends. Rows are lists in FEEDBACK_COLUMNS order."""
+
+    name = "feedback sink"
+
+    @abc.abstractmethod
+    def write_rows(self, rows):
+        """Stores rows in one operation and returns None; raises on failure so callers can retry."""
+
+
+class SheetsFeedbackSink(FeedbackSink):
+    """
+    Appends rows to the feedback Google Sheet through the process-wide SheetsSession.
+    session is None when the sheet isn't configured; writes then raise KeyError.
+    The optional breaker fails fast while Sheets is down. Nothing here touches Streamlit,
+    so the feedback outbox can write from its own thread.
+    """
+
+    name = "Google Sheets"
+
+    def __init__(self, session, breaker=None):
+        self.session = session
+        self.breaker = breaker
+
+    def write_rows(self, rows):
+        if self.breaker is None:
+            self._append(rows)
+            return
+        with self.breaker.guard(): # Fails fast with CircuitOpenError while Sheets is down
+            self._append(rows)
+
+    def _append(self, rows):
+        if self.session is None:
+            raise KeyError("GSHEET_ID / google_credentials")
+        self.session.run(lambda worksheet: worksheet.append_rows(rows, value_input_option='USER_ENTERED'))
+
+
+class SQLiteFeedbackSink(SQLiteStore, FeedbackSink):
+    """Local SQLite (WAL) feedback table indexed by prompt and by skill/prompt."""
+
+    name = "SQLite"
+
+    def __init__(self, path):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS feedback (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, session_id TEXT, skill TEXT, prompt_id TEXT, rating INTEGER, comment TEXT)",
+            "CREATE INDEX IF NOT EXISTS feedback_prompt_id ON feedback (prompt_id)",
+            "CREATE INDEX IF NOT EXISTS feedback_skill_prompt_id ON feedback (skill, prompt_id)",
+        ])
+        logger.info(f"SQLite feedback sink at {path}.")
+
+    def write_rows(self, rows):
+        values = [(str(row[0]), row[1], row[2], str(row[3]), row[4] if row[4] != "" else None, row[5]) for row in rows]
+        with self._transaction() as conn:
+            conn.executemany("INSERT INTO feedback (timestamp, session_id, skill, prompt_id, rating, comment) VALUES (?, ?, ?, ?, ?, ?)", values)
+
+    def rating_summary(self, prompt_id=None, skill=None):
+        """Returns {prompt_id: {"count", "mean_rating"}}, optionally for one prompt and/or skill."""
+        clauses, params = [], []
+        if prompt_id is not None:
+            clauses.append("prompt_id = ?"); params.append(str(prompt_id))
+        if skill is not None:
+            clauses.append("skill = ?"); params.append(skill)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(f"SELECT prompt_id, COUNT(rating), AVG(rating) FROM feedback {where} GROUP BY prompt_id", params).fetchall()
+        return {pid: {"count": count, "mean_rating": round(mean, 3) if mean is not None else None} for pid, count, mean in rows}
@@ -0,0 +1,147 @@
+"""
+Parsing of the interviewer's ###ANSWER### / ###ASSESSMENT### response protocol.
+
+Structured skills (STRUCTURED_RESPONSE_SKILLS) ask the model for an answer
+section and an assessment section. parse_interviewer_response splits a
+complete response. StreamingResponseParser is fed the response as it streams
+in: it shows the answer while it arrives and, once finished, returns the same
+(answer, assessment) that parse_interviewer_response returns for the full
+text. Delimiters are found once, incrementally, instead of rescanning the
+whole response on every chunk.
+
+Hypothesis responses have no sections, so stray delimiters are removed from
+them. Other skills get the raw text back.
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_RESPONSE_SKILLS = ("Clarifying", "Frameworks", "Analysis", "Recommendation")
+ANSWER_DELIMITER = "###ANSWER###"
+ASSESSMENT_DELIMITER = "###ASSESSMENT###"
+ANSWER_SECTION_RE = re.compile(r"###ANSWER###\s*(.*?)\s*###ASSESSMENT###", re.DOTALL | re.IGNORECASE)
+ASSESSMENT_SECTION_RE = re.compile(r"###ASSESSMENT###\s*(.*)", re.DOTALL | re.IGNORECASE)
+ANSWER_DELIMITER_RE = re.compile(re.escape(ANSWER_DELIMITER), re.IGNORECASE)
+ASSESSMENT_DELIMITER_RE = re.compile(re.escape(ASSESSMENT_DELIMITER), re.IGNORECASE)
+
+
+def _resolve_structured_response(response_text, answer_section, assessment_section):
+    """
+    Applies the answer/assessment fallback rules for structured skills.
+    answer_section/assessment_section are the raw delimited sections (None if not found).
+    """
+    answer = response_text.strip() if response_text else "[Empty Response]"
+    assessment = None
+    if answer_section is not None: answer = answer_section.strip()
+    if assessment_section is not None: assessment = assessment_section.strip()
+    # Simplified logging for brevity during debug
+    if answer_section is None and assessment_section is None and response_text: answer = response_text.strip(); assessment = "[Assessment not extracted]"
+    elif answer_section is not None and assessment_section is None: assessment = "[Assessment delimiter missing]"
+    elif answer_section is None and assessment_section is not None: answer = "[Answer delimiter missing]"
+    elif not response_text or not response_text.strip(): answer = "[LLM empty response]"; assessment = "[LLM empty response]"
+    return answer, assessment
+
+
+def parse_interviewer_response(response_text, skill):
+    """
+    Parses the LLM response based on the skill.
+    """
+    # Use new skill names for checks
+    # Recommendation feedback should also be structured
+    if skill in STRUCTURED_RESPONSE_SKILLS:
+        answer_match = ANSWER_SECTION_RE.search(response_text)
+        assessment_match = ASSESSMENT_SECTION_RE.search(response_text)
+        return _resolve_structured_response(response_text, answer_match.group(1) if answer_match else None, assessment_match.group(1) if assessment_match else None)
+
+    # Default values
+    answer = response_text.strip() if response_text else "[Empty Response]"
+    assessment = None
+
+    if skill == "Hypothesis":
+        # For hypothesis interaction, return the whole response as the "answer"
+        # Remove potential delimiters if the LLM accidentally includes them
+        answer = ANSWER_DELIMITER_RE.sub("", answer)
+        answer = ASSESSMENT_DELIMITER_RE.sub("", answer).strip()
+        assessment = None # No assessment during hypothesis interaction
+        if not answer:
+            logger.warning("LLM returned empty response for Hypothesis Formulation interaction.")
+            answer = "[CHIP did not provide further information]"
+
+    else:
+        logger.warning(f"Parsing response for unknown or unhandled skill: {skill}. Returning raw text.")
+        # Keep raw text as answer, assessment remains None
+
+    return answer, assessment
+
+
+def _partial_delimiter_len(text):
+    """Length of the longest suffix of text that could be the start of a protocol delimiter."""
+    tail = text[-(len(ASSESSMENT_DELIMITER) - 1):].upper()
+    for size in range(len(tail), 0, -1):
+        suffix = tail[-size:]
+        if ANSWER_DELIMITER.startswith(suffix) or ASSESSMENT_DELIMITER.startswith(suffix):
+            return size
+    return 0
+
+
+class StreamingResponseParser:
+    """
+    Chunk-fed parser for the ###ANSWER### / ###ASSESSMENT### interviewer protocol.
+    feed() returns the answer text that can be shown so far (delimiters split across
+    chunks are held back until they resolve); finish() returns the same (answer, assessment)
+    as parse_interviewer_response would for the complete text.
+    """
+
+    def __init__(self, skill):
+        self.skill = skill
+        self.text = ""
+        self._answer_pos = None # First ###ANSWER###
+        self._assessment_pos = None # First ###ASSESSMENT### anywhere
+        self._answer_end_pos = None # First ###ASSESSMENT### after the first ###ANSWER###
+
+    def feed(self, chunk):
+        """Adds a chunk of streamed text and returns the displayable answer so far."""
+        if not chunk:
+            return self.answer_so_far()
+        rescan_from = max(0, len(self.text) - len(ASSESSMENT_DELIMITER) + 1) # Delimiters may straddle chunks
+        self.text += chunk
+        if self.skill in STRUCTURED_RESPONSE_SKILLS:
+            if self._assessment_pos is None:
+                match = ASSESSMENT_DELIMITER_RE.search(self.text, rescan_from)
+                if match: self._assessment_pos = match.start()
+            if self._answer_pos is None:
+                match = ANSWER_DELIMITER_RE.search(self.text, rescan_from)
+                if match:
+                    self._answer_pos = match.start()
+                    rescan_from = match.end() # Search the whole text after the new answer delimiter
+            if self._answer_pos is not None and self._answer_end_pos is None:
+                match = ASSESSMENT_DELIMITER_RE.search(self.text, max(rescan_from, self._answer_pos + len(ANSWER_DELIMITER)))
+                if match: self._answer_end_pos = match.start()
+        return self.answer_so_far()
+
+    def answer_so_far(self):
+        """Best-effort answer text for display while the response is still streaming."""
+        safe_end = len(self.text) - _partial_delimiter_len(self.text)
+        if self.skill in STRUCTURED_RESPONSE_SKILLS:
+            if self._answer_pos is not None:
+                end = self._answer_end_pos if self._answer_end_pos is not None else safe_end
+                return self.text[self._answer_pos + len(ANSWER_DELIMITER):end].strip()
+            end = self._assessment_pos if self._assessment_pos is not None else safe_end
+            return self.text[:end].strip()
+        if self.skill == "Hypothesis":
+            visible = ANSWER_DELIMITER_RE.sub("", self.text[:safe_end])
+            return ASSESSMENT_DELIMITER_RE.sub("", visible).strip()
+        return self.text.strip()
+
+    def finish(self):
+        """Returns (answer, assessment) for the complete response."""
+        if self.skill not in STRUCTURED_RESPONSE_SKILLS:
+            return parse_interviewer_response(self.text, self.skill)
+        answer_section = None
+        if self._answer_end_pos is not None:
+            answer_section = self.text[self._answer_pos + len(ANSWER_DELIMITER):self._answer_end_pos]
+        assessment_section = None
+        if self._assessment_pos is not None:
+            assessment_section = self.text[self._assessment_pos + len(ASSESSMENT_DELIMITER):]
+        return _resolve_structured_response(self.text, answer_section, assessment_section)
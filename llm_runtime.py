@@ -0,0 +1,734 @@
+"""
+Background execution of LLM calls for CHIP.
+
+Streamlit runs each session's script on a server thread, so a blocking chat
+completion pins that thread for the whole OpenAI round-trip. Instead, all LLM
+calls are handed to an LLMExecutor: a fixed pool of worker threads shared by
+every session of the process (see get_llm_executor in clarifybot.py).
+
+Submitting returns an LLMCall handle right away. The script keeps the handle in
+session state, and later reruns poll it (clarifybot renders progress from an
+st.fragment with run_every). Streamed deltas are buffered on the handle, so the
+UI can show partial text while the call is still running.
+
+Concurrency against the API is bounded by the pool size, not by the number of
+sessions that happen to be waiting.
+
+Admission is controlled process-wide. Queued calls are dispatched by priority:
+interactive turns go before end-of-session feedback. A call starts only when
+the request and token buckets (sized from the account's per-minute limits)
+can cover it, so peaks queue up instead of failing on OpenAI rate limits. The
+wait queue is bounded. When it is full, submit() raises LLMQueueFull so the UI
+can ask the user to retry. stats() reports queue depth and wait times for
+capacity sizing.
+
+Calls submitted with a session_id are also checked against per-session
+SessionQuotas: calls per minute, tokens per session and calls in flight. A
+session over budget gets SessionQuotaExceeded at submit time instead of a
+queued request, so one user can't starve the others.
+
+Chat calls follow a RetryPolicy. Retryable API errors (connection problems,
+timeouts, 408/409/429 and 5xx) are retried with exponential backoff and full
+jitter, but only before any text has reached the UI. A retry doesn't sleep on
+its worker: the call goes back to the executor's queue once its backoff has
+passed, and is charged to the buckets again like any other request. With
+hedge_after set, a second identical request is sent if no first token has
+arrived by then, and whichever request starts answering first wins; the other
+one's stream is closed right away. Hedges go through the same admission
+control as queued calls (buckets and session quotas), and at most max_hedges
+of them run at once. stats() includes time-to-first-token percentiles to help
+pick that threshold.
+
+An optional CircuitBreaker (circuit_breaker.py) guards the API. While it is
+open, submit() raises CircuitOpenError right away, and queued calls fail fast
+instead of waiting out timeouts. Cancelled calls count as neither success nor
+failure.
+"""
+import collections
+import concurrent.futures
+import contextlib
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+import openai
+
+from circuit_breaker import all_breaker_stats
+
+logger = logging.getLogger(__name__)
+
+
+# Dispatch priorities (lower runs first)
+PRIORITY_INTERACTIVE = 0 # Interviewer answers the candidate is waiting on
+PRIORITY_FEEDBACK = 1 # End-of-session feedback reports
+WAIT_STATS_WINDOW = 500 # Recent calls used for wait-time and first-token stats
+STATS_LOG_EVERY = 100 # Log executor stats after this many finished calls
+SESSION_IDLE_SECONDS = 3600 # Per-session counters are dropped after this long without calls
+
+
+class LLMCallCancelled(Exception):
+    """Raised by LLMCall.result() for calls cancelled before they finished."""
+
+
+class LLMQueueFull(Exception):
+    """Raised by LLMExecutor.submit() when the wait queue is at capacity."""
+
+
+class _RetryLater(Exception):
+    """Raised by run_chat_completion to have the executor queue the call again after delay seconds."""
+
+    def __init__(self, delay):
+        super().__init__(f"retry in {delay:.2f}s")
+        self.delay = delay
+
+
+class SessionQuotaExceeded(Exception):
+    """
+    Raised by LLMExecutor.submit() when a session is over one of its quotas.
+    reason is "rate", "tokens" or "in_flight"; retry_after is seconds until a retry can succeed (None if it can't).
+    """
+
+    def __init__(self, reason, message, retry_after=None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def estimate_chat_tokens(messages, max_tokens=0):
+    """
+    Rough token cost of a chat completion for rate limiting (about 4 characters per token).
+    max_tokens is included because OpenAI counts it against the tokens-per-minute limit.
+    """
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 4 * len(messages) + (max_tokens or 0)
+
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile (q in [0, 1]) of an ascending list; 0.0 if empty."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))]
+
+
+def is_retryable_error(error):
+    """True for transient OpenAI errors: connection problems/timeouts, 408/409/429 (except exhausted quota) and 5xx."""
+    if isinstance(error, openai.APIConnectionError): # Includes APITimeoutError
+        return True
+    status = getattr(error, "status_code", None)
+    if status == 429 and getattr(error, "code", None) == "insufficient_quota":
+        return False
+    return status in (408, 409, 429) or (status is not None and status >= 500)
+
+
+class RetryPolicy:
+    """
+    How a chat call is retried and hedged.
+    max_attempts counts the first try; backoff before retry n is uniform in [0, min(max_delay, base_delay * 2**(n-1))],
+    or the server's Retry-After if longer. hedge_after is the number of seconds without a first token
+    before a duplicate request is sent (None disables hedging).
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, hedge_after=None):
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}.")
+        self.max_attempts = int(max_attempts)
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.hedge_after = float(hedge_after) if hedge_after else None
+
+    def without_hedging(self):
+        return RetryPolicy(self.max_attempts, self.base_delay, self.max_delay, None)
+
+    def backoff(self, attempt, error=None):
+        """Seconds to wait after failed attempt number attempt (1-based)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        response = getattr(error, "response", None)
+        try:
+            retry_after = float(response.headers.get("retry-after")) if response is not None else None
+        except (TypeError, ValueError):
+            retry_after = None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def __repr__(self):
+        return f"RetryPolicy(max_attempts={self.max_attempts}, base_delay={self.base_delay}, max_delay={self.max_delay}, hedge_after={self.hedge_after})"
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class TokenBucket:
+    """
+    Token bucket that refills at rate units per second, up to capacity.
+    A request larger than capacity is admitted once the bucket is full, leaving it in debt.
+    Not thread-safe; LLMExecutor only uses it under its own lock.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount):
+        """Returns seconds until amount can be taken (0 if available now)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+    @classmethod
+    def per_minute(cls, limit, burst_seconds):
+        """Bucket for a per-minute limit holding burst_seconds worth of it; None if limit is unset."""
+        if not limit or limit <= 0:
+            return None
+        rate = limit / 60.0
+        return cls(rate, max(1.0, rate * burst_seconds))
+
+
+class SessionQuotas:
+    """
+    Per-session LLM budgets: calls per rolling minute, total tokens per session and concurrent calls.
+    Counters are small in-process records keyed by session id; idle sessions are pruned.
+    A limit of None or 0 disables that check.
+    """
+
+    def __init__(self, calls_per_minute=None, tokens_per_session=None, max_in_flight=None):
+        self.calls_per_minute = calls_per_minute
+        self.tokens_per_session = tokens_per_session
+        self.max_in_flight = max_in_flight
+        self._sessions = {} # session_id -> {"calls": deque of call times, "tokens": int, "in_flight": int, "last_seen": float}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self.denied = collections.Counter()
+
+    def admit(self, session_id, cost_tokens, in_flight=True):
+        """
+        Reserves one call of cost_tokens for session_id, or raises SessionQuotaExceeded.
+        With in_flight=False the call counts against the rate and token quotas only (hedge requests of a running call).
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prune > 60:
+                self._prune(now)
+            usage = self._sessions.setdefault(session_id, {"calls": collections.deque(), "tokens": 0, "in_flight": 0, "last_seen": now})
+            usage["last_seen"] = now
+            calls = usage["calls"]
+            while calls and now - calls[0] >= 60:
+                calls.popleft()
+            if in_flight and self.max_in_flight and usage["in_flight"] >= self.max_in_flight:
+                self.denied["in_flight"] += 1
+                raise SessionQuotaExceeded("in_flight", f"Session {session_id} already has {usage['in_flight']} LLM calls running.", retry_after=1.0)
+            if self.calls_per_minute and len(calls) >= self.calls_per_minute:
+                self.denied["rate"] += 1
+                raise SessionQuotaExceeded("rate", f"Session {session_id} made {len(calls)} LLM calls in the last minute.", retry_after=60 - (now - calls[0]))
+            if self.tokens_per_session and usage["tokens"] + cost_tokens > self.tokens_per_session:
+                self.denied["tokens"] += 1
+                raise SessionQuotaExceeded("tokens", f"Session {session_id} used {usage['tokens']} of {self.tokens_per_session} LLM tokens.")
+            calls.append(now)
+            usage["tokens"] += cost_tokens
+            if in_flight:
+                usage["in_flight"] += 1
+
+    def release(self, session_id):
+        """Marks one of session_id's calls as finished."""
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            if usage and usage["in_flight"] > 0:
+                usage["in_flight"] -= 1
+
+    def usage(self, session_id):
+        """Returns (calls in the last minute, tokens used, calls in flight) for session_id."""
+        now = time.monotonic()
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            if usage is None:
+                return (0, 0, 0)
+            return (sum(1 for t in usage["calls"] if now - t < 60), usage["tokens"], usage["in_flight"])
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "denied": dict(self.denied)}
+
+    def _prune(self, now):
+        idle = [sid for sid, usage in self._sessions.items() if usage["in_flight"] == 0 and now - usage["last_seen"] > SESSION_IDLE_SECONDS]
+        for sid in idle:
+            del self._sessions[sid]
+        self._last_prune = now
+
+
+class LLMCall:
+    """
+    Handle for one submitted LLM call.
+    Worker threads append text with emit(). The script thread reads it with
+    chunks_since()/text() and collects result() once done().
+    """
+
+    def __init__(self, call_id, label, fn, args, kwargs, priority=PRIORITY_INTERACTIVE, cost_tokens=0, session_id=None):
+        self.id = call_id
+        self.label = label
+        self.priority = priority
+        self.cost_tokens = cost_tokens
+        self.session_id = session_id
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+        self.attempts = 0 # Chat requests sent so far, counting retries (see run_chat_completion)
+        self.retry_at = None # Monotonic time a rescheduled retry is due, while it waits in the executor
+        self._fn, self._args, self._kwargs = fn, args, kwargs
+        self._chunks = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        self._cancelled = False
+        self._release_hook = None # Set by LLMExecutor.submit() to free the session's in-flight quota slot
+
+    def emit(self, text):
+        """Appends streamed text (called from the worker thread)."""
+        if text:
+            with self._lock:
+                if not self._chunks:
+                    self.first_token_at = time.time()
+                self._chunks.append(text)
+
+    def chunks_since(self, cursor):
+        """Returns (chunks emitted after position cursor, new cursor)."""
+        with self._lock:
+            new_chunks = self._chunks[cursor:]
+        return new_chunks, cursor + len(new_chunks)
+
+    def text(self):
+        """Returns all text emitted so far."""
+        with self._lock:
+            return "".join(self._chunks)
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        """
+        Asks the call to stop. Queued calls (and retries waiting for their backoff) are skipped and give back
+        their session's in-flight slot right away; streaming calls stop at the next chunk.
+        """
+        self._cancelled = True
+        if self.started_at is None or self.retry_at is not None:
+            self._release_quota()
+
+    def _release_quota(self):
+        """Runs the release hook once, whichever of cancel() and the worker gets here first."""
+        with self._lock:
+            hook, self._release_hook = self._release_hook, None
+        if hook is not None:
+            hook()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the call finishes or timeout passes; returns done()."""
+        return self._done.wait(timeout)
+
+    def result(self, timeout=None):
+        """Returns the call's result, re-raising its exception if it failed."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"LLM call {self.id} ({self.label}) still running.")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    @property
+    def queue_wait(self):
+        """Seconds the call waited for admission (so far, if it hasn't started)."""
+        return (self.started_at or time.time()) - self.submitted_at
+
+    def exception(self):
+        """Returns the exception of a finished, failed call, else None."""
+        return self._error if self.done() else None
+
+    def _run(self):
+        """Runs the call on a worker. Returns the delay in seconds if it asked to be retried later, else None once finished."""
+        if self._cancelled:
+            self._error = LLMCallCancelled(f"LLM call {self.id} ({self.label}) cancelled before it started.")
+        else:
+            if self.started_at is None: # Retries keep the first start, so queue_wait is the initial admission wait
+                self.started_at = time.time()
+            try:
+                self._result = self._fn(self, *self._args, **self._kwargs)
+            except _RetryLater as retry:
+                return retry.delay
+            except Exception as e:
+                self._error = e
+        self.finished_at = time.time()
+        self._fn = self._args = self._kwargs = None # Drop prompt payloads once finished
+        self._done.set()
+        return None
+
+
+def _response_pieces(client, create_kwargs, on_stream=None):
+    """
+    Yields the text of one chat completion: each delta when streaming, else the whole message.
+    on_stream, if given, is called with the stream as soon as the response starts, so another thread can close it.
+    """
+    if not create_kwargs.get("stream"):
+        response = client.chat.completions.create(**create_kwargs)
+        yield response.choices[0].message.content or ""
+        return
+    stream = client.chat.completions.create(**create_kwargs)
+    if on_stream is not None:
+        on_stream(stream)
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+def _run_attempt(call, client, create_kwargs):
+    """Sends one request and emits its text on call."""
+    for piece in _response_pieces(client, create_kwargs):
+        if call.cancelled:
+            raise LLMCallCancelled(f"LLM call {call.id} ({call.label}) cancelled while streaming.")
+        call.emit(piece)
+
+
+def _run_hedged(call, client, create_kwargs, hedge_after, executor):
+    """
+    Sends a request and, if it hasn't produced text within hedge_after seconds, an identical second one.
+    The first request to produce text is emitted on call. The loser's stream is closed as soon as there is
+    a winner (or as soon as it starts, if it starts later), so it gives its attempt pool thread back promptly.
+    Both requests run on the executor's attempt pool. The hedge is only sent if executor admits it
+    (see LLMExecutor._admit_hedge); otherwise the call keeps waiting on the first request.
+    """
+    cond = threading.Condition()
+    state = {"winner": None, "launched": 0, "outcomes": {}, "streams": {}} # outcomes: attempt -> exception or None
+
+    def claim(n):
+        """Makes attempt n the winner if there is none yet (call with cond held); returns the streams to close."""
+        if state["winner"] is not None:
+            return []
+        state["winner"] = n
+        cond.notify_all()
+        return [stream for m, stream in state["streams"].items() if m != n]
+
+    def close_streams(streams):
+        for stream in streams:
+            try:
+                stream.close()
+            except Exception as e: # The loser's own read fails with it, which is expected
+                logger.debug(f"Closing losing hedge stream of LLM call {call.id} failed: {e!r}")
+
+    def attempt(n):
+        def on_stream(stream):
+            with cond:
+                state["streams"][n] = stream
+                lost = state["winner"] not in (None, n)
+            if lost:
+                close_streams([stream])
+
+        error = None
+        try:
+            pieces = _response_pieces(client, create_kwargs, on_stream)
+            try:
+                for piece in pieces:
+                    with cond:
+                        losers = claim(n)
+                        won = state["winner"] == n
+                    close_streams(losers)
+                    if not won or call.cancelled:
+                        break
+                    call.emit(piece)
+                with cond: # Finished without text
+                    losers = claim(n)
+                close_streams(losers)
+            finally:
+                pieces.close()
+        except Exception as e:
+            error = e
+        finally:
+            if n > 0:
+                executor._hedge_finished()
+            with cond:
+                state["outcomes"][n] = error
+                cond.notify_all()
+
+    with cond:
+        state["launched"] = 1
+        executor._attempt_pool.submit(attempt, 0)
+        if not cond.wait_for(lambda: state["winner"] is not None or len(state["outcomes"]) == state["launched"], timeout=hedge_after):
+            if executor._admit_hedge(call):
+                logger.info(f"LLM call {call.id} ({call.label}) has no first token after {hedge_after:.2f}s, sending hedge request.")
+                state["launched"] = 2
+                executor._attempt_pool.submit(attempt, 1)
+        cond.wait_for(lambda: state["winner"] in state["outcomes"] or len(state["outcomes"]) == state["launched"])
+        winner = state["winner"]
+        if winner is None: # Every attempt failed before producing text
+            raise next(e for e in state["outcomes"].values() if e is not None)
+        if state["outcomes"][winner] is not None:
+            raise state["outcomes"][winner]
+        if winner > 0:
+            executor._count_hedge_win()
+            logger.info(f"LLM call {call.id} ({call.label}) answered by hedge request.")
+    if call.cancelled:
+        raise LLMCallCancelled(f"LLM call {call.id} ({call.label}) cancelled while streaming.")
+
+
+def run_chat_completion(call, client, create_kwargs, retry_policy=None, circuit_breaker=None, executor=None):
+    """
+    Runs one chat completion for call and returns the response text.
+    With stream=True each delta is emitted on the handle as it arrives.
+    Failed attempts are retried per retry_policy as long as no text has been emitted. Under an executor the
+    retry is rescheduled there (raising _RetryLater) instead of sleeping on the worker; call.attempts carries
+    the count across runs. Each attempt goes through circuit_breaker, if given. Hedging needs the executor too.
+    """
+    retry_policy = retry_policy or NO_RETRY
+    while True:
+        call.attempts += 1
+        attempt = call.attempts
+        try:
+            with (circuit_breaker.guard(neutral=LLMCallCancelled) if circuit_breaker is not None else contextlib.nullcontext()):
+                if retry_policy.hedge_after and executor is not None:
+                    _run_hedged(call, client, create_kwargs, retry_policy.hedge_after, executor)
+                else:
+                    _run_attempt(call, client, create_kwargs)
+            return call.text()
+        except LLMCallCancelled:
+            raise
+        except Exception as e:
+            if call.cancelled or call.text() or attempt >= retry_policy.max_attempts or not is_retryable_error(e):
+                raise
+            delay = retry_policy.backoff(attempt, e)
+            logger.warning(f"LLM call {call.id} ({call.label}) attempt {attempt} failed with {e!r}, retrying in {delay:.2f}s.")
+            if executor is not None:
+                raise _RetryLater(delay) from e
+            time.sleep(delay)
+
+
+class LLMExecutor:
+    """
+    Fixed pool of daemon worker threads that run submitted LLM calls.
+    One instance is shared by all sessions of the process. Queued calls are dispatched
+    by priority, then submission order, once the rate limit buckets can cover them.
+    Retries wait out their backoff in a separate heap, then rejoin the queue in their original place.
+    Hedged chat calls run their requests on a separate attempt pool; at most max_hedges
+    hedge requests are in flight at once, and each is charged to the buckets and session quotas.
+    """
+
+    def __init__(self, max_workers=8, name="llm", max_queue=None, requests_per_minute=None, tokens_per_minute=None, burst_seconds=10.0, session_quotas=None, circuit_breaker=None, max_hedges=None):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}.")
+        self.max_workers = max_workers
+        self.max_hedges = max(0, max_workers // 4 if max_hedges is None else max_hedges)
+        self.name = name
+        self.max_queue = max_queue
+        self.session_quotas = session_quotas
+        self.circuit_breaker = circuit_breaker
+        self._request_bucket = TokenBucket.per_minute(requests_per_minute, burst_seconds)
+        self._token_bucket = TokenBucket.per_minute(tokens_per_minute, burst_seconds)
+        self._heap = [] # (priority, call id, call)
+        self._retry_heap = [] # (retry_at, call id, call): retries waiting for their backoff
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._retries = 0
+        self._waits = collections.deque(maxlen=WAIT_STATS_WINDOW)
+        self._first_token_latencies = collections.deque(maxlen=WAIT_STATS_WINDOW)
+        self._hedge_slots = threading.BoundedSemaphore(self.max_hedges) if self.max_hedges else None
+        self._hedges = collections.Counter() # sent, won, skipped
+        self._attempt_pool = concurrent.futures.ThreadPoolExecutor(max_workers + self.max_hedges, thread_name_prefix=f"{name}-attempt")
+        self._shutdown = False
+        self._workers = [threading.Thread(target=self._worker, name=f"{name}-worker-{i + 1}", daemon=True) for i in range(max_workers)]
+        for worker in self._workers:
+            worker.start()
+        logger.info(f"Started LLM executor '{name}' with {max_workers} workers (max_queue={max_queue}, rpm={requests_per_minute}, tpm={tokens_per_minute}, max_hedges={self.max_hedges}).")
+
+    def submit(self, fn, *args, label="llm", priority=PRIORITY_INTERACTIVE, cost_tokens=0, session_id=None, **kwargs):
+        """
+        Queues fn(call, *args, **kwargs) and returns its LLMCall handle immediately.
+        cost_tokens is charged to the tokens-per-minute bucket when the call starts.
+        Raises CircuitOpenError while the circuit breaker is open, LLMQueueFull if max_queue calls
+        are already waiting, or SessionQuotaExceeded if session_id is given and the session is over its quotas.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.check()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError(f"LLM executor '{self.name}' is shut down.")
+            if self.max_queue is not None and len(self._heap) >= self.max_queue:
+                self._rejected += 1
+                logger.warning(f"LLM queue full ({len(self._heap)} waiting), rejected call '{label}'.")
+                raise LLMQueueFull(f"{len(self._heap)} LLM calls are already waiting.")
+            if session_id is not None and self.session_quotas is not None:
+                self.session_quotas.admit(session_id, cost_tokens)
+            call = LLMCall(next(self._ids), label, fn, args, kwargs, priority=priority, cost_tokens=cost_tokens, session_id=session_id)
+            if session_id is not None and self.session_quotas is not None:
+                call._release_hook = lambda: self.session_quotas.release(session_id)
+            heapq.heappush(self._heap, (priority, call.id, call))
+            self._cond.notify()
+        return call
+
+    def submit_chat(self, client, label="chat", priority=PRIORITY_INTERACTIVE, session_id=None, retry_policy=None, **create_kwargs):
+        """
+        Queues client.chat.completions.create(**create_kwargs), retried/hedged per retry_policy.
+        The call's result is the response text.
+        """
+        cost_tokens = estimate_chat_tokens(create_kwargs.get("messages", []), create_kwargs.get("max_tokens"))
+        return self.submit(run_chat_completion, client, create_kwargs, retry_policy, self.circuit_breaker, self, label=label, priority=priority, cost_tokens=cost_tokens, session_id=session_id)
+
+    def stats(self):
+        """Returns a snapshot of pool size, queue depth per priority, call counts and recent admission waits."""
+        with self._cond:
+            queued_by_priority = collections.Counter(priority for priority, _, _ in self._heap)
+            waits = sorted(self._waits)
+            ttfts = sorted(self._first_token_latencies)
+            oldest_wait = max((call.queue_wait for _, _, call in self._heap), default=0.0)
+            return {
+                "workers": self.max_workers, "queued": len(self._heap), "queued_by_priority": dict(queued_by_priority),
+                "oldest_queued_seconds": round(oldest_wait, 3), "running": self._running,
+                "completed": self._completed, "failed": self._failed, "rejected": self._rejected,
+                "retrying": len(self._retry_heap), "retries": self._retries,
+                "wait_avg_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "wait_p95_seconds": round(_percentile(waits, 0.95), 3),
+                "wait_max_seconds": round(waits[-1], 3) if waits else 0.0,
+                "first_token_p50_seconds": round(_percentile(ttfts, 0.5), 3),
+                "first_token_p95_seconds": round(_percentile(ttfts, 0.95), 3),
+                "hedges": {"max": self.max_hedges, **{key: self._hedges[key] for key in ("sent", "won", "skipped")}},
+                "session_quotas": self.session_quotas.stats() if self.session_quotas is not None else None,
+                "circuit_breaker": self.circuit_breaker.stats() if self.circuit_breaker is not None else None,
+            }
+
+    def shutdown(self):
+        """Stops the workers once the calls already queued have run."""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+
+    def _admission_delay(self, call):
+        """Seconds until the rate limit buckets can cover call (0 if it may start now)."""
+        delays = [0.0]
+        if self._request_bucket is not None:
+            delays.append(self._request_bucket.delay(1))
+        if self._token_bucket is not None:
+            delays.append(self._token_bucket.delay(call.cost_tokens))
+        return max(delays)
+
+    def _admit_hedge(self, call):
+        """
+        Reserves a hedge request for the running call: a free hedge slot, room in the rate limit buckets
+        right now and the session's rate and token quotas. Returns False (and sends nothing) if any is missing.
+        """
+        if self._hedge_slots is None or not self._hedge_slots.acquire(blocking=False):
+            reason = "no free hedge slot"
+        else:
+            with self._cond:
+                reason = "rate limit buckets are empty" if self._admission_delay(call) > 0 else None
+                if reason is None and call.session_id is not None and self.session_quotas is not None:
+                    try:
+                        self.session_quotas.admit(call.session_id, call.cost_tokens, in_flight=False)
+                    except SessionQuotaExceeded as e:
+                        reason = f"session quota ({e.reason})"
+                if reason is None:
+                    if self._request_bucket is not None:
+                        self._request_bucket.take(1)
+                    if self._token_bucket is not None:
+                        self._token_bucket.take(call.cost_tokens)
+                    self._hedges["sent"] += 1
+                    return True
+            self._hedge_slots.release()
+        with self._cond:
+            self._hedges["skipped"] += 1
+        logger.info(f"LLM call {call.id} ({call.label}) not hedged: {reason}.")
+        return False
+
+    def _hedge_finished(self):
+        self._hedge_slots.release()
+
+    def _count_hedge_win(self):
+        with self._cond:
+            self._hedges["won"] += 1
+
+    def _reschedule(self, call, delay):
+        """Puts a call that asked for a retry back in the queue after delay seconds (it keeps its session slot)."""
+        with self._cond:
+            self._running -= 1
+            self._retries += 1
+            call.retry_at = time.monotonic() + delay
+            heapq.heappush(self._retry_heap, (call.retry_at, call.id, call))
+            self._cond.notify()
+
+    def _next_call(self):
+        """Blocks until the highest-priority queued call is admitted; returns it, or None on shutdown."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._retry_heap and self._retry_heap[0][0] <= now:
+                    _, _, retry = heapq.heappop(self._retry_heap)
+                    retry.retry_at = None
+                    heapq.heappush(self._heap, (retry.priority, retry.id, retry))
+                next_retry = self._retry_heap[0][0] - now if self._retry_heap else None
+                if not self._heap:
+                    if self._shutdown and next_retry is None:
+                        return None
+                    self._cond.wait(next_retry)
+                    continue
+                call = self._heap[0][2]
+                delay = 0.0 if call.cancelled else self._admission_delay(call) # Cancelled calls are dropped without using quota
+                if delay > 0:
+                    self._cond.wait(delay if next_retry is None else min(delay, next_retry)) # Woken early if a higher-priority call arrives
+                    continue
+                heapq.heappop(self._heap)
+                if not call.cancelled:
+                    if self._request_bucket is not None:
+                        self._request_bucket.take(1)
+                    if self._token_bucket is not None:
+                        self._token_bucket.take(call.cost_tokens)
+                self._running += 1
+                if self._heap:
+                    self._cond.notify() # Let another idle worker look at the new head
+                return call
+
+    def _worker(self):
+        while True:
+            call = self._next_call()
+            if call is None:
+                return
+            retry_delay = call._run()
+            if retry_delay is not None:
+                self._reschedule(call, retry_delay)
+                continue
+            wait = call.queue_wait
+            call._release_quota()
+            with self._cond:
+                self._running -= 1
+                self._waits.append(wait)
+                if call.first_token_at is not None and call.started_at is not None:
+                    self._first_token_latencies.append(call.first_token_at - call.started_at)
+                if call._error is None:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                finished = self._completed + self._failed
+            if wait >= 1.0:
+                logger.info(f"LLM call {call.id} ({call.label}, priority {call.priority}) waited {wait:.2f}s for admission.")
+            if call._error is not None and not isinstance(call._error, LLMCallCancelled):
+                logger.warning(f"LLM call {call.id} ({call.label}) failed after {call.finished_at - call.submitted_at:.2f}s: {call._error!r}")
+            if finished % STATS_LOG_EVERY == 0:
+                logger.info(f"LLM executor '{self.name}' stats: {self.stats()}")
+                logger.info(f"Circuit breaker stats: {all_breaker_stats()}")
@@ -0,0 +1,594 @@
+"""
+Prompt catalog loading for CHIP.
+
+Streamlit re-executes clarifybot.py on every widget interaction, so the prompt
+catalog is owned by a process-wide loader (see get_prompt_catalog_loader in
+clarifybot.py) instead of being parsed at script top level on every rerun.
+The loader re-reads prompts.json only when the file actually changes on disk.
+
+Loaded prompts are held in a PromptCatalog: immutable __slots__ records with
+id -> record and skill -> ids indexes built once per load, so lookups on the
+rerun path are constant time.
+
+For large libraries, prompts.json can be converted into a packed store: a
+JSONL data file (one prompt per line) plus a small index of ids, skills and
+byte offsets. When a store that matches prompts.json exists, the app mmaps
+the data file and decodes a prompt only when it is requested:
+
+    python prompt_catalog.py build [path/to/prompts.json]
+
+The text form of each prompt's exhibits used in feedback prompts
+(exhibit_context) is rendered once at load/build time and stored on the record,
+so feedback generation doesn't rebuild DataFrames. Exhibit tables are rendered
+either as padded text tables ("table", the original format) or as compact CSV
+with normalized numbers ("compact"). Compare their token cost with:
+
+    python prompt_catalog.py compare-tokens [path/to/prompts.json]
+
+Sessions draw prompts from a PromptDeck per skill: a shuffled permutation of the
+skill's prompt positions plus a cursor. Each draw is O(1), no prompt repeats until
+the deck is exhausted, and the deck reshuffles itself when it runs out or the
+catalog is reloaded.
+"""
+import argparse
+import array
+import csv
+import functools
+import glob
+import hashlib
+import io
+import json
+import logging
+import math
+import mmap
+import numbers
+import os
+import random
+import sys
+import threading
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def validate_prompts(prompts):
+    """Raises ValueError if the parsed JSON doesn't have the expected prompt shape."""
+    if not isinstance(prompts, list) or not all(isinstance(p, dict) and 'id' in p and 'prompt_text' in p for p in prompts):
+        raise ValueError("Prompts JSON must be a list of dictionaries, each with 'id' and 'prompt_text' keys.")
+
+
+# --- Exhibit Text for LLM Prompts ---
+EXHIBIT_TEXT_FORMATS = ("table", "compact")
+
+
+def _compact_value(value):
+    """
+    Normalizes a cell for compact output: 1500000.0 -> 1500000, 0.125000 -> 0.125, 0.000000123 -> 1.23e-07,
+    NaN/None -> ''. Non-integers keep 6 significant digits, so small values don't round to 0.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return str(value).strip()
+    if isinstance(value, numbers.Integral) or float(value).is_integer():
+        return str(int(value))
+    if abs(value) >= 1e6:
+        return str(round(value)) # Already 7+ significant digits, and no exponent
+    return format(float(value), ".6g")
+
+
+def compact_table_text(df):
+    """Serializes a DataFrame as header + rows of CSV with normalized numbers (no alignment padding)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([str(col) for col in df.columns])
+    for row in df.itertuples(index=False, name=None):
+        writer.writerow([_compact_value(v) for v in row])
+    return buffer.getvalue().rstrip("\n")
+
+
+def format_exhibit_context(exhibits, skill_type, text_format="table"):
+    """
+    Renders a prompt's exhibits as the plain-text block used in Analysis/Recommendation
+    feedback prompts. Recommendation summary lists are rendered as bullets; other skills
+    keep the raw value, as generate_final_feedback always did. text_format "compact"
+    writes exhibit tables as CSV instead of df.to_string's padded columns.
+    """
+    exhibits_data_for_llm = []
+    for idx, ex in enumerate(exhibits):
+        ex_title = ex.get("exhibit_title", f"Exhibit {idx+1}")
+        ex_desc = ex.get("description", "")
+        ex_data_summary = ""
+        if ex.get("data"):
+            try:
+                df = pd.DataFrame(ex.get("data"))
+                if text_format == "compact":
+                    ex_data_summary = f"Data for {ex_title} (CSV):\n{compact_table_text(df)}\n"
+                else:
+                    ex_data_summary = f"Data for {ex_title}:\n{df.to_string(index=False)}\n"
+            except Exception:
+                ex_data_summary = f"Data for {ex_title}: Error processing data.\n"
+        elif ex.get("summary_text"):
+            summary_text_content = ex.get("summary_text")
+            if skill_type == "Recommendation" and isinstance(summary_text_content, (list, tuple)):
+                ex_data_summary = f"Summary Text for {ex_title}:\n" + "\n".join([f"- {item}" for item in summary_text_content]) + "\n"
+            else:
+                if isinstance(summary_text_content, tuple): summary_text_content = list(summary_text_content)
+                ex_data_summary = f"Summary Text for {ex_title}:\n{summary_text_content}\n"
+        exhibits_data_for_llm.append(f"{ex_title}\n{ex_desc}\n{ex_data_summary}")
+    return "\n\n".join(exhibits_data_for_llm)
+
+
+def with_exhibit_context(prompt, text_format="table"):
+    """Returns the prompt dict with its precomputed 'exhibit_context' added (unchanged if it has no exhibits)."""
+    exhibits = prompt.get("exhibits")
+    if not exhibits or "exhibit_context" in prompt:
+        return prompt
+    return dict(prompt, exhibit_context=format_exhibit_context(exhibits, prompt.get("skill_type"), text_format))
+
+
+def get_token_counter():
+    """
+    Returns (count_tokens, name). Uses tiktoken's gpt-4o encoding when it is installed,
+    otherwise a ~4 characters/token estimate (fine for comparing formats, not for billing).
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return (lambda text: len(encoding.encode(text))), "tiktoken o200k_base"
+    except ImportError:
+        return (lambda text: math.ceil(len(text) / 4)), "estimate (chars/4; pip install tiktoken for exact counts)"
+
+
+def compare_exhibit_formats(prompts):
+    """Yields (prompt_id, skill_type, table_tokens, compact_tokens) for every prompt with exhibits."""
+    count_tokens, _ = get_token_counter()
+    for prompt in prompts:
+        exhibits = prompt.get("exhibits")
+        if not exhibits:
+            continue
+        table_text = format_exhibit_context(exhibits, prompt.get("skill_type"), "table")
+        compact_text = format_exhibit_context(exhibits, prompt.get("skill_type"), "compact")
+        yield prompt['id'], prompt.get("skill_type"), count_tokens(table_text), count_tokens(compact_text)
+
+
+_MISSING = object()
+
+
+def _freeze(value):
+    """Converts JSON lists to tuples (recursively) so shared records can't be mutated in place."""
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Inverse of _freeze: converts tuples back to lists (recursively) for libraries that only accept lists, such as plotly."""
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+class _FrozenRecord:
+    """
+    Immutable, dict-like record backed by __slots__.
+    Supports .get(), [] and `in` so UI code written against the raw JSON dicts keeps working.
+    """
+    __slots__ = ()
+    _FIELDS = ()
+
+    def __init__(self, raw):
+        for field in self._FIELDS:
+            object.__setattr__(self, field, self._convert(field, raw[field]) if field in raw else _MISSING)
+        extra = {k: _freeze(v) for k, v in raw.items() if k not in self._FIELDS}
+        object.__setattr__(self, '_extra', extra or None)
+
+    def _convert(self, field, value):
+        return _freeze(value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, key):
+        if key in self._FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        elif self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        present = [f for f in self._FIELDS if getattr(self, f) is not _MISSING]
+        return present + list(self._extra or ())
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.get('id', self.get('exhibit_title'))!r})"
+
+
+class ExhibitRecord(_FrozenRecord):
+    """One exhibit of a prompt (chart/table data or summary findings)."""
+    _FIELDS = ('exhibit_title', 'description', 'chart_type', 'data', 'summary_text',
+               'x_axis', 'y_axis', 'names', 'values', 'color', 'size')
+    __slots__ = _FIELDS + ('_extra',)
+
+    def _convert(self, field, value):
+        if field == 'data' and isinstance(value, dict):
+            # pandas needs a real dict here; columns become tuples
+            return {col: _freeze(vals) for col, vals in value.items()}
+        return _freeze(value)
+
+
+class PromptRecord(_FrozenRecord):
+    """One case prompt from prompts.json (plus its precomputed exhibit_context, if any)."""
+    _FIELDS = ('id', 'title', 'skill_type', 'prompt_text', 'exhibits', 'exhibit_context')
+    __slots__ = _FIELDS + ('_extra',)
+
+    def _convert(self, field, value):
+        if field == 'exhibits' and isinstance(value, list):
+            return tuple(ExhibitRecord(ex) if isinstance(ex, dict) else _freeze(ex) for ex in value)
+        return _freeze(value)
+
+
+class PromptCatalog:
+    """
+    Immutable, indexed view of the prompt list.
+    Lookups by id return the first prompt with that id, matching the old linear scan.
+    """
+
+    def __init__(self, prompts, version=0, exhibit_text_format="table"):
+        self.version = version
+        self.records = tuple(PromptRecord(with_exhibit_context(p, exhibit_text_format)) for p in prompts)
+        self.prompt_ids = tuple(r['id'] for r in self.records)
+        self._by_id = {}
+        skill_ids = {}
+        for record in self.records:
+            self._by_id.setdefault(record['id'], record)
+            skill_ids.setdefault(record.get('skill_type'), []).append(record['id'])
+        self._skill_ids = {skill: tuple(ids) for skill, ids in skill_ids.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def get(self, prompt_id):
+        """Returns the PromptRecord for prompt_id, or None."""
+        return self._by_id.get(prompt_id)
+
+    def ids_for_skill(self, skill):
+        """Returns the prompt ids for a skill (in file order), or an empty tuple."""
+        return self._skill_ids.get(skill, ())
+
+
+# --- Packed (mmap) Prompt Store ---
+STORE_FORMAT_VERSION = 2 # 2: records carry exhibit_context
+STORE_INDEX_SUFFIX = ".store.idx.json"
+DECODED_RECORD_CACHE_SIZE = 64 # Decoded prompts kept per process; a session only ever views one
+
+
+def default_store_index_path(prompts_path):
+    """prompts.json -> prompts.store.idx.json (next to the source file)."""
+    return os.path.splitext(prompts_path)[0] + STORE_INDEX_SUFFIX
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_prompt_store(prompts_path, index_path=None, exhibit_text_format="table"):
+    """
+    Converts prompts.json into a packed store: <name>.store.<hash>.jsonl holding one
+    compact JSON prompt (with exhibit_context) per line, and <name>.store.idx.json with ids, skills and byte
+    offsets. Files are written to temp names and renamed, so running apps never see
+    a half-written store. Returns the index path.
+    """
+    index_path = index_path or default_store_index_path(prompts_path)
+    with open(prompts_path, 'rb') as f:
+        raw = f.read()
+    prompts = json.loads(raw.decode('utf-8'))
+    validate_prompts(prompts)
+
+    lines, entries, offset = [], [], 0
+    for prompt in prompts:
+        line = json.dumps(with_exhibit_context(prompt, exhibit_text_format), ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b"\n"
+        entries.append([prompt['id'], prompt.get('skill_type'), offset, len(line)])
+        lines.append(line)
+        offset += len(line)
+    data = b"".join(lines)
+    data_sha256 = hashlib.sha256(data).hexdigest()
+
+    store_dir = os.path.dirname(os.path.abspath(index_path))
+    data_prefix = os.path.basename(index_path)[:-len(STORE_INDEX_SUFFIX)] + ".store."
+    data_file = f"{data_prefix}{data_sha256[:12]}.jsonl"
+    data_path = os.path.join(store_dir, data_file)
+    # Data files are content-addressed, so a running app keeps reading the one its index names
+    if not os.path.exists(data_path):
+        with open(data_path + ".tmp", 'wb') as f:
+            f.write(data)
+        os.replace(data_path + ".tmp", data_path)
+
+    source_stat = os.stat(prompts_path)
+    index = {
+        "format_version": STORE_FORMAT_VERSION,
+        "data_file": data_file,
+        "data_size": len(data),
+        "data_sha256": data_sha256,
+        "exhibit_text_format": exhibit_text_format,
+        "source": {"sha256": hashlib.sha256(raw).hexdigest(), "size": source_stat.st_size, "mtime_ns": source_stat.st_mtime_ns},
+        "records": entries, # [id, skill_type, offset, length] in file order
+    }
+    with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(index_path + ".tmp", index_path)
+
+    # Old data files are safe to unlink; processes that still map them keep their pages
+    for stale_path in glob.glob(os.path.join(store_dir, f"{glob.escape(data_prefix)}*.jsonl")):
+        if os.path.basename(stale_path) != data_file:
+            os.remove(stale_path)
+    logger.info(f"Built prompt store {data_path} ({len(prompts)} prompts, {len(data)} bytes) with index {index_path}.")
+    return index_path
+
+
+def read_store_index(index_path, prompts_path, exhibit_text_format="table"):
+    """Returns the parsed store index if it exists and was built from the current prompts.json, else None."""
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable prompt store index {index_path}: {e}")
+        return None
+    if index.get("format_version") != STORE_FORMAT_VERSION:
+        logger.warning(f"Ignoring prompt store index {index_path}: format {index.get('format_version')} != {STORE_FORMAT_VERSION}.")
+        return None
+    if index.get("exhibit_text_format") != exhibit_text_format:
+        logger.warning(f"Ignoring prompt store index {index_path}: built with exhibit format '{index.get('exhibit_text_format')}', app wants '{exhibit_text_format}'.")
+        return None
+
+    source = index.get("source", {})
+    source_stat = os.stat(prompts_path)
+    if (source_stat.st_size, source_stat.st_mtime_ns) == (source.get("size"), source.get("mtime_ns")):
+        return index
+    # mtime changes on checkout/copy; only hash when the cheap check fails
+    if source_stat.st_size == source.get("size") and _file_sha256(prompts_path) == source.get("sha256"):
+        return index
+    logger.warning(f"Prompt store {index_path} is stale for {prompts_path}; loading JSON instead. Rebuild with: python prompt_catalog.py build")
+    return None
+
+
+class _LazyRecordSequence:
+    """Read-only sequence over a packed catalog that decodes records on access."""
+    __slots__ = ('_catalog',)
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __len__(self):
+        return len(self._catalog.prompt_ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._catalog.record_at(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return self._catalog.record_at(position)
+
+    def __iter__(self):
+        return (self._catalog.record_at(i) for i in range(len(self)))
+
+
+class PackedPromptCatalog:
+    """
+    PromptCatalog backed by a memory-mapped packed store.
+    Only ids, skills and offsets are held in memory; prompts are decoded on lookup
+    (with a small LRU of decoded records) so resident size stays flat as the library grows.
+    """
+
+    def __init__(self, index_path, index, version=0):
+        self.version = version
+        data_path = os.path.join(os.path.dirname(os.path.abspath(index_path)), index["data_file"])
+        with open(data_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) != index["data_size"]:
+            self._mmap.close()
+            raise ValueError(f"Prompt store {data_path} is {len(self._mmap)} bytes, index expects {index['data_size']}.")
+
+        entries = index["records"]
+        self.prompt_ids = tuple(e[0] for e in entries)
+        self._offsets = array.array('Q', (e[2] for e in entries))
+        self._lengths = array.array('I', (e[3] for e in entries))
+        self._position_by_id = {}
+        skill_ids = {}
+        for position, (prompt_id, skill, _, _) in enumerate(entries):
+            self._position_by_id.setdefault(prompt_id, position)
+            skill_ids.setdefault(skill, []).append(prompt_id)
+        self._skill_ids = {skill: tuple(ids) for skill, ids in skill_ids.items()}
+        self.records = _LazyRecordSequence(self)
+        self.record_at = functools.lru_cache(maxsize=DECODED_RECORD_CACHE_SIZE)(self._decode_record)
+
+    def _decode_record(self, position):
+        start = self._offsets[position]
+        return PromptRecord(json.loads(self._mmap[start:start + self._lengths[position]]))
+
+    def __len__(self):
+        return len(self.prompt_ids)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def get(self, prompt_id):
+        """Returns the PromptRecord for prompt_id (decoded from the mapped store), or None."""
+        position = self._position_by_id.get(prompt_id)
+        return None if position is None else self.record_at(position)
+
+    def ids_for_skill(self, skill):
+        """Returns the prompt ids for a skill (in file order), or an empty tuple."""
+        return self._skill_ids.get(skill, ())
+
+
+class PromptCatalogLoader:
+    """
+    Loads the prompt catalog once per process and shares the result across sessions.
+    Each get() only stats prompts.json and the packed store index; the catalog is
+    re-read when either changes and rebuilt only if the content hash differs.
+    Uses the packed store when one matching prompts.json exists, else parses the JSON.
+    """
+
+    def __init__(self, prompts_path, store_index_path=None, exhibit_text_format="table"):
+        if exhibit_text_format not in EXHIBIT_TEXT_FORMATS:
+            raise ValueError(f"Unknown exhibit text format '{exhibit_text_format}', expected one of {EXHIBIT_TEXT_FORMATS}.")
+        self.prompts_path = prompts_path
+        self.exhibit_text_format = exhibit_text_format
+        self.store_index_path = store_index_path or default_store_index_path(prompts_path)
+        self.version = 0 # Bumped on every successful (re)load
+        self.content_hash = None
+        self._stat_key = None
+        self._catalog = None
+        self._lock = threading.Lock()
+
+    def _current_stat_key(self):
+        file_stat = os.stat(self.prompts_path) # FileNotFoundError propagates to the caller
+        try:
+            index_stat = os.stat(self.store_index_path)
+            index_key = (index_stat.st_mtime_ns, index_stat.st_size)
+        except FileNotFoundError:
+            index_key = None
+        return (file_stat.st_mtime_ns, file_stat.st_size, index_key)
+
+    def get(self):
+        """Returns the current PromptCatalog, reloading only if the file changed on disk."""
+        stat_key = self._current_stat_key()
+        if self._catalog is not None and stat_key == self._stat_key:
+            return self._catalog
+
+        with self._lock:
+            # Another session may have reloaded while we waited for the lock
+            if self._catalog is not None and stat_key == self._stat_key:
+                return self._catalog
+
+            index = read_store_index(self.store_index_path, self.prompts_path, self.exhibit_text_format)
+            if index is not None:
+                content_hash = "store:" + index["data_sha256"]
+            else:
+                with open(self.prompts_path, 'rb') as f:
+                    raw = f.read()
+                content_hash = hashlib.sha256(raw).hexdigest()
+            if self._catalog is not None and content_hash == self.content_hash:
+                logger.info(f"{self.prompts_path} touched but content unchanged, keeping loaded catalog (version {self.version}).")
+                self._stat_key = stat_key
+                return self._catalog
+
+            if index is not None:
+                catalog = PackedPromptCatalog(self.store_index_path, index, version=self.version + 1)
+                source = f"packed store {self.store_index_path}"
+            else:
+                prompts = json.loads(raw.decode('utf-8'))
+                validate_prompts(prompts)
+                catalog = PromptCatalog(prompts, version=self.version + 1, exhibit_text_format=self.exhibit_text_format)
+                source = self.prompts_path
+            self._catalog = catalog
+            self.content_hash = content_hash
+            self._stat_key = stat_key
+            self.version += 1
+            logger.info(f"Loaded {len(catalog)} prompts from {source} ({content_hash[:18]}, version {self.version}).")
+            return self._catalog
+
+
+# --- Per-Session Prompt Scheduling ---
+class PromptDeck:
+    """
+    Shuffled deck over one skill's prompts (positions in catalog.ids_for_skill(skill)).
+    The permutation is a compact unsigned-int array, so a session stores 4 bytes per prompt plus a cursor.
+    """
+
+    __slots__ = ("catalog_version", "order", "position", "last_id")
+
+    def __init__(self):
+        self.catalog_version = None
+        self.order = array.array('I')
+        self.position = 0
+        self.last_id = None
+
+    def _shuffle(self, size, catalog_version, rng):
+        self.order = array.array('I', range(size))
+        rng.shuffle(self.order)
+        self.position = 0
+        self.catalog_version = catalog_version
+
+    def draw(self, skill_ids, catalog_version, rng=random):
+        """
+        Returns (prompt_id, reshuffled) for the next prompt in skill_ids, or (None, False) if there are none.
+        reshuffled is True when every prompt had been drawn and a new round started.
+        """
+        if not skill_ids:
+            return None, False
+        reshuffled = False
+        if catalog_version != self.catalog_version or len(self.order) != len(skill_ids):
+            self._shuffle(len(skill_ids), catalog_version, rng) # New or reloaded catalog: start a fresh deck
+        elif self.position >= len(self.order):
+            self._shuffle(len(skill_ids), catalog_version, rng)
+            reshuffled = True
+            if len(self.order) > 1 and skill_ids[self.order[0]] == self.last_id: # Don't repeat a prompt across the round boundary
+                swap = rng.randrange(1, len(self.order))
+                self.order[0], self.order[swap] = self.order[swap], self.order[0]
+        prompt_id = skill_ids[self.order[self.position]]
+        self.position += 1
+        self.last_id = prompt_id
+        return prompt_id, reshuffled
+
+
+# --- Command Line ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CHIP prompt catalog tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    default_prompts_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.json")
+    build_parser = subparsers.add_parser("build", help="Convert prompts.json into the packed, mmap-able prompt store.")
+    build_parser.add_argument("prompts_path", nargs="?", default=default_prompts_path)
+    build_parser.add_argument("--index", dest="index_path", default=None, help="Index output path (default: next to prompts.json).")
+    build_parser.add_argument("--exhibit-format", choices=EXHIBIT_TEXT_FORMATS, default="table", help="Must match the app's EXHIBIT_TEXT_FORMAT setting.")
+    compare_parser = subparsers.add_parser("compare-tokens", help="Report exhibit tokens per prompt for the 'table' vs 'compact' formats.")
+    compare_parser.add_argument("prompts_path", nargs="?", default=default_prompts_path)
+    compare_parser.add_argument("--top", type=int, default=0, help="Only list the N prompts with the largest savings (default: all).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    if args.command == "build":
+        index_path = build_prompt_store(args.prompts_path, args.index_path, args.exhibit_format)
+        print(f"Wrote {index_path}")
+    elif args.command == "compare-tokens":
+        with open(args.prompts_path, 'r', encoding='utf-8') as f:
+            prompts = json.load(f)
+        validate_prompts(prompts)
+        rows = sorted(compare_exhibit_formats(prompts), key=lambda r: r[2] - r[3], reverse=True)
+        print(f"Token counter: {get_token_counter()[1]}")
+        print(f"{'prompt_id':<24} {'skill':<15} {'table':>7} {'compact':>8} {'saved':>7} {'saved%':>7}")
+        for prompt_id, skill, table_tokens, compact_tokens in (rows[:args.top] if args.top else rows):
+            saved = table_tokens - compact_tokens
+            print(f"{prompt_id:<24} {str(skill):<15} {table_tokens:>7} {compact_tokens:>8} {saved:>7} {saved / max(table_tokens, 1):>7.1%}")
+        total_table = sum(r[2] for r in rows); total_compact = sum(r[3] for r in rows)
+        print(f"TOTAL ({len(rows)} prompts with exhibits): table={total_table} compact={total_compact} "
+              f"saved={total_table - total_compact} ({(total_table - total_compact) / max(total_table, 1):.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Response caching for CHIP's interviewer answers and feedback reports.
+
+Many candidates open a case with the same clarifying question ("What is the
+client's objective?"). With no earlier conversation in play, the interviewer's
+answer depends only on the skill, the case and the question. The answer and
+assessment can therefore be reused instead of paying for a new generation.
+
+Questions are normalized (case, punctuation, whitespace) before keying. Keys
+also hash the case prompt text and ANSWER_CACHE_VERSION, so edited prompts or
+templates never serve stale answers. Callers must only use the cache for
+first turns: once there is history, the answer has to stay consistent with it.
+
+AnswerCache is a process-wide LRU with a TTL. stats() reports hit rate and the
+approximate memory held.
+
+SharedResponseCache is a second tier shared by every replica. It is a SQLite
+database in WAL mode, for example on a shared volume, and holds interviewer
+answers. Connections are per thread and writes are short IMMEDIATE
+transactions, so many processes can use the file at once (see sqlite_store).
+Entries expire after a TTL, and the least recently used ones are evicted once
+the stored size passes a cap. Errors are logged and treated as misses: the
+cache never breaks a request.
+
+FeedbackReportStore keeps finished feedback reports keyed by
+feedback_cache_key (skill, prompt id and transcript). Reports cost an
+800-token generation and are needed again whenever a session is lost and
+replayed, so they never expire and are never evicted. The store uses the same
+SQLite/WAL setup and can share a file with SharedResponseCache.
+"""
+import collections
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_VERSION = 2 # Bump when interviewer prompt templates change
+FEEDBACK_REPORT_VERSION = 1 # Bump when feedback prompt templates change
+STATS_LOG_EVERY = 100 # Log cache stats after this many lookups
+SIZE_CHECK_EVERY = 50 # Shared cache puts between size-cap checks
+ACCESS_TOUCH_SECONDS = 60 # Minimum interval between last-access updates of a shared entry
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """Lowercases, drops punctuation (including apostrophes) and collapses whitespace."""
+    text = _NON_WORD_RE.sub("", (question or "").lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def answer_cache_key(skill, prompt_id, case_prompt_text, question):
+    """Stable key for a first-turn answer to question on the given case."""
+    raw = "\x1f".join([str(ANSWER_CACHE_VERSION), skill or "", str(prompt_id), case_prompt_text or "", normalize_question(question)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_size(key, value):
+    return sys.getsizeof(key) + sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value if v is not None)
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU cache of (answer, assessment) tuples with a time-to-live.
+    Expired entries are dropped when looked up or when they reach the LRU end.
+    """
+
+    def __init__(self, max_entries=2048, ttl_seconds=86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = collections.OrderedDict() # key -> (stored_at, value, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            log_stats = (self.hits + self.misses) % STATS_LOG_EVERY == 0
+        if log_stats:
+            logger.info(f"Answer cache stats: {self.stats()}")
+        return entry[1] if entry is not None else None
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            size = _entry_size(key, value)
+            self._entries[key] = (time.monotonic(), value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries), "max_entries": self.max_entries, "approx_bytes": self._bytes,
+                "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def feedback_cache_key(skill, prompt_id, case_prompt_text, transcript, exhibit_context=""):
+    """Stable key for the feedback report on a finished transcript."""
+    raw = "\x1f".join([str(FEEDBACK_REPORT_VERSION), "feedback", skill or "", str(prompt_id), case_prompt_text or "", exhibit_context or "", transcript or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SharedResponseCache(SQLiteStore):
+    """
+    SQLite-backed (WAL) cache of JSON values shared by all processes using the same file.
+    Entries have a kind (e.g. "answer"), expire after ttl_seconds and are evicted
+    least recently used first once their total size exceeds max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl_seconds=7 * 86400):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)",
+        ])
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._puts = 0
+        logger.info(f"Shared response cache at {path} (max {max_bytes // (1024 * 1024)} MB, ttl {ttl_seconds:g}s).")
+
+    def get(self, key):
+        """Returns the cached value for key, or None if missing, expired or unreadable."""
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at, accessed_at FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ? AND created_at = ?", (key, row[1]))
+                row = None
+            if row is None:
+                self._count("misses")
+                return None
+            if now - row[2] > ACCESS_TOUCH_SECONDS:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            self._count("errors")
+            logger.warning(f"Shared response cache read failed, treating as miss: {e}")
+            return None
+
+    def put(self, key, kind, value):
+        """Stores value (JSON-serializable) under key; failures are logged and ignored."""
+        try:
+            payload = json.dumps(value)
+            now = time.time()
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO responses (key, kind, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)", (key, kind, payload, len(payload) + len(key), now, now))
+            with self._lock:
+                self._puts += 1
+                check_size = self._puts % SIZE_CHECK_EVERY == 1
+            if check_size:
+                self._evict()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self._count("errors")
+            logger.warning(f"Shared response cache write failed: {e}")
+
+    def _evict(self):
+        """Drops expired entries, then least recently used ones until the total size is under 90% of max_bytes."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            evicted = 0
+            while total > self.max_bytes * 0.9:
+                rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at LIMIT 100").fetchall()
+                if not rows:
+                    break
+                victims = []
+                for key, size in rows: # Stop as soon as enough is freed, rather than dropping the whole batch
+                    if total <= self.max_bytes * 0.9:
+                        break
+                    victims.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                evicted += len(victims)
+        if evicted:
+            logger.info(f"Shared response cache evicted {evicted} entries, {total} bytes remain.")
+
+    def stats(self):
+        try:
+            rows = self._connect().execute("SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM responses GROUP BY kind").fetchall()
+        except sqlite3.Error:
+            rows = []
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": {kind: count for kind, count, _ in rows}, "bytes": sum(size for _, _, size in rows), "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0, "errors": self.errors,
+            }
+
+
+class FeedbackReportStore(SQLiteStore):
+    """Durable SQLite-backed (WAL) store of finished feedback reports, keyed by feedback_cache_key. Nothing is evicted."""
+
+    def __init__(self, path):
+        super().__init__(path, ["CREATE TABLE IF NOT EXISTS feedback_reports (key TEXT PRIMARY KEY, skill TEXT NOT NULL, prompt_id TEXT NOT NULL, report TEXT NOT NULL, created_at REAL NOT NULL)"])
+        logger.info(f"Feedback report store at {path}.")
+
+    def get(self, key):
+        """Returns the stored report for key, or None if there is none or the store can't be read."""
+        try:
+            row = self._connect().execute("SELECT report FROM feedback_reports WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"Feedback report store read failed, treating as miss: {e}")
+            return None
+        self._count("hits" if row else "misses")
+        return row[0] if row else None
+
+    def put(self, key, skill, prompt_id, report):
+        """Stores report; the first report stored for a transcript wins so every replay sees the same one."""
+        try:
+            self._connect().execute("INSERT OR IGNORE INTO feedback_reports (key, skill, prompt_id, report, created_at) VALUES (?, ?, ?, ?, ?)", (key, skill, str(prompt_id), report, time.time()))
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"Feedback report store write failed: {e}")
+
+    def stats(self):
+        try:
+            entries = self._connect().execute("SELECT COUNT(*) FROM feedback_reports").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            return {"entries": entries, "hits": self.hits, "misses": self.misses, "errors": self.errors}
@@ -0,0 +1,78 @@
+"""
+Process-wide Google Sheets session for CHIP's feedback writes.
+
+Authorizing the service account, opening the spreadsheet and fetching the
+worksheet take several network round-trips. Before this module, every feedback
+save paid for all of them before its one append. SheetsSession does that work
+lazily on first use and keeps the authorized client and worksheet handle for
+the life of the process.
+
+gspread's authorized session refreshes the access token by itself when it
+expires. The session only reconnects from scratch when Google rejects its
+credentials (401/403 or a failed token refresh). In that case it rebuilds the
+client and worksheet and retries the operation once.
+"""
+import logging
+import threading
+
+import gspread
+from google.auth.exceptions import RefreshError
+from google.oauth2.service_account import Credentials
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive.file']
+
+
+def is_auth_error(error):
+    """True when Google rejected the session's credentials (expired/revoked token, 401/403)."""
+    if isinstance(error, RefreshError):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return getattr(getattr(error, "response", None), "status_code", None) in (401, 403)
+    return False
+
+
+class SheetsSession:
+    """
+    Lazily authorized gspread client plus the handle of one worksheet, shared by all sessions.
+    run(fn) calls fn(worksheet), reconnecting and retrying once after an auth error.
+    """
+
+    def __init__(self, credentials_info, sheet_id, worksheet_index=0, scopes=SCOPES):
+        self.credentials_info = dict(credentials_info)
+        self.sheet_id = sheet_id
+        self.worksheet_index = worksheet_index
+        self.scopes = scopes
+        self._lock = threading.Lock()
+        self._worksheet = None
+        self.connects = 0
+
+    def worksheet(self):
+        """Returns the cached worksheet handle, authorizing and opening the sheet on first use."""
+        with self._lock:
+            if self._worksheet is None:
+                creds = Credentials.from_service_account_info(self.credentials_info, scopes=self.scopes)
+                gc = gspread.authorize(creds)
+                # Open the spreadsheet by its unique ID
+                spreadsheet = gc.open_by_key(self.sheet_id)
+                self._worksheet = spreadsheet.get_worksheet(self.worksheet_index)
+                self.connects += 1
+                logger.info(f"Opened Google Sheet with ID: {self.sheet_id} (connection #{self.connects})")
+            return self._worksheet
+
+    def reset(self):
+        """Drops the cached client and worksheet; the next call reconnects."""
+        with self._lock:
+            self._worksheet = None
+
+    def run(self, fn):
+        """Returns fn(worksheet). After an auth error, reconnects and retries once."""
+        try:
+            return fn(self.worksheet())
+        except Exception as e:
+            if not is_auth_error(e):
+                raise
+            logger.warning(f"Google Sheets rejected the cached session ({e}); reconnecting.")
+            self.reset()
+            return fn(self.worksheet())
@@ -0,0 +1,59 @@
+"""
+Shared SQLite plumbing for CHIP's local stores (response cache, feedback report
+store, feedback outbox).
+
+Each store is one SQLite file in WAL mode, so one writer and many readers can
+work at the same time. That holds across threads and across replica processes
+that share the file. sqlite3 connections must not be shared between threads,
+so each thread opens its own on first use. Connections are in autocommit
+mode, and multi-statement writes use explicit short BEGIN IMMEDIATE
+transactions. busy_timeout makes writers wait for the lock instead of failing.
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+
+BUSY_TIMEOUT_SECONDS = 5.0
+
+
+class SQLiteStore:
+    """Per-thread SQLite connections (WAL, autocommit) to one file, plus hit/miss/error counters."""
+
+    def __init__(self, path, schema):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        for statement in schema:
+            conn.execute(statement)
+
+    def _connect(self):
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None) # Autocommit; writes use explicit transactions
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT on this thread's connection, rolled back on error."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Outage(Exception):
+    pass
+
+
+def fail(breaker, error):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+def test_opens_after_consecutive_failures_only():
+    breaker = CircuitBreaker("test-open", failure_threshold=3, recovery_timeout=60)
+    fail(breaker, Outage())
+    fail(breaker, Outage())
+    with breaker.guard():
+        pass # A success resets the count
+    fail(breaker, Outage())
+    fail(breaker, Outage())
+    assert breaker.state == CLOSED
+    fail(breaker, Outage())
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.check()
+    assert 0 < excinfo.value.retry_after <= 60
+    assert breaker.stats()["opened"] == 1
+
+
+def test_errors_rejected_by_is_failure_do_not_trip_it():
+    breaker = CircuitBreaker("test-predicate", failure_threshold=1, recovery_timeout=60, is_failure=lambda error: isinstance(error, Outage))
+    fail(breaker, ValueError("bad request"))
+    assert breaker.state == CLOSED
+    fail(breaker, Outage())
+    assert breaker.state == OPEN
+
+
+def test_half_open_trial_closes_on_success():
+    breaker = CircuitBreaker("test-recover", failure_threshold=1, recovery_timeout=0.05)
+    fail(breaker, Outage())
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError): # Only half_open_max_calls trials at a time
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_trial_reopens_on_failure():
+    breaker = CircuitBreaker("test-reopen", failure_threshold=1, recovery_timeout=0.05)
+    fail(breaker, Outage())
+    time.sleep(0.06)
+    fail(breaker, Outage())
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+class Cancelled(Exception):
+    pass
+
+
+def test_neutral_errors_release_the_half_open_trial_without_an_outcome():
+    breaker = CircuitBreaker("test-neutral", failure_threshold=1, recovery_timeout=0.05)
+    fail(breaker, Outage())
+    time.sleep(0.06)
+    counters = dict(breaker.counters)
+    with pytest.raises(Cancelled):
+        with breaker.guard(neutral=Cancelled):
+            raise Cancelled()
+    assert breaker.state == HALF_OPEN
+    assert breaker.counters == counters
+    with breaker.guard(): # The trial slot is free again
+        pass
+    assert breaker.state == CLOSED
@@ -0,0 +1,73 @@
+import random
+
+from conversation_history import InterviewerHistory, summarize_text
+from llm_runtime import estimate_chat_tokens
+
+
+def to_message(entry):
+    return {"role": "user" if entry["role"] == "interviewee" else "assistant", "content": entry["content"]}
+
+
+def add_turn(entries, i, rng, reply_sentences=20):
+    entries.append({"role": "interviewee", "content": f"Question {i}: " + "word " * rng.randint(5, 40)})
+    entries.append({"role": "interviewer", "content": f"Answer {i}. " + "The client sells widgets. " * rng.randint(3, reply_sentences)})
+
+
+def test_short_history_is_sent_verbatim():
+    entries, rng = [], random.Random(0)
+    add_turn(entries, 1, rng)
+    history = InterviewerHistory(to_message, token_budget=1500)
+    history.sync(entries)
+    assert history.request_messages() == [to_message(entry) for entry in entries]
+
+
+def test_whole_request_stays_within_budget_including_summary():
+    rng = random.Random(20)
+    for budget in (400, 1500):
+        entries = []
+        history = InterviewerHistory(to_message, token_budget=budget, keep_recent_turns=2)
+        for i in range(150):
+            add_turn(entries, i, rng)
+            history.sync(entries)
+            assert estimate_chat_tokens(history.request_messages()) <= budget
+        summary = history.request_messages()[0]["content"]
+        assert history.omitted_turns > 0 # The summary itself had to be trimmed...
+        assert "Answer 0." in summary and "Answer 1." in summary # ...but the opening turns (the case facts) stay
+
+
+def test_over_budget_summary_is_extracted_again_before_dropping_lines():
+    entries, rng = [], random.Random(20)
+    history = InterviewerHistory(to_message, token_budget=1500, keep_recent_turns=2)
+    for i in range(25):
+        add_turn(entries, i, rng)
+        history.sync(entries)
+    assert history.summary_level > 0
+    assert history.omitted_turns == 0
+    assert len(history.summary_lines) == history.folded // 2 # One line per folded turn, none dropped
+
+
+def test_recent_turns_stay_verbatim_and_summary_leads():
+    entries, rng = [], random.Random(1)
+    history = InterviewerHistory(to_message, token_budget=1500, keep_recent_turns=4)
+    for i in range(30):
+        add_turn(entries, i, rng, reply_sentences=8)
+        history.sync(entries)
+    messages = history.request_messages()
+    assert messages[0]["role"] == "system" and "Earlier turns" in messages[0]["content"]
+    assert messages[-8:] == [to_message(entry) for entry in entries[-8:]]
+
+
+def test_summary_prefix_is_stable_between_compactions():
+    entries, rng = [], random.Random(2)
+    history = InterviewerHistory(to_message, token_budget=1500, keep_recent_turns=2)
+    prefixes = []
+    for i in range(60):
+        add_turn(entries, i, rng, reply_sentences=8)
+        history.sync(entries)
+        prefixes.append(history.request_messages()[0]["content"])
+    assert len(set(prefixes)) < len(prefixes) / 2
+
+
+def test_summarize_text_keeps_opening_sentences_and_caps_length():
+    assert summarize_text("One.  Two!\nThree? Four.") == "One. Two!"
+    assert len(summarize_text("x" * 1000)) == 300
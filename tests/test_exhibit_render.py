@@ -0,0 +1,61 @@
+import json
+import os
+
+import pytest
+
+from exhibit_render import build_exhibit_render
+from prompt_catalog import PromptCatalog
+
+PROMPTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts.json")
+
+
+def chart_exhibits():
+    params = []
+    with open(PROMPTS_PATH, encoding="utf-8") as f:
+        raw_prompts = json.load(f)
+    catalog = PromptCatalog(raw_prompts)
+    for raw_prompt, record in zip(raw_prompts, catalog.records):
+        for index, (raw_exhibit, frozen_exhibit) in enumerate(zip(raw_prompt.get("exhibits") or [], record.get("exhibits") or ())):
+            if raw_exhibit.get("data"):
+                params.append(pytest.param(raw_exhibit, frozen_exhibit, index + 1, id=f"{raw_prompt['id']}-{index + 1}"))
+    return params
+
+
+@pytest.mark.parametrize("raw_exhibit, frozen_exhibit, number", chart_exhibits())
+def test_frozen_exhibit_renders_like_the_raw_json(raw_exhibit, frozen_exhibit, number):
+    fig, table, warning = build_exhibit_render(frozen_exhibit, number)
+    expected_fig, expected_table, expected_warning = build_exhibit_render(raw_exhibit, number)
+    assert warning == expected_warning
+    assert (fig is None) == (expected_fig is None)
+    if fig is not None:
+        assert fig.to_json() == expected_fig.to_json()
+    if table is not None:
+        assert table.equals(expected_table)
+
+
+def test_scatter_with_list_valued_axis_from_frozen_record():
+    exhibit = PromptCatalog([{"id": "p", "prompt_text": "", "exhibits": [
+        {"chart_type": "scatter", "x_axis": "Fertilizer", "y_axis": ["Yield"], "data": {"Fertilizer": [1, 2, 3], "Yield": [4, 5, 7]}},
+    ]}]).get("p")["exhibits"][0]
+    assert exhibit["y_axis"] == ("Yield",)
+    fig, _, warning = build_exhibit_render(exhibit, 1)
+    assert warning is None
+    assert list(fig.data[0].y) == [4, 5, 7]
+
+
+def test_missing_axes_give_a_warning_instead_of_a_figure():
+    fig, table, warning = build_exhibit_render({"chart_type": "bar", "data": {"a": [1]}}, 3)
+    assert (fig, table) == (None, None)
+    assert warning.startswith("Exhibit 3: Bar chart")
+
+
+def test_rebuilt_exhibits_match_the_first_build():
+    # get_exhibit_render serves the first build for a (catalog version, prompt id, exhibit index) key, so a rebuild must not differ
+    with open(PROMPTS_PATH, encoding="utf-8") as f:
+        catalog = PromptCatalog(json.load(f))
+    for prompt_id in set(catalog.prompt_ids):
+        for index, exhibit in enumerate(catalog.get(prompt_id).get("exhibits") or ()):
+            (fig, table, warning), (fig_again, table_again, warning_again) = (build_exhibit_render(exhibit, index + 1) for _ in range(2))
+            assert warning == warning_again
+            assert (fig is None and fig_again is None) or (fig is not fig_again and fig.to_json() == fig_again.to_json())
+            assert (table is None and table_again is None) or table.equals(table_again)
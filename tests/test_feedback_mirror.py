@@ -0,0 +1,76 @@
+import pytest
+
+from feedback_mirror import FeedbackMirror
+
+HEADER = ["Timestamp", "SessionID", "Skill", "PromptID", "Rating", "Comment"]
+
+
+class FakeSheet:
+    """Feedback sheet rows (row 1 is the header); fetch_rows follows the worksheet range contract."""
+
+    def __init__(self, rows):
+        self.rows = [HEADER] + rows
+        self.fetches = []
+
+    def fetch_rows(self, first, last):
+        self.fetches.append((first, last))
+        return self.rows[first - 1:last]
+
+
+def rating_row(day, skill, prompt_id, rating, comment=""):
+    return [f"{day}T10:00:00", "session", skill, prompt_id, rating, comment]
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    return FeedbackMirror(str(tmp_path / "mirror.sqlite3"))
+
+
+def test_sync_copies_new_rows_in_chunks_and_rolls_them_up(mirror):
+    sheet = FakeSheet([
+        rating_row("2026-05-01", "Clarifying", "q1", 5),
+        rating_row("2026-05-01", "Clarifying", "q1", 2, "too vague"),
+        rating_row("2026-05-01", "Clarifying", "q1", 3),
+        rating_row("2026-05-02", "Hypothesis", "q2", 4),
+    ])
+    assert mirror.sync("sheet", sheet.fetch_rows, chunk_rows=2) == 4
+    assert mirror.cursor("sheet") == 5
+    assert sheet.fetches == [(1, 2), (3, 4), (5, 6)]
+    assert mirror.rollups(skill="Clarifying") == [
+        {"prompt_id": "q1", "skill": "Clarifying", "day": "2026-05-01", "count": 3, "mean_rating": 3.333, "low_rating_comments": 1},
+    ]
+
+
+def test_later_syncs_only_read_rows_below_the_cursor(mirror):
+    sheet = FakeSheet([rating_row("2026-05-01", "Clarifying", "q1", 4)])
+    mirror.sync("sheet", sheet.fetch_rows)
+    sheet.rows.append(rating_row("2026-05-01", "Clarifying", "q1", 2))
+    sheet.fetches.clear()
+    assert mirror.sync("sheet", sheet.fetch_rows) == 1
+    assert sheet.fetches[0][0] == 3
+    assert mirror.rollups()[0]["count"] == 2
+    assert mirror.sync("sheet", sheet.fetch_rows) == 0
+    assert mirror.rollups()[0]["count"] == 2 # Nothing is counted twice
+
+
+def test_blank_rows_are_skipped_but_the_cursor_moves_past_them(mirror):
+    sheet = FakeSheet([
+        rating_row("2026-05-01", "Clarifying", "q1", 4),
+        ["", "", "", "", "", ""],
+        [],
+        rating_row("2026-05-01", "Clarifying", "q1", 2),
+    ])
+    assert mirror.sync("sheet", sheet.fetch_rows) == 2
+    assert mirror.cursor("sheet") == 5
+    assert [(row["prompt_id"], row["count"], row["mean_rating"]) for row in mirror.rollups()] == [("q1", 2, 3.0)]
+
+
+def test_rollups_match_a_full_recount(mirror):
+    rows = [rating_row(f"2026-05-0{1 + i % 3}", ("Clarifying", "Hypothesis")[i % 2], f"q{i % 4}", 1 + i % 5, "note" if i % 3 else "") for i in range(40)]
+    mirror.sync("sheet", FakeSheet(rows).fetch_rows, chunk_rows=7)
+    for rollup in mirror.rollups():
+        ratings = [(row[4], row[5]) for row in rows if (row[3], row[2], row[0][:10]) == (rollup["prompt_id"], rollup["skill"], rollup["day"])]
+        assert rollup["count"] == len(ratings)
+        assert rollup["mean_rating"] == round(sum(rating for rating, _ in ratings) / len(ratings), 3)
+        assert rollup["low_rating_comments"] == sum(1 for rating, comment in ratings if rating <= 3 and comment)
+    assert sum(rollup["count"] for rollup in mirror.rollups()) == len(rows)
@@ -0,0 +1,92 @@
+import pytest
+
+from circuit_breaker import CircuitOpenError
+from feedback_outbox import FeedbackOutbox
+
+
+class FlakySink:
+    """Sink that raises the queued errors first, then stores the rows it is given."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.rows = []
+
+    def __call__(self, rows):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.rows.extend(rows)
+
+
+class Outage(Exception):
+    pass
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    def make(sink, **kwargs):
+        kwargs.setdefault("base_backoff", 0)
+        return FeedbackOutbox(str(tmp_path / "outbox.sqlite3"), sink, **kwargs)
+    return make
+
+
+def test_rows_are_sent_in_batches_and_deleted(make_outbox):
+    sink = FlakySink()
+    outbox = make_outbox(sink, batch_size=2)
+    for i in range(3):
+        outbox.enqueue(["ts", "session", "Clarifying", i, 5, ""])
+    assert outbox.flush_once() == 2
+    assert outbox.flush_once() == 1
+    assert outbox.flush_once() == 0
+    assert [row[3] for row in sink.rows] == [0, 1, 2]
+    assert outbox.stats()["pending"] == 0
+    assert outbox.stats()["sent"] == 3
+
+
+def test_failed_batch_is_kept_and_retried(make_outbox):
+    sink = FlakySink(Outage("503"))
+    outbox = make_outbox(sink)
+    outbox.enqueue(["row"])
+    assert outbox.flush_once() == 0
+    assert outbox.stats()["pending"] == 1
+    assert outbox.flush_once() == 1
+    assert sink.rows == [["row"]]
+    assert outbox.stats()["failed_batches"] == 1
+
+
+def test_backoff_honours_retry_after(make_outbox):
+    outbox = make_outbox(FlakySink(CircuitOpenError("google_sheets", 60.0)))
+    outbox.enqueue(["row"])
+    assert outbox.flush_once() == 0
+    assert outbox.flush_once() == 0 # Not due for another minute
+    assert outbox.stats()["failed_batches"] == 1
+
+
+def test_rows_survive_a_restart(make_outbox):
+    make_outbox(FlakySink()).enqueue(["row"])
+    sink = FlakySink()
+    assert make_outbox(sink).flush_once() == 1
+    assert sink.rows == [["row"]]
+
+
+def test_non_transient_failures_are_dead_lettered_and_can_be_requeued(make_outbox):
+    sink = FlakySink(*[ValueError("bad range")] * 3)
+    outbox = make_outbox(sink, max_attempts=3, is_transient=lambda error: isinstance(error, Outage))
+    outbox.enqueue(["row"])
+    for _ in range(3):
+        outbox.flush_once()
+    stats = outbox.stats()
+    assert (stats["pending"], stats["dead_letters"], stats["dead_lettered"]) == (0, 1, 1)
+    assert outbox.requeue_dead_letters() == 1
+    assert outbox.flush_once() == 1
+    assert sink.rows == [["row"]]
+    assert outbox.stats()["dead_letters"] == 0
+
+
+def test_transient_failures_are_never_dead_lettered(make_outbox):
+    sink = FlakySink(*[Outage("503")] * 5)
+    outbox = make_outbox(sink, max_attempts=2, is_transient=lambda error: isinstance(error, Outage))
+    outbox.enqueue(["row"])
+    for _ in range(5):
+        outbox.flush_once()
+    assert outbox.stats()["dead_letters"] == 0
+    assert outbox.flush_once() == 1
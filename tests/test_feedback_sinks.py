@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError
+from feedback_sinks import FEEDBACK_COLUMNS, FeedbackSink, SheetsFeedbackSink, SQLiteFeedbackSink
+
+
+class FakeSession:
+    """Stands in for SheetsSession: run(fn) calls fn on a worksheet that records appended rows."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.rows = []
+
+    def run(self, fn):
+        return fn(self)
+
+    def append_rows(self, rows, value_input_option=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        assert value_input_option == "USER_ENTERED"
+        self.rows.extend(rows)
+
+
+def feedback_row(i, rating):
+    return [f"2026-05-01T10:00:{i:02d}", f"session-{i}", ("Clarifying", "Hypothesis")[i % 2], f"q{i % 3}", rating, "" if i % 4 else "comment"]
+
+
+def test_both_sinks_implement_the_interface(tmp_path):
+    assert isinstance(SheetsFeedbackSink(FakeSession()), FeedbackSink)
+    assert isinstance(SQLiteFeedbackSink(str(tmp_path / "feedback.sqlite3")), FeedbackSink)
+    assert len(FEEDBACK_COLUMNS) == len(feedback_row(0, 5))
+
+
+def test_sheets_sink_appends_the_whole_batch_in_one_call():
+    session = FakeSession()
+    rows = [feedback_row(i, 4) for i in range(3)]
+    SheetsFeedbackSink(session).write_rows(rows)
+    assert session.rows == rows
+
+
+def test_sheets_sink_without_a_session_reports_the_missing_settings():
+    with pytest.raises(KeyError):
+        SheetsFeedbackSink(None).write_rows([feedback_row(0, 5)])
+
+
+def test_sheets_sink_failures_trip_its_breaker():
+    breaker = CircuitBreaker("test-sheets-sink", failure_threshold=2, recovery_timeout=60)
+    sink = SheetsFeedbackSink(FakeSession(ConnectionError(), ConnectionError()), breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            sink.write_rows([feedback_row(0, 5)])
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        sink.write_rows([feedback_row(0, 5)])
+
+
+def test_sqlite_sink_summary_matches_a_recount_of_the_rows(tmp_path):
+    sink = SQLiteFeedbackSink(str(tmp_path / "feedback.sqlite3"))
+    rng = random.Random(5)
+    rows = [feedback_row(i, rng.choice([1, 2, 3, 4, 5, ""])) for i in range(60)]
+    sink.write_rows(rows[:25])
+    sink.write_rows(rows[25:])
+    for skill in (None, "Clarifying", "Hypothesis"):
+        expected = {}
+        for row in rows:
+            if skill is None or row[2] == skill:
+                expected.setdefault(row[3], []).extend([row[4]] if row[4] != "" else [])
+        summary = sink.rating_summary(skill=skill)
+        assert set(summary) == set(expected)
+        for prompt_id, ratings in expected.items():
+            assert summary[prompt_id]["count"] == len(ratings) # Rows without a rating aren't counted
+            assert summary[prompt_id]["mean_rating"] == (round(sum(ratings) / len(ratings), 3) if ratings else None)
+    assert sink.rating_summary(prompt_id="q1", skill="Clarifying") == {"q1": sink.rating_summary(skill="Clarifying")["q1"]}
@@ -0,0 +1,76 @@
+import random
+import re
+
+import pytest
+
+from interviewer_protocol import StreamingResponseParser, parse_interviewer_response
+
+SKILLS = ("Clarifying", "Hypothesis", "Recommendation", "Frameworks", "Unknown")
+
+
+def legacy_parse_interviewer_response(response_text, skill):
+    """The parser as it was before the streaming rewrite; both parsers must keep its results."""
+    answer = response_text.strip() if response_text else "[Empty Response]"
+    assessment = None
+    if skill in ["Clarifying", "Frameworks", "Analysis", "Recommendation"]:
+        answer_match = re.search(r"###ANSWER###\s*(.*?)\s*###ASSESSMENT###", response_text, re.DOTALL | re.IGNORECASE)
+        assessment_match = re.search(r"###ASSESSMENT###\s*(.*)", response_text, re.DOTALL | re.IGNORECASE)
+        if answer_match: answer = answer_match.group(1).strip()
+        if assessment_match: assessment = assessment_match.group(1).strip()
+        if not answer_match and not assessment_match and response_text: answer = response_text.strip(); assessment = "[Assessment not extracted]"
+        elif answer_match and not assessment_match: assessment = "[Assessment delimiter missing]"
+        elif not answer_match and assessment_match: answer = "[Answer delimiter missing]"
+        elif not response_text or not response_text.strip(): answer = "[LLM empty response]"; assessment = "[LLM empty response]"
+    elif skill == "Hypothesis":
+        answer = re.sub(r"###ANSWER###", "", answer, flags=re.IGNORECASE)
+        answer = re.sub(r"###ASSESSMENT###", "", answer, flags=re.IGNORECASE).strip()
+        if not answer:
+            answer = "[CHIP did not provide further information]"
+    return answer, assessment
+
+
+# Fragments that produce delimiters, partial delimiters, mixed case and whitespace when concatenated
+PIECES = ["###ANSWER###", "###ASSESSMENT###", "###answer###", "###Assessment###", "#", "##", "###", "ANSWER", "ASSESSMENT",
+          " ", "\n", "  \n", "The answer.", "x", "Good (4/5)", "\t", "###ANSWER###ASSESSMENT###"]
+
+
+def stream(skill, text, rng):
+    """Feeds text to a StreamingResponseParser in random-sized chunks; returns (parser, displayed answers)."""
+    parser = StreamingResponseParser(skill)
+    shown, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, 5)
+        shown.append(parser.feed(text[i:i + size]))
+        i += size
+    return parser, shown
+
+
+@pytest.mark.parametrize("skill", SKILLS)
+@pytest.mark.parametrize("text", [
+    "", "   ", "###ANSWER###\nThe client wants growth.\n###ASSESSMENT###\nGood (4/5)",
+    "Sure! ###answer### Revenue fell. ###Assessment### Fine", "###ASSESSMENT### only an assessment", "###ANSWER### no assessment",
+    "plain text reply", "###ANSWER######ASSESSMENT###", "###ASSESSMENT### first ###ANSWER### then ###ASSESSMENT### again",
+])
+def test_parsers_match_legacy_on_known_cases(skill, text):
+    expected = legacy_parse_interviewer_response(text, skill)
+    assert parse_interviewer_response(text, skill) == expected
+    parser, _ = stream(skill, text, random.Random(0))
+    assert parser.finish() == expected
+
+
+def test_parsers_match_legacy_on_random_responses():
+    rng = random.Random(8)
+    for _ in range(20000):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 8)))
+        for skill in ("Clarifying", "Hypothesis", "Recommendation"):
+            expected = legacy_parse_interviewer_response(text, skill)
+            assert parse_interviewer_response(text, skill) == expected, (text, skill)
+            parser, _ = stream(skill, text, rng)
+            assert parser.finish() == expected, (text, skill)
+
+
+def test_streamed_answer_never_shows_delimiters_or_assessment():
+    text = "###ANSWER###\nThe market grew 5% last year.\n###ASSESSMENT###\nRelevant question (4/5)."
+    _, shown = stream("Clarifying", text, random.Random(1))
+    assert all("#" not in answer and "Relevant" not in answer for answer in shown)
+    assert shown[-1] == "The market grew 5% last year."
@@ -0,0 +1,274 @@
+import threading
+import time
+import types
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from llm_runtime import LLMCallCancelled, LLMExecutor, LLMQueueFull, RetryPolicy, SessionQuotaExceeded, SessionQuotas, _percentile
+
+
+@pytest.fixture
+def gate():
+    """An event the test sets to let blocking calls finish; set on teardown so no worker stays stuck."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def blocker(gate):
+    return lambda call: gate.wait(5)
+
+
+def chunk(text):
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])
+
+
+class FakeClient:
+    """Minimal OpenAI client whose non-streaming completions sleep delays[i] seconds for the i-th request."""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, **create_kwargs):
+        with self._lock:
+            delay = self.delays[self.requests]
+            self.requests += 1
+        time.sleep(delay)
+        message = types.SimpleNamespace(content=f"reply after {delay}s")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+class Overloaded(Exception):
+    """Retryable API error (503) asking for a retry after retry_after seconds."""
+    status_code = 503
+
+    def __init__(self, retry_after):
+        super().__init__("overloaded")
+        self.response = types.SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class FakeStream:
+    """Streaming response that yields its chunks after delay seconds, or ends early once closed from another thread."""
+
+    def __init__(self, texts, delay=0.0):
+        self.texts, self.delay = texts, delay
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        if self.closed.wait(self.delay):
+            return
+        yield from (chunk(text) for text in self.texts)
+
+    def close(self):
+        self.closed.set()
+
+
+def test_calls_run_off_the_caller_thread_in_submission_order(gate):
+    executor = LLMExecutor(max_workers=1)
+    executor.submit(blocker(gate), label="busy")
+    time.sleep(0.05)
+    order, threads = [], []
+    calls = [executor.submit(lambda call, name=name: (order.append(name), threads.append(threading.current_thread()))) for name in ("a", "b", "c")]
+    assert executor.stats()["queued"] == 3
+    gate.set()
+    for call in calls:
+        call.wait(2)
+    assert order == ["a", "b", "c"]
+    assert threading.current_thread() not in threads
+    time.sleep(0.05)
+    assert executor.stats()["completed"] == 4
+
+
+def test_queued_calls_run_by_priority_then_submission_order(gate):
+    executor = LLMExecutor(max_workers=1)
+    executor.submit(blocker(gate), label="busy")
+    time.sleep(0.05)
+    order = []
+    calls = [executor.submit(lambda call, name=name: order.append(name), priority=priority) for name, priority in (("feedback", 1), ("turn-1", 0), ("turn-2", 0))]
+    gate.set()
+    for call in calls:
+        call.wait(2)
+    assert order == ["turn-1", "turn-2", "feedback"]
+
+
+def test_full_queue_rejects_new_calls(gate):
+    executor = LLMExecutor(max_workers=1, max_queue=1)
+    executor.submit(blocker(gate))
+    time.sleep(0.05)
+    executor.submit(lambda call: None)
+    with pytest.raises(LLMQueueFull):
+        executor.submit(lambda call: None)
+    assert executor.stats()["rejected"] == 1
+
+
+def test_session_quotas_limit_in_flight_rate_and_tokens(gate):
+    quotas = SessionQuotas(calls_per_minute=3, tokens_per_session=100, max_in_flight=1)
+    executor = LLMExecutor(max_workers=2, session_quotas=quotas)
+    running = executor.submit(blocker(gate), session_id="a", cost_tokens=10)
+    with pytest.raises(SessionQuotaExceeded) as excinfo:
+        executor.submit(lambda call: None, session_id="a")
+    assert excinfo.value.reason == "in_flight"
+    executor.submit(lambda call: None, session_id="b").wait(2) # Other sessions are unaffected
+    gate.set()
+    running.wait(2)
+    time.sleep(0.05)
+    with pytest.raises(SessionQuotaExceeded) as excinfo:
+        executor.submit(lambda call: None, session_id="a", cost_tokens=95)
+    assert excinfo.value.reason == "tokens"
+    executor.submit(lambda call: None, session_id="a").wait(2)
+    time.sleep(0.05)
+    executor.submit(lambda call: None, session_id="a").wait(2)
+    time.sleep(0.05)
+    with pytest.raises(SessionQuotaExceeded) as excinfo:
+        executor.submit(lambda call: None, session_id="a")
+    assert excinfo.value.reason == "rate"
+
+
+def test_cancelled_queued_call_releases_its_in_flight_slot(gate):
+    quotas = SessionQuotas(max_in_flight=2)
+    executor = LLMExecutor(max_workers=1, session_quotas=quotas)
+    running = executor.submit(blocker(gate), session_id="a")
+    time.sleep(0.05)
+    queued = executor.submit(lambda call: "never", session_id="a")
+    assert quotas.usage("a")[2] == 2
+    queued.cancel()
+    queued.cancel()
+    assert quotas.usage("a")[2] == 1
+    gate.set()
+    running.wait(2)
+    queued.wait(2)
+    time.sleep(0.05)
+    assert quotas.usage("a")[2] == 0
+    with pytest.raises(LLMCallCancelled):
+        queued.result()
+
+
+def test_request_rate_limit_spaces_out_calls_past_the_burst():
+    executor = LLMExecutor(max_workers=3, requests_per_minute=600, burst_seconds=0.1) # 10 calls/s, bursts of 1
+    calls = [executor.submit(lambda call: None) for _ in range(3)]
+    for call in calls:
+        call.wait(2)
+    starts = sorted(call.started_at for call in calls)
+    assert starts[1] - starts[0] >= 0.08 and starts[2] - starts[1] >= 0.08
+
+
+def test_percentiles_are_nearest_rank_and_monotonic():
+    assert _percentile([], 0.95) == 0.0
+    assert (_percentile([1.0, 2.0], 0.5), _percentile([1.0, 2.0], 0.95)) == (1.0, 2.0)
+    values = sorted(float(i) for i in range(101))
+    assert [_percentile(values, q) for q in (0.0, 0.5, 0.95, 1.0)] == [0.0, 50.0, 95.0, 100.0]
+
+
+def test_streamed_chat_text_matches_the_deltas():
+    executor = LLMExecutor(max_workers=1)
+    stream = FakeStream(["The ", "answer", None, "."])
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=lambda **kwargs: stream)))
+    call = executor.submit_chat(client, messages=[], stream=True)
+    assert call.result(2) == "The answer."
+    assert call.chunks_since(1) == (["answer", "."], 3)
+    assert stream.closed.is_set()
+
+
+def test_cancel_stops_a_streaming_call():
+    executor = LLMExecutor(max_workers=1)
+
+    def stream(call):
+        for i in range(100):
+            if call.cancelled:
+                raise LLMCallCancelled("stopped")
+            call.emit(f"{i} ")
+            time.sleep(0.01)
+
+    call = executor.submit(stream)
+    time.sleep(0.05)
+    call.cancel()
+    assert call.wait(2)
+    assert isinstance(call.exception(), LLMCallCancelled)
+    assert 0 < len(call.text().split()) < 100
+
+
+def test_cancelled_queued_call_never_runs(gate):
+    executor = LLMExecutor(max_workers=1)
+    executor.submit(blocker(gate))
+    ran = []
+    queued = executor.submit(lambda call: ran.append(call))
+    queued.cancel()
+    gate.set()
+    with pytest.raises(LLMCallCancelled):
+        queued.result(2)
+    assert ran == []
+    assert queued.started_at is None
+
+
+def test_open_circuit_rejects_submissions():
+    breaker = CircuitBreaker("test-llm", failure_threshold=1, recovery_timeout=60)
+    breaker.record_failure()
+    executor = LLMExecutor(max_workers=1, circuit_breaker=breaker)
+    with pytest.raises(CircuitOpenError):
+        executor.submit(lambda call: None)
+
+
+def test_hedge_request_wins_and_is_charged_to_the_session():
+    quotas = SessionQuotas(calls_per_minute=10, max_in_flight=1)
+    executor = LLMExecutor(max_workers=1, session_quotas=quotas, max_hedges=1)
+    client = FakeClient([1.0, 0.0])
+    call = executor.submit_chat(client, session_id="a", retry_policy=RetryPolicy(hedge_after=0.1), messages=[])
+    assert call.result(3) == "reply after 0.0s"
+    assert client.requests == 2
+    assert quotas.usage("a")[0] == 2 # The hedge counts against the session's rate quota
+    assert executor.stats()["hedges"] == {"max": 1, "sent": 1, "won": 1, "skipped": 0}
+
+
+def test_hedge_is_skipped_without_a_free_slot_or_session_quota():
+    executor = LLMExecutor(max_workers=1, max_hedges=0)
+    client = FakeClient([0.3])
+    assert executor.submit_chat(client, retry_policy=RetryPolicy(hedge_after=0.05), messages=[]).result(3) == "reply after 0.3s"
+    assert client.requests == 1
+
+    quotas = SessionQuotas(calls_per_minute=1)
+    executor = LLMExecutor(max_workers=1, session_quotas=quotas, max_hedges=1)
+    client = FakeClient([0.3])
+    assert executor.submit_chat(client, session_id="a", retry_policy=RetryPolicy(hedge_after=0.05), messages=[]).result(3) == "reply after 0.3s"
+    assert client.requests == 1
+    assert executor.stats()["hedges"]["skipped"] == 1
+
+
+def test_retry_is_rescheduled_without_holding_the_worker_and_charged_to_the_buckets():
+    executor = LLMExecutor(max_workers=1, requests_per_minute=600)
+    takes = []
+    take = executor._request_bucket.take
+    executor._request_bucket.take = lambda amount: (takes.append(amount), take(amount))
+    outcomes = [Overloaded(0.3), "recovered"]
+
+    def create(**create_kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=outcome))])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    retried = executor.submit_chat(client, retry_policy=RetryPolicy(max_attempts=2, max_delay=1.0), messages=[])
+    time.sleep(0.05)
+    assert executor.stats()["retrying"] == 1
+    other = executor.submit(lambda call: "ran during the backoff")
+    assert other.result(0.2) == "ran during the backoff" # The only worker isn't sleeping out the retry
+    assert not retried.done()
+    assert retried.result(2) == "recovered"
+    assert retried.attempts == 2
+    assert len(takes) == 3 # First attempt, the other call and the retry
+    assert executor.stats()["retries"] == 1
+
+
+def test_losing_hedge_stream_is_closed_when_the_hedge_wins():
+    executor = LLMExecutor(max_workers=1, max_hedges=1)
+    streams = [FakeStream(["slow"], 5.0), FakeStream(["fast"])]
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=lambda **kwargs: streams.pop(0))))
+    slow = streams[0]
+    call = executor.submit_chat(client, retry_policy=RetryPolicy(hedge_after=0.1), messages=[], stream=True)
+    assert call.result(2) == "fast"
+    assert slow.closed.wait(0.5) # Closed by the winner, not left running until its own response arrives
+    assert executor.stats()["hedges"]["won"] == 1
@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+import os
+import random
+
+import pandas as pd
+import pytest
+
+from prompt_catalog import (PackedPromptCatalog, PromptCatalog, PromptCatalogLoader, PromptDeck, _compact_value, build_prompt_store,
+                            compact_table_text, format_exhibit_context, thaw)
+
+PROMPTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts.json")
+
+
+@pytest.fixture(scope="module")
+def raw_prompts():
+    with open(PROMPTS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_prompts(path, prompts):
+    path.write_text(json.dumps(prompts), encoding="utf-8")
+    return str(path)
+
+
+def plain(value):
+    """A catalog record (or part of one) as the JSON value it was built from."""
+    if hasattr(value, "keys") and not isinstance(value, dict):
+        return {key: plain(value[key]) for key in value.keys() if key != "exhibit_context"}
+    if isinstance(value, dict):
+        return {key: plain(v) for key, v in value.items()}
+    return [plain(v) for v in value] if isinstance(value, tuple) else value
+
+
+# --- Loader (reloads only when prompts.json changes) ---
+def test_loader_reuses_the_catalog_until_the_file_changes(tmp_path):
+    path = write_prompts(tmp_path / "prompts.json", [{"id": "a", "prompt_text": "A", "skill_type": "Clarifying"}])
+    loader = PromptCatalogLoader(path)
+    catalog = loader.get()
+    assert loader.get() is catalog
+    assert loader.version == 1
+    write_prompts(tmp_path / "prompts.json", [{"id": "b", "prompt_text": "B", "skill_type": "Clarifying"}])
+    os.utime(path, ns=(1, 1)) # Make sure the stat key changes even within the mtime resolution
+    reloaded = loader.get()
+    assert reloaded is not catalog and reloaded.get("b") is not None
+    assert loader.version == 2 == reloaded.version
+
+
+def test_touched_file_with_the_same_content_keeps_the_catalog(tmp_path):
+    path = write_prompts(tmp_path / "prompts.json", [{"id": "a", "prompt_text": "A"}])
+    loader = PromptCatalogLoader(path)
+    catalog = loader.get()
+    os.utime(path, ns=(1, 1))
+    assert loader.get() is catalog
+    assert loader.version == 1
+
+
+def test_loader_rejects_a_malformed_file(tmp_path):
+    path = write_prompts(tmp_path / "prompts.json", [{"id": "a"}])
+    with pytest.raises(ValueError):
+        PromptCatalogLoader(path).get()
+
+
+# --- Indexed catalog ---
+def test_catalog_lookups_match_a_linear_scan_of_the_json(raw_prompts):
+    catalog = PromptCatalog(raw_prompts)
+    for prompt_id in {p["id"] for p in raw_prompts}:
+        assert plain(catalog.get(prompt_id)) == next(p for p in raw_prompts if p["id"] == prompt_id)
+    for skill in {p.get("skill_type") for p in raw_prompts}:
+        assert list(catalog.ids_for_skill(skill)) == [p["id"] for p in raw_prompts if p.get("skill_type") == skill]
+    assert catalog.get("no-such-prompt") is None
+    assert catalog.ids_for_skill("no-such-skill") == ()
+
+
+def test_catalog_records_are_immutable():
+    record = PromptCatalog([{"id": "a", "prompt_text": "A", "exhibits": [{"chart_type": "bar", "y_axis": ["x"]}]}]).get("a")
+    with pytest.raises(AttributeError):
+        record.prompt_text = "changed"
+    assert record["exhibits"][0]["y_axis"] == ("x",)
+    assert thaw(record["exhibits"][0]["y_axis"]) == ["x"]
+
+
+# --- Packed (mmap) store ---
+def test_packed_store_serves_the_same_records_as_the_json_catalog(tmp_path, raw_prompts):
+    path = write_prompts(tmp_path / "prompts.json", raw_prompts)
+    index_path = build_prompt_store(path)
+    loader = PromptCatalogLoader(path)
+    packed = loader.get()
+    assert isinstance(packed, PackedPromptCatalog)
+    catalog = PromptCatalog(raw_prompts)
+    assert packed.prompt_ids == catalog.prompt_ids
+    for packed_record, record in zip(packed.records, catalog.records): # Positions, since prompts.json repeats some ids
+        assert plain(packed_record) == plain(record)
+        assert packed_record.get("exhibit_context") == record.get("exhibit_context")
+    for prompt_id in set(catalog.prompt_ids):
+        assert plain(packed.get(prompt_id)) == plain(catalog.get(prompt_id))
+    for skill in {p.get("skill_type") for p in raw_prompts}:
+        assert packed.ids_for_skill(skill) == catalog.ids_for_skill(skill)
+    assert os.path.exists(index_path)
+
+
+def test_stale_packed_store_is_ignored(tmp_path):
+    path = write_prompts(tmp_path / "prompts.json", [{"id": "a", "prompt_text": "A"}])
+    build_prompt_store(path)
+    write_prompts(tmp_path / "prompts.json", [{"id": "a", "prompt_text": "A, edited"}])
+    catalog = PromptCatalogLoader(path).get()
+    assert isinstance(catalog, PromptCatalog)
+    assert catalog.get("a")["prompt_text"] == "A, edited"
+
+
+# --- Precomputed exhibit text ---
+def legacy_exhibit_context(prompt):
+    """The exhibit text generate_final_feedback used to build on every call, from the raw JSON."""
+    exhibits_data_for_llm = []
+    for idx, ex in enumerate(prompt["exhibits"]):
+        ex_title = ex.get("exhibit_title", f"Exhibit {idx+1}")
+        ex_data_summary = ""
+        if ex.get("data"):
+            ex_data_summary = f"Data for {ex_title}:\n{pd.DataFrame(ex.get('data')).to_string(index=False)}\n"
+        elif ex.get("summary_text"):
+            summary_text = ex.get("summary_text")
+            if prompt.get("skill_type") == "Recommendation" and isinstance(summary_text, list):
+                ex_data_summary = f"Summary Text for {ex_title}:\n" + "\n".join([f"- {item}" for item in summary_text]) + "\n"
+            else:
+                ex_data_summary = f"Summary Text for {ex_title}:\n{summary_text}\n"
+        exhibits_data_for_llm.append(f"{ex_title}\n{ex.get('description', '')}\n{ex_data_summary}")
+    return "\n\n".join(exhibits_data_for_llm)
+
+
+def test_exhibit_context_matches_the_old_per_call_rendering(raw_prompts):
+    with_exhibits = [(prompt, record) for prompt, record in zip(raw_prompts, PromptCatalog(raw_prompts).records) if prompt.get("exhibits")]
+    assert with_exhibits
+    for prompt, record in with_exhibits:
+        assert record["exhibit_context"] == legacy_exhibit_context(prompt)
+        assert record["exhibit_context"] == format_exhibit_context(prompt["exhibits"], prompt.get("skill_type"))
+
+
+# --- Compact exhibit serialization ---
+@pytest.mark.parametrize("value, text", [
+    (1500000.0, "1500000"), (0.125, "0.125"), (2.5e-7, "2.5e-07"), (0.000000123, "1.23e-07"), (-0.0004, "-0.0004"),
+    (1234567.891, "1234568"), (float("nan"), ""), (None, ""), (True, "True"), (" label ", "label"), (7, "7"),
+])
+def test_compact_value(value, text):
+    assert _compact_value(value) == text
+
+
+def test_compact_tables_carry_the_same_numbers_as_the_exhibit_data(raw_prompts):
+    for prompt in raw_prompts:
+        for exhibit in prompt.get("exhibits") or []:
+            if not exhibit.get("data"):
+                continue
+            df = pd.DataFrame(exhibit["data"])
+            rows = list(csv.reader(io.StringIO(compact_table_text(df))))
+            assert rows[0] == [str(col) for col in df.columns]
+            for row, expected in zip(rows[1:], df.itertuples(index=False, name=None)):
+                for cell, value in zip(row, expected):
+                    if isinstance(value, (int, float)) and not isinstance(value, bool) and not pd.isna(value):
+                        assert float(cell) == pytest.approx(value, rel=1e-6)
+                    else:
+                        assert cell == ("" if value is None or (isinstance(value, float) and pd.isna(value)) else str(value).strip())
+
+
+def test_loader_builds_compact_exhibit_text_when_asked(tmp_path, raw_prompts):
+    prompt = next(p for p in raw_prompts if any(ex.get("data") for ex in p.get("exhibits") or []))
+    path = write_prompts(tmp_path / "prompts.json", [prompt])
+    context = PromptCatalogLoader(path, exhibit_text_format="compact").get().get(prompt["id"])["exhibit_context"]
+    assert "(CSV):" in context
+    assert context == format_exhibit_context(prompt["exhibits"], prompt.get("skill_type"), "compact")
+    with pytest.raises(ValueError):
+        PromptCatalogLoader(path, exhibit_text_format="xml")
+
+
+# --- Prompt deck ---
+def test_deck_draws_every_prompt_once_per_round_without_repeats_across_rounds():
+    ids = tuple(f"p{i}" for i in range(7))
+    deck, rng = PromptDeck(), random.Random(3)
+    draws = [deck.draw(ids, 1, rng) for _ in range(7 * 20)]
+    for round_start in range(0, len(draws), 7):
+        assert sorted(prompt_id for prompt_id, _ in draws[round_start:round_start + 7]) == sorted(ids)
+    assert [reshuffled for _, reshuffled in draws].count(True) == 19
+    assert all(a[0] != b[0] for a, b in zip(draws, draws[1:]))
+
+
+def test_deck_restarts_when_the_catalog_is_reloaded():
+    deck, rng = PromptDeck(), random.Random(4)
+    deck.draw(("a", "b", "c"), 1, rng)
+    prompt_id, reshuffled = deck.draw(("a", "b", "c", "d"), 2, rng)
+    assert (deck.catalog_version, deck.position, reshuffled) == (2, 1, False)
+    assert prompt_id in ("a", "b", "c", "d")
+    assert deck.draw((), 2, rng) == (None, False)
+
+
+def legacy_draws(skill_ids, count, rng):
+    """The used-ids selection select_new_prompt made before the deck: random picks without repeats until every id was seen."""
+    used, draws = set(), []
+    for _ in range(count):
+        available = [prompt_id for prompt_id in skill_ids if prompt_id not in used]
+        if not available:
+            used, available = set(), list(skill_ids)
+        draws.append(rng.choice(available))
+        used.add(draws[-1])
+    return draws
+
+
+def test_deck_rounds_deal_the_same_prompts_as_the_old_selection(raw_prompts):
+    catalog = PromptCatalog(raw_prompts)
+    for skill in {p.get("skill_type") for p in raw_prompts}:
+        skill_ids = tuple(dict.fromkeys(catalog.ids_for_skill(skill))) # As select_new_prompt passes them
+        size = len(skill_ids)
+        deck, rng = PromptDeck(), random.Random(5)
+        draws = [deck.draw(skill_ids, 1, rng)[0] for _ in range(size * 3)]
+        legacy = legacy_draws(skill_ids, size * 3, random.Random(5))
+        for start in range(0, size * 3, size):
+            assert sorted(draws[start:start + size]) == sorted(legacy[start:start + size]) == sorted(skill_ids)
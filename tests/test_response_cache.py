@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+import response_cache
+from response_cache import AnswerCache, FeedbackReportStore, SharedResponseCache, answer_cache_key, feedback_cache_key, normalize_question
+
+
+# --- In-process answer cache ---
+def test_equivalent_questions_share_a_key_and_cases_do_not():
+    key = answer_cache_key("Clarifying", "q1", "Case text", "What is the client's objective?")
+    assert answer_cache_key("Clarifying", "q1", "Case text", "  what is the CLIENTS objective ") == key
+    assert answer_cache_key("Clarifying", "q1", "Case text, edited", "What is the client's objective?") != key
+    assert answer_cache_key("Clarifying", "q2", "Case text", "What is the client's objective?") != key
+    assert normalize_question("Who are\tthe  competitors?!") == "who are the competitors"
+
+
+def test_answer_cache_evicts_least_recently_used():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", ("answer a", "assessment"))
+    cache.put("b", ("answer b", None))
+    assert cache.get("a") == ("answer a", "assessment") # a is now the most recently used
+    cache.put("c", ("answer c", None))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+    assert stats["approx_bytes"] > 0
+
+
+def test_answer_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("a", ("answer", None))
+    now[0] += 59
+    assert cache.get("a") == ("answer", None)
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_answer_cache_matches_a_dict_under_concurrent_use():
+    cache = AnswerCache(max_entries=10000)
+    expected = {f"k{i}": (f"answer {i}", None) for i in range(400)}
+
+    def worker(offset):
+        for i in range(offset, 400, 4):
+            cache.put(f"k{i}", expected[f"k{i}"])
+            assert cache.get(f"k{i}") == expected[f"k{i}"]
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {key: cache.get(key) for key in expected} == expected
+
+
+# --- Shared (SQLite) response cache ---
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "responses.sqlite3")
+
+
+def test_shared_cache_is_visible_to_every_instance_on_the_file(cache_path):
+    SharedResponseCache(cache_path).put("k", "answer", ["The answer.", "Good question (4/5)."])
+    other = SharedResponseCache(cache_path)
+    assert other.get("k") == ["The answer.", "Good question (4/5)."]
+    assert other.get("missing") is None
+    assert (other.hits, other.misses) == (1, 1)
+
+
+def test_shared_cache_entries_expire(cache_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = SharedResponseCache(cache_path, ttl_seconds=60)
+    cache.put("k", "answer", ["a", None])
+    now[0] += 61
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == {}
+
+
+def test_shared_cache_evicts_least_recently_used_past_its_size_cap(cache_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = SharedResponseCache(cache_path, max_bytes=1000)
+    for i in range(response_cache.SIZE_CHECK_EVERY):
+        now[0] += 1
+        cache.put(f"key-{i:02d}", "answer", "x" * 90)
+    now[0] += response_cache.ACCESS_TOUCH_SECONDS + 1
+    assert cache.get("key-00") is not None # Used again, so no longer the least recently used
+    cache.put("last", "answer", "x" * 90) # This put runs the size check
+    assert cache.stats()["bytes"] <= 900
+    assert cache.get("key-00") is not None and cache.get("last") is not None
+    assert cache.get("key-01") is None
+
+
+def test_shared_cache_treats_unreadable_values_as_misses(cache_path):
+    cache = SharedResponseCache(cache_path)
+    cache._connect().execute("INSERT INTO responses VALUES ('bad', 'answer', '{not json', 9, ?, ?)", (time.time(), time.time()))
+    assert cache.get("bad") is None
+    cache.put("unserializable", "answer", object())
+    assert cache.errors == 2
+
+
+# --- Feedback report store ---
+def test_feedback_reports_persist_and_the_first_report_wins(tmp_path):
+    path = str(tmp_path / "reports.sqlite3")
+    key = feedback_cache_key("Clarifying", "q1", "Case text", "Q: objective?\nA: grow revenue")
+    FeedbackReportStore(path).put(key, "Clarifying", "q1", "## Overall Rating: 4/5\nFirst.")
+    store = FeedbackReportStore(path)
+    store.put(key, "Clarifying", "q1", "## Overall Rating: 2/5\nSecond.")
+    assert store.get(key) == "## Overall Rating: 4/5\nFirst."
+    assert store.get(feedback_cache_key("Clarifying", "q1", "Case text", "Q: objective?")) is None
+    assert store.stats() == {"entries": 1, "hits": 1, "misses": 1, "errors": 0}
+
+
+def test_feedback_keys_cover_everything_the_report_depends_on():
+    base = ("Analysis", "q1", "Case text", "transcript", "exhibits")
+    key = feedback_cache_key(*base)
+    for position in range(len(base)):
+        changed = list(base)
+        changed[position] += " (edited)"
+        assert feedback_cache_key(*changed) != key
@@ -0,0 +1,98 @@
+import gspread
+import pytest
+
+import sheets_session
+from sheets_session import SheetsSession, is_auth_error
+
+
+class FakeResponse:
+    """Just enough of a requests.Response for gspread.exceptions.APIError."""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = "{}"
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": "error", "status": "ERROR"}}
+
+
+def api_error(status_code):
+    return gspread.exceptions.APIError(FakeResponse(status_code))
+
+
+class FakeWorksheet:
+    def __init__(self, errors):
+        self.errors = errors
+        self.rows = []
+
+    def append_rows(self, rows, value_input_option=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.rows.extend(rows)
+
+
+@pytest.fixture
+def google(monkeypatch):
+    """Replaces authorization with fakes; records each (re)connect and shares one error queue across worksheets."""
+    state = {"authorized": 0, "errors": [], "worksheets": []}
+
+    def authorize(credentials):
+        state["authorized"] += 1
+        worksheet = FakeWorksheet(state["errors"])
+        state["worksheets"].append(worksheet)
+        spreadsheet = type("Spreadsheet", (), {"get_worksheet": lambda self, index: worksheet})()
+        return type("Client", (), {"open_by_key": lambda self, key: spreadsheet})()
+
+    monkeypatch.setattr(sheets_session.Credentials, "from_service_account_info", staticmethod(lambda info, scopes: object()))
+    monkeypatch.setattr(sheets_session.gspread, "authorize", authorize)
+    return state
+
+
+def append(session, row):
+    session.run(lambda worksheet: worksheet.append_rows([row]))
+
+
+def test_session_authorizes_once_for_many_writes(google):
+    session = SheetsSession({"client_email": "bot@example.com"}, "sheet")
+    assert google["authorized"] == 0 # Nothing happens until the first write
+    for i in range(5):
+        append(session, [i])
+    assert google["authorized"] == 1 == session.connects
+    assert google["worksheets"][0].rows == [[i] for i in range(5)]
+
+
+def test_session_writes_the_same_rows_as_authorizing_for_every_save(google):
+    rows = [["2026-10-18", "Clarifying", "q1", str(i)] for i in range(3)]
+    for row in rows: # The old path: authorize and open the sheet for each save
+        gc = sheets_session.gspread.authorize(sheets_session.Credentials.from_service_account_info({}, scopes=sheets_session.SCOPES))
+        gc.open_by_key("sheet").get_worksheet(0).append_rows([row])
+    per_save = [row for worksheet in google["worksheets"] for row in worksheet.rows]
+    session = SheetsSession({}, "sheet")
+    for row in rows:
+        append(session, row)
+    assert google["worksheets"][-1].rows == per_save == rows
+    assert session.connects == 1
+
+
+def test_session_reconnects_once_after_an_auth_error(google):
+    session = SheetsSession({}, "sheet")
+    append(session, ["first"])
+    google["errors"].append(api_error(401))
+    append(session, ["second"])
+    assert session.connects == 2
+    assert google["worksheets"][-1].rows == [["second"]]
+
+
+def test_other_errors_are_raised_without_reconnecting(google):
+    session = SheetsSession({}, "sheet")
+    google["errors"].append(api_error(503))
+    with pytest.raises(gspread.exceptions.APIError):
+        append(session, ["row"])
+    assert session.connects == 1
+
+
+def test_is_auth_error():
+    assert is_auth_error(api_error(401)) and is_auth_error(api_error(403))
+    assert not is_auth_error(api_error(429))
+    assert is_auth_error(sheets_session.RefreshError("token expired"))
+    assert not is_auth_error(KeyError("GSHEET_ID"))